@@ -0,0 +1,247 @@
+"""
+无界面批量评测：从 JSONL 读取问题，多线程并发跑 run_agent_generator，结果写入 JSONL。
+
+输入每行形如 {"id": "q1", "question": "..."}（缺少 id 时使用行号）。
+输出每行包含答案、状态、步数、耗时和完整事件轨迹；重复运行时会跳过输出文件中
+已有的题目（加 --retry-failed 则重跑未成功的题目），中断后可直接续跑。
+
+用法示例：
+    python batch_eval.py questions.jsonl -o answers.jsonl --workers 8 --source 1
+    python batch_eval.py questions.jsonl --engine async --workers 32   # 单线程异步引擎跑 32 个并发会话
+API Key 可通过命令行参数或环境变量 SILICONFLOW_API_KEY / BOCHA_API_KEY /
+GOOGLE_API_KEY / GOOGLE_CX / DRS_PROXY 提供。
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from drs.agent import run_agent_generator
+from drs.context_manager import CONTEXT_TOKEN_BUDGET
+from drs.watchdog import watch
+
+# 不写入轨迹的流式片段事件（完整内容会在 thought / final_answer 中出现）
+DELTA_EVENTS = ("thought_delta", "answer_delta")
+
+MAX_STEPS_MARK = "🛑 已达到最大步数"
+
+
+def load_questions(path):
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            question = item.get("question") or item.get("query") or item.get("prompt")
+            if not question:
+                print(f"⚠️ 第 {line_no} 行缺少 question 字段，已跳过", file=sys.stderr)
+                continue
+            questions.append({"id": str(item.get("id", line_no)), "question": question})
+    return questions
+
+
+def load_finished(path, retry_failed):
+    """读取已有输出，返回应跳过的题目 id 集合（同一 id 以最后一条记录为准）"""
+    status = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 中断时可能留下半行
+                status[str(record.get("id"))] = record.get("status")
+    return {qid for qid, s in status.items() if not retry_failed or s == "ok"}
+
+
+class _Recorder:
+    """
+    汇总一道题的事件流：答案、状态、步数与轨迹。
+    started=False 时计时从 begin() 开始（异步引擎中排队等待会话名额的时间不计入时限）。
+    """
+
+    def __init__(self, item, timeout, started=True):
+        self.item = item
+        self.timeout = timeout
+        self.start = time.monotonic() if started else None
+        self.trace = []
+        self.answer = ""
+        self.status = "no_answer"
+        self.steps = 0
+
+    def begin(self):
+        self.start = time.monotonic()
+
+    def elapsed(self):
+        return time.monotonic() - self.start if self.start is not None else 0.0
+
+    def left(self):
+        """距离时限还剩的秒数"""
+        return max(0.0, self.timeout - self.elapsed())
+
+    def expire(self):
+        self.status = "timeout"
+
+    def add(self, event):
+        """记录一个事件，超过时限时返回 False；时限刚过才到达的最终答案照常采纳"""
+        elapsed = self.elapsed()
+        if event["type"] not in DELTA_EVENTS:
+            self.trace.append({"t": round(elapsed, 3), "type": event["type"], "content": event["content"]})
+        if event["type"] == "status_update":
+            self.steps += 1
+        elif event["type"] == "final_answer":
+            self.answer = event["content"] or ""
+            self.status = "max_steps" if self.answer.startswith(MAX_STEPS_MARK) else "ok"
+            return True
+        elif event["type"] == "error" and self.status == "no_answer":
+            self.status = "error"
+        if elapsed > self.timeout:
+            self.expire()
+            return False
+        return True
+
+    def fail(self, e):
+        self.status = "error"
+        self.trace.append({"t": round(self.elapsed(), 3), "type": "error",
+                           "content": f"程序运行异常: {e}"})
+
+    def record(self):
+        return {
+            "id": self.item["id"],
+            "question": self.item["question"],
+            "answer": self.answer,
+            "status": self.status,
+            "steps": self.steps,
+            "latency": round(self.elapsed(), 3),
+            "trace": self.trace,
+        }
+
+
+def _agent_args(item, args):
+    return (item["question"], args.api_key, args.base_url, args.model, args.source,
+            args.bocha_key, args.google_key, args.google_cx, args.proxy, args.max_steps)
+
+
+def run_one(item, args):
+    """
+    跑一道题，超过 args.timeout 秒即停止。
+    生成器由看门狗线程驱动（见 drs.watchdog），卡住的 LLM / 搜索调用到时限也会立即让出 --workers 线程。
+    """
+    rec = _Recorder(item, args.timeout)
+    gen = run_agent_generator(*_agent_args(item, args), context_budget=args.context_budget, tool_mode=args.tools,
+                              llm_cache=args.llm_cache, crawl_pages=args.crawl)
+    try:
+        for event in watch(gen, rec.start + args.timeout):
+            if not rec.add(event):
+                break
+    except TimeoutError:
+        rec.expire()
+    except Exception as e:
+        rec.fail(e)
+    return rec.record()
+
+
+async def arun_one(agent, item, args):
+    """
+    run_one 的异步版本，由 AsyncAgent 驱动。
+    AsyncAgent.run 拿到会话名额后立即产生第一个事件，计时从这里开始；
+    之后每次等待事件都带上剩余时限，卡住的 LLM / 搜索调用到时即被取消。
+    """
+    rec = _Recorder(item, args.timeout, started=False)
+    gen = agent.run(*_agent_args(item, args), context_budget=args.context_budget, tool_mode=args.tools,
+                    llm_cache=args.llm_cache, crawl_pages=args.crawl)
+    try:
+        event = await gen.__anext__()
+        rec.begin()
+        while rec.add(event):
+            event = await asyncio.wait_for(gen.__anext__(), rec.left())
+    except StopAsyncIteration:
+        pass
+    except asyncio.TimeoutError:
+        rec.expire()
+    except Exception as e:
+        rec.fail(e)
+    finally:
+        await gen.aclose()
+    return rec.record()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="DeepRecursive-Search 批量评测")
+    parser.add_argument("input", help="问题 JSONL 文件")
+    parser.add_argument("-o", "--output", default="answers.jsonl", help="结果 JSONL 文件（追加写入，可续跑）")
+    parser.add_argument("--workers", type=int, default=4, help="并发题目数")
+    parser.add_argument("--engine", default="thread", choices=["thread", "async"],
+                        help="thread=线程池跑同步 Agent；async=单线程事件循环跑异步 Agent（适合大并发）")
+    parser.add_argument("--timeout", type=float, default=600, help="每道题的时限（秒）")
+    parser.add_argument("--max-steps", type=int, default=8)
+    parser.add_argument("--context-budget", type=int, default=CONTEXT_TOKEN_BUDGET)
+    parser.add_argument("--tools", action="store_true", help="用工具调用（search / finish）代替 JSON 输出给出决策")
+    parser.add_argument("--crawl", type=int, default=0, metavar="N",
+                        help="每次搜索再沿结果页面中的链接抓取至多 N 个相关子网页（默认关闭）")
+    parser.add_argument("--llm-cache", default=None, choices=["off", "cache", "record", "replay"],
+                        help="LLM 响应缓存：cache=读写缓存 record=录制 replay=只回放（默认取环境变量 DRS_LLM_CACHE）")
+    parser.add_argument("--source", type=int, default=1, choices=[1, 2, 3, 4],
+                        help="1=Bocha 2=Google 3=DuckDuckGo 4=联合搜索")
+    parser.add_argument("--model", default="Qwen/Qwen3-235B-A22B-Instruct-2507")
+    parser.add_argument("--base-url", default="https://api.siliconflow.cn/v1")
+    parser.add_argument("--api-key", default=os.environ.get("SILICONFLOW_API_KEY", ""))
+    parser.add_argument("--bocha-key", default=os.environ.get("BOCHA_API_KEY", ""))
+    parser.add_argument("--google-key", default=os.environ.get("GOOGLE_API_KEY", ""))
+    parser.add_argument("--google-cx", default=os.environ.get("GOOGLE_CX", ""))
+    parser.add_argument("--proxy", default=os.environ.get("DRS_PROXY", ""))
+    parser.add_argument("--retry-failed", action="store_true", help="重跑输出文件中未成功的题目")
+    return parser.parse_args(argv)
+
+
+async def run_async(todo, args, write):
+    """异步引擎：所有题目同时提交，由 AsyncAgent 把并发会话数限制在 args.workers"""
+    from drs.async_agent import AsyncAgent
+
+    async with AsyncAgent(max_sessions=args.workers) as agent:
+        tasks = [asyncio.ensure_future(arun_one(agent, item, args)) for item in todo]
+        for done, fut in enumerate(asyncio.as_completed(tasks), 1):
+            write(done, await fut)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.proxy = args.proxy or None
+
+    questions = load_questions(args.input)
+    finished = load_finished(args.output, args.retry_failed)
+    todo = [q for q in questions if q["id"] not in finished]
+    print(f"共 {len(questions)} 题，已完成 {len(questions) - len(todo)} 题，本次运行 {len(todo)} 题，"
+          f"并发 {args.workers}", file=sys.stderr)
+
+    start = time.monotonic()
+    counts = {}
+    with open(args.output, "a", encoding="utf-8") as out:
+        def write(done, record):
+            # 只在主线程写文件，每题写完立即落盘，便于中断后续跑
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            counts[record["status"]] = counts.get(record["status"], 0) + 1
+            print(f"[{done}/{len(todo)}] {record['id']} {record['status']} "
+                  f"{record['steps']} 步 {record['latency']:.1f}s", file=sys.stderr)
+
+        if args.engine == "async":
+            asyncio.run(run_async(todo, args, write))
+        else:
+            with ThreadPoolExecutor(max_workers=args.workers) as pool:
+                futures = [pool.submit(run_one, item, args) for item in todo]
+                for done, fut in enumerate(as_completed(futures), 1):
+                    write(done, fut.result())
+
+    wall = time.monotonic() - start
+    summary = "，".join(f"{k}: {v}" for k, v in sorted(counts.items()))
+    print(f"完成，用时 {wall:.1f}s（{summary or '无新题目'}）", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
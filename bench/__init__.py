@@ -0,0 +1 @@
+"""离线基准测试：本地模拟服务与测量脚本（python -m bench.run_bench）。"""
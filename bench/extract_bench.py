@@ -0,0 +1,111 @@
+"""
+正文提取的微基准：对比在线程中直接提取与交给提取进程池（drs.extract_pool）的吞吐量。
+
+用 fixtures 中的录制页面放大成若干 KB ~ MB 的大页面，由 --threads 个线程同时提交 --pages 个提取任务，
+分别测量两种方式的单页耗时、总吞吐量，以及提取期间另一个线程的最大停顿
+（模拟 Agent 主循环 / Streamlit 脚本线程每 5 毫秒醒来一次，停顿越大说明被 GIL 卡得越久）。
+
+用法（在仓库根目录）：
+    python -m bench.extract_bench --workers 4 --threads 8 --pages 64
+"""
+import argparse
+import sys
+import threading
+import time
+
+from bench.mock_servers import FIXTURES_DIR, load_fixtures
+from bench.run_bench import measure, summarize
+from drs import extract_pool
+from drs.fetcher import extract_document
+
+# 探测停顿的线程的睡眠间隔（秒）
+TICK = 0.005
+
+
+def build_pages(fixtures_dir, repeat):
+    """把每个录制页面的正文段落重复 repeat 次，得到较大的 HTML 字节串"""
+    pages = []
+    for html in load_fixtures(fixtures_dir).values():
+        html = html.decode("utf-8")
+        head, sep, tail = html.partition("</body>")
+        start = head.find("<p")
+        body = head[start:] if start >= 0 else head
+        pages.append((head + body * repeat + sep + tail).encode("utf-8"))
+    return pages
+
+
+class StallProbe:
+    """在后台线程中每 TICK 秒醒来一次，记录实际间隔超出 TICK 的最大值"""
+
+    def __init__(self):
+        self.max_stall = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.is_set():
+            time.sleep(TICK)
+            now = time.perf_counter()
+            self.max_stall = max(self.max_stall, now - last - TICK)
+            last = now
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run(name, func, pages, count, threads):
+    with StallProbe() as probe:
+        samples, wall = measure(lambda i: func(pages[i % len(pages)]), count, threads, warmup=0)
+    r = summarize(samples, wall)
+    print(f"{name:<8} n={r['n']:<4} p50 {r['p50'] * 1000:8.1f} ms  p95 {r['p95'] * 1000:8.1f} ms  "
+          f"吞吐 {r['throughput']:7.2f} 页/s  其他线程最大停顿 {probe.max_stall * 1000:7.1f} ms", file=sys.stderr)
+    return r
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="正文提取：线程内 vs 进程池")
+    parser.add_argument("--workers", type=int, default=4, help="提取进程数")
+    parser.add_argument("--threads", type=int, default=8, help="同时提交提取任务的线程数（模拟并发抓取）")
+    parser.add_argument("--pages", type=int, default=64, help="每种方式提取的页面数")
+    parser.add_argument("--repeat", type=int, default=100, help="录制页面正文的放大倍数")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="录制的 HTML 页面目录")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    pages = build_pages(args.fixtures, args.repeat)
+    print(f"页面 {len(pages)} 个，平均 {sum(map(len, pages)) / len(pages) / 1024:.0f} KB；"
+          f"{args.threads} 个线程，进程池 {args.workers} 个进程", file=sys.stderr)
+
+    # 所有页面都交给进程池
+    extract_pool.EXTRACT_WORKERS = args.workers
+    extract_pool.POOL_MIN_BYTES = 0
+
+    def inline(body):
+        extract_document("html", body)
+
+    def pooled(body):
+        extract_pool.extract_in_pool("html", body)
+
+    # 预热：线程内导入 trafilatura，进程池中每个进程完成初始化
+    inline(pages[0])
+    for body in pages[:args.workers]:
+        pooled(body)
+
+    results = {"inline": run("inline", inline, pages, args.pages, args.threads),
+               "pool": run("pool", pooled, pages, args.pages, args.threads)}
+    extract_pool.shutdown_extract_pool()
+    print(f"进程池吞吐为线程内的 {results['pool']['throughput'] / results['inline']['throughput']:.2f} 倍",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""
+基准测试用的本地模拟服务：一个 HTTP 服务同时扮演 LLM、搜索 API 和网页站点。
+
+- POST /v1/chat/completions：OpenAI 兼容的流式接口，按脚本返回 JSON 决策
+  （前 search_steps 步搜索，之后给出答案），可配置首 token 延迟与分片间隔；
+  请求带 tools 时以工具调用（search / finish）返回，stream 为假时返回普通 JSON 响应
+- POST /v1/web-search：Bocha 格式的搜索结果
+- GET  /customsearch/v1：Google Custom Search 格式的搜索结果
+- GET  /ddg?q=...：DuckDuckGo text() 格式的结果列表
+- GET  /pages/<文件名>：fixtures 目录下录制好的 HTML 页面
+
+搜索结果中的链接指向本服务的 /pages/，并带上由查询计算出的参数，
+不同查询得到不同 URL，保证每次都走真实的下载与提取路径（不命中网页缓存）。
+"""
+import json
+import os
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# 默认延迟（秒），量级参考真实服务，可通过命令行调整
+DEFAULT_LATENCY = {
+    "llm_first_token": 0.3,  # LLM 首个分片前的等待
+    "llm_chunk": 0.005,  # 相邻分片的间隔
+    "search": 0.2,  # 搜索 API 响应
+    "page": 0.1,  # 网页响应
+}
+
+# LLM 每个流式分片的字符数
+LLM_CHUNK_CHARS = 8
+
+# 每次搜索返回的结果数
+RESULTS_PER_QUERY = 3
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    """读取目录下所有 .html 录制页面，返回 {文件名: 字节内容}"""
+    pages = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith((".html", ".htm")):
+            with open(os.path.join(directory, name), "rb") as f:
+                pages[name] = f.read()
+    if not pages:
+        raise ValueError(f"{directory} 中没有 HTML 页面")
+    return pages
+
+
+def scripted_decision(messages, search_steps):
+    """按对话中已有的搜索轮数决定下一步：前 search_steps 步搜索，之后结束"""
+    question = next((m["content"] for m in messages if m["role"] == "user"), "")
+    done = sum(1 for m in messages if m["role"] == "user" and m["content"].startswith("【搜索工具返回数据】"))
+    thought = (f"**[分析]**：这是第 {done + 1} 轮推理，需要进一步核实问题中的关键事实。\n"
+               f"**[评估]**：已有 {done} 轮搜索结果，信息尚{'不' if done < search_steps else ''}充分。\n"
+               f"**[决策]**：{'继续搜索补充资料' if done < search_steps else '整理已有信息并给出答案'}。")
+    if done < search_steps:
+        return {"thought": thought, "action": "search", "query": f"{question[-20:]} 第{done + 1}轮"}
+    answer = "## 结论\n\n" + "根据检索到的资料，相关事实已经核实。" * 20 + "\n\n来源：[来源 1]、[来源 2]"
+    return {"thought": thought, "action": "finish", "answer": answer}
+
+
+class MockServer:
+    """
+    在后台线程运行的本地模拟服务。
+    用法：with MockServer() as server: ... server.base_url ...
+    """
+
+    def __init__(self, latency=None, search_steps=2, fixtures_dir=FIXTURES_DIR):
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.search_steps = search_steps
+        self.pages = load_fixtures(fixtures_dir)
+        self.requests = {}
+        self._counter_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="drs-bench-mock", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self, kind):
+        with self._counter_lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    def results_for(self, query, n=RESULTS_PER_QUERY):
+        """为查询生成确定的结果列表：(标题, 链接, 摘要)"""
+        names = list(self.pages)
+        seed = zlib.crc32(query.encode("utf-8"))
+        results = []
+        for i in range(n):
+            name = names[(seed + i) % len(names)]
+            link = f"{self.base_url}/pages/{name}?v={seed:x}-{i}"
+            results.append((f"{name.rsplit('.', 1)[0]} - {query}", link, f"与“{query}”相关的摘要文字。" * 3))
+        return results
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, obj, status=200):
+                body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_json(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                if parts.path.startswith("/pages/"):
+                    server.count("page")
+                    page = server.pages.get(parts.path[len("/pages/"):])
+                    time.sleep(server.latency["page"])
+                    if page is None:
+                        self.send_error(404)
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(page)))
+                    self.end_headers()
+                    self.wfile.write(page)
+                elif parts.path == "/customsearch/v1":
+                    server.count("google")
+                    time.sleep(server.latency["search"])
+                    items = [{"title": t, "link": l, "snippet": s}
+                             for t, l, s in server.results_for(params.get("q", ""), int(params.get("num", 3)))]
+                    self._send_json({"items": items})
+                elif parts.path == "/ddg":
+                    server.count("ddg")
+                    time.sleep(server.latency["search"])
+                    self._send_json([{"title": t, "href": l, "body": s}
+                                     for t, l, s in server.results_for(params.get("q", ""))])
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                path = urlsplit(self.path).path
+                payload = self._read_json()
+                if path == "/v1/web-search":
+                    server.count("bocha")
+                    time.sleep(server.latency["search"])
+                    value = [{"name": t, "url": l, "summary": s}
+                             for t, l, s in server.results_for(payload.get("query", ""), payload.get("count", 3))]
+                    self._send_json({"code": 200, "data": {"webPages": {"value": value}}})
+                elif path == "/v1/chat/completions":
+                    server.count("llm")
+                    if payload.get("stream"):
+                        self._stream_completion(payload)
+                    else:
+                        self._send_completion(payload)
+                else:
+                    self.send_error(404)
+
+            def _send_completion(self, payload):
+                content = json.dumps(scripted_decision(payload.get("messages", []), server.search_steps),
+                                     ensure_ascii=False)
+                time.sleep(server.latency["llm_first_token"])
+                self._send_json({"id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()),
+                                 "model": payload.get("model", "mock"),
+                                 "choices": [{"index": 0, "finish_reason": "stop",
+                                              "message": {"role": "assistant", "content": content}}]})
+
+            def _stream_completion(self, payload):
+                """按 SSE 分片返回脚本决策（chunked 编码，保持长连接）"""
+                decision = scripted_decision(payload.get("messages", []), server.search_steps)
+                time.sleep(server.latency["llm_first_token"])
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def chunk(delta, finish_reason=None):
+                    data = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()),
+                            "model": payload.get("model", "mock"),
+                            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+                    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+                if payload.get("tools"):
+                    # 工具调用：动作即工具名，其余字段作为参数分片返回
+                    name = decision.pop("action")
+                    content = json.dumps(decision, ensure_ascii=False)
+                    events = [chunk({"role": "assistant", "content": None, "tool_calls": [
+                        {"index": 0, "id": "call_bench", "type": "function",
+                         "function": {"name": name, "arguments": ""}}]})]
+                    events += [chunk({"tool_calls": [{"index": 0, "function": {
+                        "arguments": content[i:i + LLM_CHUNK_CHARS]}}]})
+                        for i in range(0, len(content), LLM_CHUNK_CHARS)]
+                    events += [chunk({}, "tool_calls"), "data: [DONE]\n\n"]
+                else:
+                    content = json.dumps(decision, ensure_ascii=False)
+                    events = [chunk({"role": "assistant", "content": ""})]
+                    events += [chunk({"content": content[i:i + LLM_CHUNK_CHARS]})
+                               for i in range(0, len(content), LLM_CHUNK_CHARS)]
+                    events += [chunk({}, "stop"), "data: [DONE]\n\n"]
+                for i, event in enumerate(events):
+                    if i and server.latency["llm_chunk"]:
+                        time.sleep(server.latency["llm_chunk"])
+                    body = event.encode("utf-8")
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(body), body))
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
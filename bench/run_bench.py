@@ -0,0 +1,223 @@
+"""
+离线基准测试：在本地模拟的 LLM / 搜索 API / 网页上测量各环节耗时，并与基线对比。
+
+测量项目：
+- extract：trafilatura 正文提取（纯 CPU，不走网络）
+- page_content_cold / page_content_warm：get_page_content 未命中 / 命中网页缓存
+- search_bocha / search_google / search_ddg：完整的搜索 + 并发抓取 + 报告拼装
+  （DDG 的 duckduckgo_search 库无法改地址，用模拟接口替换 _ddg_items）
+- agent_run：完整的 run_agent_generator（模拟 LLM 先搜索 N 轮再作答）
+
+每项输出 p50 / p95 / 平均耗时和吞吐量。--save-baseline 保存结果作为基线，
+之后的运行与基线对比，p50 或 p95 变慢超过 --tolerance 时以退出码 1 结束。
+
+用法（在仓库根目录）：
+    python -m bench.run_bench --save-baseline
+    python -m bench.run_bench              # 与 bench/baseline.json 对比
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 缓存目录在导入 drs 之前指向临时目录，避免读写用户的真实缓存
+os.environ["DRS_CACHE_DIR"] = tempfile.mkdtemp(prefix="drs-bench-")
+# 本地模拟服务不走系统代理
+os.environ["NO_PROXY"] = os.environ["no_proxy"] = "127.0.0.1,localhost"
+
+import numpy as np  # noqa: E402
+
+from bench.mock_servers import DEFAULT_LATENCY, FIXTURES_DIR, MockServer  # noqa: E402
+from drs import agent, fetcher, providers, scheduler  # noqa: E402
+from drs.http_pool import get_session  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+BENCHMARKS = ["extract", "page_content_cold", "page_content_warm",
+              "search_bocha", "search_google", "search_ddg", "agent_run"]
+
+
+def measure(func, iterations, concurrency=1, warmup=1):
+    """
+    调用 func(i) 共 iterations 次，返回 (每次耗时列表, 总墙钟时间)。
+    concurrency > 1 时并发调用，用于测吞吐量。
+    """
+    for i in range(warmup):
+        func(-1 - i)  # 负数编号，不与正式测量的 URL / 查询重复
+
+    def timed(i):
+        start = time.perf_counter()
+        func(i)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(timed, range(iterations)))
+    else:
+        samples = [timed(i) for i in range(iterations)]
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, wall):
+    arr = np.array(samples)
+    return {
+        "n": len(samples),
+        "p50": float(np.percentile(arr, 50)),
+        "p95": float(np.percentile(arr, 95)),
+        "mean": float(arr.mean()),
+        "throughput": len(samples) / wall if wall else 0.0,
+    }
+
+
+def build_benchmarks(server, args):
+    """返回 {名称: (单次调用函数, 次数, 并发数, 预热次数)}"""
+    base = server.base_url
+    providers.BOCHA_API_URL = f"{base}/v1/web-search"
+    providers.GOOGLE_API_URL = f"{base}/customsearch/v1"
+    providers._ddg_items = lambda query, proxy, max_results=10: \
+        get_session(proxy).get(f"{base}/ddg", params={"q": query}, timeout=15).json()
+    # 本地模拟服务既不限速也不限额，避免调度器的等待计入测量结果
+    for limit in scheduler.PROVIDER_LIMITS.values():
+        limit.update(rate=None, daily=None)
+
+    htmls = [page.decode("utf-8") for page in server.pages.values()]
+    page_urls = [f"{base}/pages/{name}" for name in server.pages]
+    # 每次运行用不同的后缀，保证冷缓存项目在重复运行时也不会命中上一次的缓存
+    run_id = f"{time.time():.0f}"
+
+    def extract(i):
+        fetcher.extract_text(htmls[i % len(htmls)])
+
+    def page_content_cold(i):
+        fetcher.get_page_content(f"{page_urls[i % len(page_urls)]}?cold={run_id}-{i}", None, "关键数据与时间表")
+
+    def page_content_warm(i):
+        fetcher.get_page_content(page_urls[i % len(page_urls)], None, "关键数据与时间表")
+
+    def search_bocha(i):
+        agent.search_bocha(f"bocha 基准查询 {run_id} {i}", "bench-key")
+
+    def search_google(i):
+        agent.search_google(f"google 基准查询 {run_id} {i}", "bench-key", "bench-cx")
+
+    def search_ddg(i):
+        agent.search_ddg(f"ddg 基准查询 {run_id} {i}", None)
+
+    def agent_run(i):
+        events = agent.run_agent_generator(
+            f"基准问题 {run_id} {i}：固态电池何时量产？", "bench-key", f"{base}/v1", "mock-model", 1,
+            "bench-key", "", "", None, args.max_steps
+        )
+        last = None
+        for last in events:
+            pass
+        if not last or last["type"] != "final_answer":
+            raise RuntimeError(f"agent_run 未正常结束: {last}")
+
+    n = args.iterations
+    return {
+        "extract": (extract, n * 5, 1, 1),
+        "page_content_cold": (page_content_cold, n, 1, 1),
+        # 预热时把每个页面都写入缓存
+        "page_content_warm": (page_content_warm, n * 5, 1, len(page_urls)),
+        "search_bocha": (search_bocha, n, 1, 1),
+        "search_google": (search_google, n, 1, 1),
+        "search_ddg": (search_ddg, n, 1, 1),
+        "agent_run": (agent_run, args.runs, args.concurrency, 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """与基线对比，返回变慢超过容差的项目列表"""
+    regressions = []
+    print(f"\n与基线对比（容差 {tolerance:.0%}）：", file=sys.stderr)
+    for name, cur in results.items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            print(f"  {name:<20} 基线中无此项", file=sys.stderr)
+            continue
+        p50_ratio = cur["p50"] / old["p50"] if old["p50"] else 1.0
+        p95_ratio = cur["p95"] / old["p95"] if old["p95"] else 1.0
+        slower = p50_ratio > 1 + tolerance or p95_ratio > 1 + tolerance
+        if slower:
+            regressions.append(name)
+        print(f"  {name:<20} p50 {p50_ratio:6.2f}x  p95 {p95_ratio:6.2f}x  "
+              f"吞吐 {cur['throughput'] / old['throughput'] if old['throughput'] else 0:6.2f}x"
+              f"{'  ⚠️ 变慢' if slower else ''}", file=sys.stderr)
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="DeepRecursive-Search 离线基准测试")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="只运行指定项目")
+    parser.add_argument("--iterations", type=int, default=20, help="单项测量次数（extract / warm 为 5 倍）")
+    parser.add_argument("--runs", type=int, default=10, help="agent_run 的完整运行次数")
+    parser.add_argument("--concurrency", type=int, default=1, help="agent_run 的并发数")
+    parser.add_argument("--max-steps", type=int, default=8)
+    parser.add_argument("--search-steps", type=int, default=2, help="模拟 LLM 先搜索几轮再作答")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="录制的 HTML 页面目录")
+    for key, value in DEFAULT_LATENCY.items():
+        parser.add_argument(f"--latency-{key.replace('_', '-')}", type=float, default=value,
+                            dest=f"latency_{key}", help=f"模拟延迟（秒），默认 {value}")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的相对变慢比例")
+    parser.add_argument("-o", "--output", help="把本次结果另存为 JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    latency = {key: getattr(args, f"latency_{key}") for key in DEFAULT_LATENCY}
+
+    results = {}
+    with MockServer(latency=latency, search_steps=args.search_steps, fixtures_dir=args.fixtures) as server:
+        benchmarks = build_benchmarks(server, args)
+        for name in args.only or BENCHMARKS:
+            func, iterations, concurrency, warmup = benchmarks[name]
+            samples, wall = measure(func, iterations, concurrency, warmup)
+            results[name] = summarize(samples, wall)
+            r = results[name]
+            print(f"{name:<20} n={r['n']:<4} p50 {r['p50'] * 1000:8.1f} ms  p95 {r['p95'] * 1000:8.1f} ms  "
+                  f"平均 {r['mean'] * 1000:8.1f} ms  吞吐 {r['throughput']:7.2f}/s", file=sys.stderr)
+        print(f"模拟服务请求数: {server.requests}", file=sys.stderr)
+
+    record = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "latency": latency,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        print(f"\n已保存基线: {args.baseline}", file=sys.stderr)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\n未找到基线 {args.baseline}，可加 --save-baseline 生成", file=sys.stderr)
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("latency") != latency:
+        print("⚠️ 基线使用的模拟延迟与本次不同，对比结果仅供参考", file=sys.stderr)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ 性能回退: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    print("\n✅ 未发现性能回退", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
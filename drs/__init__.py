@@ -0,0 +1,6 @@
+"""
+DeepRecursive-Search 公共组件。
+
+app.py 与三个独立脚本共用的抓取、缓存等基础设施都放在这里，
+这样一处优化即可同时作用于所有入口。
+"""
@@ -0,0 +1,6 @@
+"""python -m drs "问题" --source 1：命令行运行一次深度研究"""
+import sys
+
+from drs.cli import main
+
+sys.exit(main())
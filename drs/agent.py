@@ -0,0 +1,645 @@
+"""
+Agent 核心：搜索报告拼装、统一搜索调度与 run_agent_generator 主循环。
+
+Streamlit 界面、命令行、批量评测等入口共用这一份逻辑；网页抓取见 drs.fetcher，
+搜索源见 drs.providers。导入本模块不会加载 trafilatura / openai / duckduckgo_search，
+它们在第一次真正用到时才导入。
+"""
+import datetime
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from drs.context_manager import CONTEXT_TOKEN_BUDGET, ContextManager, estimate_tokens
+from drs.crawler import CRAWL_DEADLINE, CRAWL_MAX_PAGES, crawl
+from drs.dedup import SessionSeen
+from drs.fetcher import STEP_DEADLINE, fetch_concurrently, fetch_first_k, get_page_content
+from drs.http_pool import get_llm_client
+from drs.llm_cache import wrap_llm_client
+from drs.page_cache import normalize_url
+from drs.providers import (SEARCH_DEADLINE, BochaProvider, DDGProvider, GoogleProvider, SearchError,
+                           get_provider)
+from drs.stream_json import StreamingJSONParser
+from drs.tracing import Tracer, span
+
+# ================= 配置区 =================
+
+# 单步最多并行执行的查询数
+MAX_QUERIES_PER_STEP = 3
+
+# 决策解析失败时只把本次原始输出交给模型修复（不带研究上下文），最多保留的字符数
+REPAIR_INPUT_CHARS = 8000
+
+# 多查询并行调用搜索源的专用线程池大小（与网页抓取线程池分开：搜索源可能限速等待或长时间无响应，
+# 不能占住所有会话共用的抓取线程）
+MAX_QUERY_WORKERS = 8
+
+_query_executor = None
+_query_executor_lock = threading.Lock()
+
+
+def _get_query_executor():
+    global _query_executor
+    if _query_executor is None:
+        with _query_executor_lock:
+            if _query_executor is None:
+                _query_executor = ThreadPoolExecutor(max_workers=MAX_QUERY_WORKERS, thread_name_prefix="drs-query")
+    return _query_executor
+
+
+# ================= [报告拼装] =================
+# 搜索源只负责给出候选来源（见 drs.providers），这里统一完成跨查询去重、并发抓取正文与报告拼装
+
+def _pick_hedged(unique, keep, min_len):
+    """对冲抓取后每个查询保留的来源：排名靠前的有效正文优先，不足 keep 个时用其余候选（摘要兜底）补齐"""
+    fetched = [c for c in unique if not c["seen_as"]]
+    chosen = [c for c in fetched if len(c["full_text"]) > min_len][:keep]
+    chosen += [c for c in fetched if len(c["full_text"]) <= min_len][:keep - len(chosen)]
+    chosen_ids = {id(c) for c in chosen}
+    return [c for c in unique if c["seen_as"] or id(c) in chosen_ids]
+
+
+def _dedup_candidates(queries, per_query, session=None):
+    """按 URL 跨查询去重，并标出本次研究中已提供过的来源（seen_as）"""
+    seen = set()
+    kept = []
+    for query, candidates in zip(queries, per_query):
+        unique = []
+        if isinstance(candidates, list):
+            for c in candidates:
+                key = normalize_url(c["link"])
+                if key in seen: continue
+                seen.add(key)
+                unique.append(dict(c, query=query, seen_as=session.lookup_url(c["link"]) if session else None))
+        kept.append(unique)
+    return kept
+
+
+def _attach_full_texts(kept, candidates, full_texts, provider):
+    """把抓取结果写回候选（full_text）；对冲抓取时每个查询只保留选中的来源"""
+    for c, full_text in zip(candidates, full_texts):
+        c["full_text"] = full_text or ""
+    if provider.keep:
+        kept = [_pick_hedged(unique, provider.keep, provider.min_len) for unique in kept]
+    return kept
+
+
+def _crawl_parents(kept):
+    """可以展开子网页的来源：本步新抓到正文的页面"""
+    return [c for unique in kept for c in unique if not c["seen_as"] and c["full_text"]]
+
+
+def _attach_subpages(kept, found, min_len):
+    """把抓到的子网页插到各自所在页面之后（正文过短的丢弃），作为额外来源参与编号与去重"""
+    children = {}
+    for c in found:
+        if len(c["full_text"]) > min_len:
+            children.setdefault(normalize_url(c["parent"]), []).append(
+                dict(c, title=f"{c['title']}（子网页）", seen_as=None))
+    if not children:
+        return kept
+
+    result = []
+    for unique in kept:
+        expanded = []
+
+        def add(c):
+            expanded.append(c)
+            for child in children.pop(normalize_url(c["link"]), []):
+                add(child)
+
+        for c in unique:
+            add(c)
+        result.append(expanded)
+    return result
+
+
+def _assemble_report(queries, per_query, kept, provider, session=None):
+    """按查询顺序和原始排名拼装报告，来源全局编号（候选已带上抓取到的 full_text）"""
+    min_len = provider.min_len
+    report = ""
+    index = 0
+    for query, candidates, unique in zip(queries, per_query, kept):
+        report += f"针对查询 '{query}' 的 {provider.label} 结果：\n"
+        if isinstance(candidates, str):
+            report += f"{candidates or '搜索超时。'}\n\n"
+            continue
+        if not unique:
+            report += "（结果均已在上方来源中出现）\n\n"
+            continue
+        for c in unique:
+            index += 1
+            if c["seen_as"]:
+                content = f"（已提供过，参见{c['seen_as']}）"
+            else:
+                full_text = c["full_text"]
+                duplicate_of = session.lookup_content(full_text) if session and len(full_text) > min_len else None
+                if duplicate_of:
+                    content = f"（近似重复内容已省略，参见{duplicate_of}）"
+                else:
+                    content = full_text if len(full_text) > min_len else f"【摘要】{c['snippet']}"
+                    if session:
+                        session.add(c["link"], full_text if len(full_text) > min_len else "", session.label(index))
+            report += f"--- 来源 {index}: {c['title']} ---\n链接: {c['link']}\n内容: {content}\n\n"
+    return report
+
+
+def _build_report(queries, provider, session=None, crawl_pages=CRAWL_MAX_PAGES):
+    """
+    多个查询共用的报告拼装（provider 为 SearchProvider）：
+    1. 并行调用搜索 API 取每个查询的候选来源（专用线程池，见 MAX_QUERY_WORKERS）
+    2. 按 URL 跨查询去重后，一次性并发抓取所有正文
+    3. 按查询顺序和原始排名拼装，来源全局编号
+    传入 session (SessionSeen) 时，本次研究中已提供过的 URL 不再抓取，
+    与已提供正文近似重复的来源只给出引用。
+    provider.keep 不为空时改为对冲抓取：每个查询凑够 keep 个有效正文即停止等待，其余候选丢弃。
+    crawl_pages 大于 0 时，在本步剩余的抓取时间内沿已抓取页面的链接再抓取至多这么多个子网页（见 drs.crawler）。
+    """
+    min_len, keep = provider.min_len, provider.keep
+
+    def collect(query):
+        try:
+            return provider.candidates(query)
+        except SearchError as e:
+            return str(e)
+
+    if len(queries) == 1:
+        per_query = [collect(queries[0])]
+    else:
+        per_query = fetch_concurrently(queries, collect, deadline=SEARCH_DEADLINE, executor=_get_query_executor())
+
+    # 只有一个查询且出错时，保持原来的纯提示文字
+    if len(queries) == 1 and isinstance(per_query[0], str):
+        return per_query[0]
+
+    kept = _dedup_candidates(queries, per_query, session)
+
+    # 并发爬取正文（已提供过的 URL 跳过）
+    all_candidates = [c for unique in kept for c in unique if not c["seen_as"]]
+
+    def fetch(c):
+        return get_page_content(c["link"], c.get("proxy", provider.page_proxy), c["query"],
+                                headers=c.get("headers", provider.page_headers))
+
+    fetch_started = time.monotonic()
+    if keep:
+        full_texts = fetch_first_k(all_candidates, fetch, keep, lambda text: len(text) > min_len,
+                                   group=lambda c: c["query"])
+    else:
+        full_texts = fetch_concurrently(all_candidates, fetch)
+    kept = _attach_full_texts(kept, all_candidates, full_texts, provider)
+
+    if crawl_pages:
+        deadline = min(CRAWL_DEADLINE, STEP_DEADLINE - (time.monotonic() - fetch_started))
+        found = crawl(_crawl_parents(kept), fetch, crawl_pages, deadline=deadline,
+                      exclude=[c["link"] for unique in kept for c in unique],
+                      skip=session.lookup_url if session else None)
+        kept = _attach_subpages(kept, found, min_len)
+
+    return _assemble_report(queries, per_query, kept, provider, session)
+
+
+def search_bocha(query, api_key):
+    return _build_report([query], BochaProvider(api_key))
+
+
+def search_google(query, api_key, cx_id):
+    return _build_report([query], GoogleProvider(api_key, cx_id))
+
+
+def search_ddg(query, proxy):
+    return _build_report([query], DDGProvider(proxy))
+
+
+def as_query_list(query):
+    """把模型给出的 query（字符串或列表）整理成去重后的关键词列表"""
+    raw = query if isinstance(query, list) else [query]
+    queries = []
+    for q in raw:
+        q = str(q).strip() if q else ""
+        if q and q not in queries:
+            queries.append(q)
+    return queries[:MAX_QUERIES_PER_STEP]
+
+
+def unified_search(query, source, bocha_key, google_key, google_cx, proxy, session=None,
+                   crawl_pages=CRAWL_MAX_PAGES):
+    """
+    统一搜索调度入口；query 可以是单个关键词，也可以是关键词列表（并行搜索、合并去重）。
+    session 为本次研究的 SessionSeen，用于跨步骤去重；crawl_pages 为每步额外抓取的子网页数。
+    """
+    queries = as_query_list(query)
+    if not queries:
+        return "⚠️ 搜索关键词为空"
+    provider = get_provider(source, bocha_key, google_key, google_cx, proxy)
+    if provider is None:
+        return "无效的搜索源"
+    return _build_report(queries, provider, session, crawl_pages)
+
+
+# ================= [核心：Agent 逻辑 (生成器)] =================
+
+def _format_search_action(query):
+    return "🔎 **执行搜索**: " + " ｜ ".join(f"`{q}`" for q in as_query_list(query))
+
+
+_THOUGHT_PARAM = {"type": "string", "description": "结构化思考过程：[分析]、[评估]、[决策] 三段，用换行分隔"}
+
+# 工具调用模式下的两个决策工具，参数与 JSON 模式的字段一致（thought 放在最前，便于流式展示）
+DECISION_TOOLS = [
+    {"type": "function", "function": {
+        "name": "search",
+        "description": "联网搜索，补充或核实信息",
+        "parameters": {"type": "object", "properties": {
+            "thought": _THOUGHT_PARAM,
+            "query": {"type": "array", "items": {"type": "string"},
+                      "description": f"搜索关键词（要具体）；互不依赖的多个事实可给出多个，最多 {MAX_QUERIES_PER_STEP} 个，将并行搜索"},
+        }, "required": ["thought", "query"]},
+    }},
+    {"type": "function", "function": {
+        "name": "finish",
+        "description": "信息已充分，给出最终答案",
+        "parameters": {"type": "object", "properties": {
+            "thought": _THOUGHT_PARAM,
+            "answer": {"type": "string", "description": "最终答案，需详尽、结构化并引用来源"},
+        }, "required": ["thought", "answer"]},
+    }},
+]
+
+
+def _system_prompt(source, tool_mode=False):
+    """
+    系统提示的固定部分。当前时间不放在这里，而由 _time_note() 追加在末尾：
+    前缀逐字节不变，服务端的前缀缓存可以命中，本地 LLM 缓存的键也不随时间变化。
+    """
+    source_name = {1: "Bocha", 2: "Google", 3: "DuckDuckGo", 4: "Bocha + Google + DuckDuckGo 联合搜索"}.get(source, "Unknown")
+
+    if tool_mode:
+        output_format = """【输出方式】：
+    每一步必须调用且只调用一个工具：需要更多信息时调用 search，信息充分时调用 finish。
+    工具参数 thought 按上面的思考结构填写。"""
+    else:
+        output_format = f"""【输出格式 (严格 JSON)】：
+    {{
+        "thought": "你的结构化思考过程...",
+        "action": "search" 或 "finish",
+        "query": "搜索关键词 (仅当 action=search 时，关键词要具体)；若需同时查证多个互不依赖的事实，可写成关键词列表 [\"关键词1\", \"关键词2\"]（最多 {MAX_QUERIES_PER_STEP} 个，将并行搜索）",
+        "answer": "最终答案 (仅当 action=finish 时，需详尽、结构化并引用来源)"
+    }}"""
+
+    # 🔥 深度思考的 System Prompt
+    system_prompt = f"""
+    你是一个具备深度联网搜索能力的智能研究员，当前搜索引擎：{source_name}。
+
+    【思维模式】：
+    你必须展现出显式的“思维链 (Chain of Thought)”。在执行任何操作前，先进行深度的逻辑分析。
+
+    【思考结构】：
+    你的 `thought` 字段必须包含以下段落（用换行分隔）：
+    1. **[分析]**：当前已知什么？还需要查什么？
+    2. **[评估]**：之前的搜索结果可信吗？是否有矛盾？
+    3. **[决策]**：下一步具体做什么？为什么？
+
+    {output_format}
+    """
+    return system_prompt
+
+
+def _time_note():
+    """追加在系统提示末尾的当前时间"""
+    return f"当前时间：{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+def _llm_request(model, messages, tool_mode=False):
+    """决策调用的请求参数：JSON 模式要求输出 JSON 对象，工具调用模式提供 search / finish 两个工具"""
+    request = dict(
+        model=model,
+        messages=messages,
+        temperature=0.3,  # 较低温度保持逻辑严密
+        max_tokens=2000,  # 允许长思考
+        stream=True
+    )
+    if tool_mode:
+        request.update(tools=DECISION_TOOLS, tool_choice="auto")
+    else:
+        request["response_format"] = {"type": "json_object"}
+    return request
+
+
+def _parse_decision(text):
+    """宽松解析一段决策文本（严格解析 → 修复 → 增量字段），无法解析返回 None"""
+    parser = StreamingJSONParser()
+    parser.feed(text)
+    try:
+        decision = parser.result()
+    except ValueError:
+        return None
+    return decision if isinstance(decision, dict) else None
+
+
+def _usable(decision):
+    """决策是否可以直接执行：search 需有关键词，finish 需有答案"""
+    if not decision:
+        return False
+    if decision.get("action") == "search":
+        return bool(as_query_list(decision.get("query")))
+    if decision.get("action") == "finish":
+        return bool(decision.get("answer"))
+    return False
+
+
+def _repair_request(model, raw):
+    """
+    低成本重问：只把本次格式有误的原始输出交给模型改写为合法 JSON，不带研究上下文，
+    代价远低于带着完整上下文重新生成整步。
+    """
+    return dict(
+        model=model,
+        messages=[
+            {"role": "system", "content": "下面是一段本应为 JSON 对象的输出，但格式有误或缺少字段。"
+                                          "请只修复格式、原样保留内容，输出一个 JSON 对象："
+                                          '{"thought": "...", "action": "search" 或 "finish", '
+                                          '"query": ["关键词", ...]（action=search 时）, '
+                                          '"answer": "..."（action=finish 时）}'},
+            {"role": "user", "content": raw[:REPAIR_INPUT_CHARS]},
+        ],
+        temperature=0,
+        response_format={"type": "json_object"},
+        max_tokens=2000,
+    )
+
+
+class _DecisionStream:
+    """
+    把 LLM 的流式输出转换为事件：thought / answer 片段，以及一完整就推送的 thought 与搜索动作。
+    JSON 模式解析正文；工具调用模式解析第一个工具调用的参数，动作由工具名决定
+    （模型没有调用工具而是直接输出 JSON 正文时，按 JSON 模式处理）。
+    """
+
+    def __init__(self):
+        self.parser = StreamingJSONParser()
+        self.streamed = {"thought": "", "answer": ""}
+        self.thought_sent = False
+        self.action_sent = False
+        self.tool_name = None
+
+    def feed_delta(self, delta):
+        """喂入一个流式分片的 delta（正文或工具调用），返回由此产生的事件列表"""
+        events = []
+        for tool_call in getattr(delta, "tool_calls", None) or []:
+            if tool_call.index or not tool_call.function:
+                continue  # 只取第一个工具调用
+            if self.tool_name is None:
+                # 工具调用之前的正文只是开场白，参数从头解析
+                self.tool_name = tool_call.function.name or ""
+                self.parser = StreamingJSONParser()
+            elif tool_call.function.name:
+                self.tool_name = tool_call.function.name
+            events += self.feed(tool_call.function.arguments or "")
+        if delta.content and self.tool_name is None:
+            events += self.feed(delta.content)
+        return events
+
+    def action(self):
+        return self.tool_name or self.parser.fields.get("action")
+
+    def decision(self):
+        """流结束后的决策，无法解析时返回 None"""
+        try:
+            decision = self.parser.result()
+        except ValueError:
+            return None
+        if not isinstance(decision, dict):
+            return None
+        if self.tool_name:
+            decision.setdefault("action", self.tool_name)
+        return decision
+
+    def feed(self, text):
+        """喂入一个分片，返回由此产生的事件列表"""
+        parser = self.parser
+        parser.feed(text)
+        events = []
+
+        for field in ("thought", "answer"):
+            partial = parser.partial(field)
+            if partial and len(partial) > len(self.streamed[field]):
+                events.append({"type": f"{field}_delta", "content": partial[len(self.streamed[field]):]})
+                self.streamed[field] = partial
+
+        # 1. 思考过程完整后立即推送
+        if not self.thought_sent and parser.is_complete("thought"):
+            events.append({"type": "thought", "content": parser.fields["thought"]})
+            self.thought_sent = True
+
+        # 2. 搜索动作和关键词一确定就推送，不必等剩余 token
+        if self.thought_sent and not self.action_sent and self.action() == "search" \
+                and as_query_list(parser.fields.get("query")):
+            events.append({"type": "action", "content": _format_search_action(parser.fields["query"])})
+            self.action_sent = True
+        return events
+
+
+def _max_steps_event():
+    return {"type": "final_answer", "content": "🛑 已达到最大步数，停止搜索。以下是基于现有信息的总结。"}
+
+
+class _ResearchSession:
+    """
+    一次研究的对话历史、上下文裁剪、跨步骤来源去重与分段计时，以及每步中与 I/O 无关的处理：
+    推送状态、处理流式分片、解析 / 修复决策、拼装下一轮对话。
+    同步主循环（run_agent_generator）与异步主循环（drs.async_agent）共用，各自只负责 LLM 调用与搜索。
+    """
+
+    def __init__(self, question, model, source, tool_mode=False, context_budget=CONTEXT_TOKEN_BUDGET):
+        self.model = model
+        self.source = source
+        self.tool_mode = tool_mode
+        self.time_note = _time_note()
+        self.messages = [
+            {"role": "system", "content": _system_prompt(source, tool_mode) + self.time_note},
+            {"role": "user", "content": f"请解决这个问题：{question}"}
+        ]
+        self.context = ContextManager(budget=context_budget)
+        # 本次研究已提供给模型的来源，跨步骤去重
+        self.seen_sources = SessionSeen()
+        # 分段计时：每步结束时以 trace 事件推送本步的 span
+        self.tracer = Tracer()
+        self.step = 0
+
+    def start_step(self):
+        """开始新的一步，返回状态事件"""
+        self.step += 1
+        self.step_span = self.tracer.start(f"第 {self.step} 步", "step", step=self.step)
+        self.decision_stream = _DecisionStream()
+        self.decision = None
+        return {"type": "status_update", "content": f"⚡ 正在进行第 {self.step} 步深度推理..."}
+
+    def end_step(self):
+        self.step_span.finish()
+        return {"type": "trace", "content": self.tracer.drain()}
+
+    def fit(self):
+        """按预算压缩较早的历史，完整历史保留在 messages 中"""
+        return self.context.fit(self.messages)
+
+    def llm_request(self, fitted):
+        """本步的流式 LLM 请求（fitted 为 fit() 的结果），同时开始计时"""
+        self.fitted = fitted
+        self.usage = None
+        self.llm_span = self.tracer.start("llm", "llm", self.step_span, model=self.model)
+        return _llm_request(self.model, fitted, self.tool_mode)
+
+    def feed_chunk(self, chunk):
+        """处理一个流式分片，返回要推送的 thought / answer 片段等事件"""
+        # 部分服务在最后一个分片里附带 usage
+        if getattr(chunk, "usage", None):
+            self.usage = chunk.usage
+        if not chunk.choices:
+            return []
+        delta = chunk.choices[0].delta
+        if not delta.content and not getattr(delta, "tool_calls", None):
+            return []
+        if "ttft" not in self.llm_span.attrs:
+            self.llm_span.set(ttft=round(time.perf_counter() - self.llm_span.start, 3))
+        return self.decision_stream.feed_delta(delta)
+
+    def llm_failed(self, error):
+        """LLM 调用失败，返回结束本次研究的事件"""
+        self.llm_span.set(error=str(error)[:200])
+        self.llm_span.finish()
+        return [self.end_step(), {"type": "error", "content": f"❌ 模型调用失败: {error}"}]
+
+    def llm_done(self):
+        """
+        流式响应结束：记录 token 用量并解析决策（严格解析 → 本地修复 → 增量字段）。
+        :return: 决策仍不可用时只带原始输出重问的请求，否则为 None
+        """
+        content = self.decision_stream.parser.buffer
+        if self.usage is not None:
+            self.llm_span.set(prompt_tokens=self.usage.prompt_tokens, completion_tokens=self.usage.completion_tokens)
+        else:
+            self.llm_span.set(prompt_tokens_est=sum(estimate_tokens(m["content"]) for m in self.fitted),
+                              completion_tokens_est=estimate_tokens(content))
+        self.llm_span.finish()
+
+        self.content = content
+        self.decision = self.decision_stream.decision()
+        if not _usable(self.decision) and content.strip():
+            return _repair_request(self.model, content)
+        return None
+
+    @contextmanager
+    def repair_span(self):
+        with self.tracer.activate(self.step_span), span("repair", "llm", model=self.model) as s:
+            yield s
+
+    def repaired(self, text, s):
+        """采用重问得到的决策（可用，或原决策完全无法解析时）"""
+        repaired = _parse_decision(text)
+        s.set(usable=_usable(repaired))
+        if _usable(repaired) or self.decision is None:
+            self.decision = repaired
+
+    def decide(self):
+        """
+        按本步决策给出 (要推送的事件, 要执行的搜索查询, 是否结束本次研究)。
+        查询不为空时由主循环在 search_span() 中执行搜索，再把结果交给 searched()。
+        """
+        decision = self.decision
+        if decision is None:
+            return [self.end_step(), {"type": "error",
+                                      "content": f"❌ 模型输出无法解析为 JSON: {self.content[:200]}"}], None, True
+        # 历史中统一保存规整后的 JSON（修复过的输出不再带着错误格式回放；工具调用模式也不必回放 tool_calls）
+        self.content = json.dumps(decision, ensure_ascii=False)
+
+        events = []
+        if not self.decision_stream.thought_sent:
+            events.append({"type": "thought", "content": decision.get("thought", "（未返回思考过程）")})
+
+        action = decision.get("action", "")
+        if action == "search":
+            queries = as_query_list(decision.get("query"))
+            if not queries:
+                events += [self.end_step(), {"type": "error", "content": "⚠️ 生成了空的搜索词，尝试跳过..."}]
+                return events, None, False
+            if not self.decision_stream.action_sent:
+                events.append({"type": "action", "content": _format_search_action(queries)})
+            return events, queries, False
+
+        if action == "finish":
+            events += [self.end_step(), {"type": "final_answer", "content": decision.get("answer")}]
+        else:
+            events += [self.end_step(), {"type": "error", "content": f"⚠️ 未知动作: {action}"}, _max_steps_event()]
+        return events, None, True
+
+    @contextmanager
+    def search_span(self, queries):
+        self.seen_sources.step = self.step
+        with self.tracer.activate(self.step_span), span("search", "search", source=self.source, queries=queries):
+            yield
+
+    def searched(self, tool_output):
+        """推送工具结果并把本轮决策与结果加入对话历史，返回要推送的事件"""
+        self.messages.append({"role": "assistant", "content": self.content})
+        self.messages.append({"role": "user", "content": f"【搜索工具返回数据】:\n{tool_output}"})
+        return [{"type": "tool_output", "content": tool_output}, self.end_step()]
+
+
+def run_agent_generator(question, api_key, base_url, model, source, bocha_k, google_k, google_c, proxy, max_steps,
+                        context_budget=CONTEXT_TOKEN_BUDGET, llm_client=None, tool_mode=False, llm_cache=None,
+                        crawl_pages=CRAWL_MAX_PAGES):
+    """
+    Agent 主逻辑：通过 yield 返回流式状态更新
+    每步结束时额外推送 {"type": "trace", "content": [span, ...]}，记录本步各环节耗时
+    llm_client 为调用方自行管理生命周期的 OpenAI 客户端（如 Streamlit 的 cache_resource），
+    不传时使用 drs.http_pool 中按 (api_key, base_url) 复用的客户端。
+    tool_mode 为 True 时改用 OpenAI 工具调用（search / finish）给出决策，否则要求输出 JSON 对象。
+    决策格式有误时先在本地修复，仍不可用再做一次只带原始输出的低成本重问，都失败才放弃。
+    llm_cache 为 LLM 响应缓存模式（off / cache / record / replay，见 drs.llm_cache），
+    不传时使用环境变量 DRS_LLM_CACHE 的设置。
+    crawl_pages 大于 0 时每次搜索再沿结果页面的链接抓取至多这么多个子网页。
+    每步与 I/O 无关的处理见 _ResearchSession，这里只负责调用 LLM 与搜索。
+    """
+    research = _ResearchSession(question, model, source, tool_mode, context_budget)
+    client = wrap_llm_client(llm_client or get_llm_client(api_key, base_url), llm_cache, ignore=(research.time_note,))
+
+    while research.step < max_steps:
+        yield research.start_step()
+
+        # 流式调用大模型：边生成边推送 thought / answer 片段，字段一完整就推送对应事件
+        request = research.llm_request(research.fit())
+        try:
+            for chunk in client.chat.completions.create(**request):
+                for event in research.feed_chunk(chunk):
+                    yield event
+        except Exception as e:
+            for event in research.llm_failed(e):
+                yield event
+            return
+
+        repair = research.llm_done()
+        if repair is not None:
+            with research.repair_span() as s:
+                try:
+                    resp = client.chat.completions.create(**repair)
+                    research.repaired(resp.choices[0].message.content or "", s)
+                except Exception as e:
+                    s.set(error=str(e)[:200])
+
+        events, queries, done = research.decide()
+        for event in events:
+            yield event
+        if done:
+            return
+        if queries:
+            # 多个关键词并行搜索，结果合并去重
+            with research.search_span(queries):
+                tool_output = unified_search(queries, source, bocha_k, google_k, google_c, proxy,
+                                             session=research.seen_sources, crawl_pages=crawl_pages)
+            for event in research.searched(tool_output):
+                yield event
+
+    yield _max_steps_event()
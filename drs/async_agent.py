@@ -0,0 +1,276 @@
+"""
+异步 Agent 引擎：在一个进程里同时跑几十个研究会话。
+
+run_agent_generator 全程同步：依次阻塞在 LLM 调用、搜索 API 和每个网页抓取上，
+N 个并发用户就要 N 个被阻塞的线程，而大部分时间都在等网络。这里用 AsyncOpenAI 与
+httpx.AsyncClient 重写同一套主循环，搜索源走 SearchProvider.acandidates()，
+网页抓取走 drs.fetcher 中的协程版本，事件协议与 run_agent_generator 完全相同
+（包括每步末尾的 trace 事件），只是改为异步生成器。
+缓存与配额的 SQLite 读写、段落挑选、近似重复检测和上下文裁剪都在线程中执行，事件循环只等待网络 I/O。
+
+全局并发由 AsyncAgent 持有的信号量限制：同时运行的会话数、同时进行的 LLM 流式调用数
+与同时抓取的网页数。一个 AsyncAgent 实例只能在一个事件循环中使用，用完调用 aclose()。
+
+用法：
+    agent = AsyncAgent()
+    async for event in agent.run(question, api_key, base_url, model, source, ...):
+        ...
+    await agent.aclose()
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+from drs.agent import (_ResearchSession, _assemble_report, _attach_full_texts, _attach_subpages, _crawl_parents,
+                       _dedup_candidates, _max_steps_event, as_query_list)
+from drs.context_manager import CONTEXT_TOKEN_BUDGET
+from drs.crawler import CRAWL_DEADLINE, CRAWL_MAX_PAGES, acrawl
+from drs.fetcher import STEP_DEADLINE, afetch_concurrently, afetch_first_k, aget_page_content, to_thread
+from drs.http_pool import HTTP2_AVAILABLE, LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE, MAX_LLM_CLIENTS, POOL_MAXSIZE
+from drs.llm_cache import wrap_llm_client
+from drs.providers import SEARCH_DEADLINE, SearchError, get_provider
+
+# ================= 配置区 =================
+
+# 同时运行的研究会话数，超出的会话排队等待
+MAX_SESSIONS = 32
+
+# 同时进行的 LLM 流式调用数
+MAX_CONCURRENT_LLM = 16
+
+# 同时抓取的网页数（所有会话共享）
+MAX_CONCURRENT_FETCHES = 32
+
+
+class AsyncAgent:
+    """持有异步客户端与全局并发限制，run() 可被多个协程同时调用"""
+
+    def __init__(self, max_sessions=MAX_SESSIONS, max_concurrent_llm=MAX_CONCURRENT_LLM,
+                 max_concurrent_fetches=MAX_CONCURRENT_FETCHES):
+        self.max_concurrent_fetches = max_concurrent_fetches
+        self._session_limit = asyncio.Semaphore(max_sessions)
+        self._llm_limit = asyncio.Semaphore(max_concurrent_llm)
+        self._fetch_limit = asyncio.Semaphore(max_concurrent_fetches)
+        self._api_client = None
+        self._page_clients = {}
+        self._llm_clients = OrderedDict()
+
+    # ---------- 客户端 ----------
+
+    def _get_api_client(self):
+        """搜索 API（Bocha / Google）共用的异步客户端"""
+        if self._api_client is None:
+            import httpx
+            self._api_client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_connections=POOL_MAXSIZE, max_keepalive_connections=POOL_MAXSIZE)
+            )
+        return self._api_client
+
+    def _get_page_client(self, proxy):
+        """按代理复用的网页抓取客户端；走代理时关闭证书校验，与同步抓取一致"""
+        client = self._page_clients.get(proxy)
+        if client is None:
+            import httpx
+            client = httpx.AsyncClient(
+                proxy=proxy or None,
+                verify=not proxy,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=self.max_concurrent_fetches,
+                                    max_keepalive_connections=self.max_concurrent_fetches)
+            )
+            self._page_clients[proxy] = client
+        return client
+
+    def _get_llm_client(self, api_key, base_url):
+        """按 (api_key, base_url) 复用的 LLM 客户端，与 drs.http_pool.get_llm_client 一样最多保留 MAX_LLM_CLIENTS 个"""
+        key = (api_key, base_url)
+        client = self._llm_clients.get(key)
+        if client is not None:
+            self._llm_clients.move_to_end(key)
+        else:
+            import httpx
+            from openai import AsyncOpenAI
+            http_client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE)
+            )
+            client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+            self._llm_clients[key] = client
+            while len(self._llm_clients) > MAX_LLM_CLIENTS:
+                # 淘汰的客户端可能仍有流式调用在进行，不主动关闭，由垃圾回收释放连接
+                self._llm_clients.popitem(last=False)
+        return client
+
+    async def aclose(self):
+        """关闭所有连接池"""
+        clients = list(self._page_clients.values())
+        if self._api_client is not None:
+            clients.append(self._api_client)
+        for client in clients:
+            await client.aclose()
+        for client in self._llm_clients.values():
+            await client.close()
+        self._api_client = None
+        self._page_clients = {}
+        self._llm_clients = OrderedDict()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    # ---------- 搜索 ----------
+
+    async def _fetch_page(self, c, provider):
+        proxy = c.get("proxy", provider.page_proxy)
+        async with self._fetch_limit:
+            return await aget_page_content(self._get_page_client(proxy), c["link"], proxy, c["query"],
+                                           headers=c.get("headers", provider.page_headers))
+
+    async def _build_report(self, queries, provider, session=None, crawl_pages=CRAWL_MAX_PAGES):
+        """drs.agent._build_report 的异步版本"""
+        min_len, keep = provider.min_len, provider.keep
+
+        async def collect(query):
+            try:
+                return await provider.acandidates(query, self._get_api_client())
+            except SearchError as e:
+                return str(e)
+
+        if len(queries) == 1:
+            per_query = [await collect(queries[0])]
+        else:
+            per_query = await afetch_concurrently(queries, collect, deadline=SEARCH_DEADLINE)
+
+        if len(queries) == 1 and isinstance(per_query[0], str):
+            return per_query[0]
+
+        kept = _dedup_candidates(queries, per_query, session)
+        all_candidates = [c for unique in kept for c in unique if not c["seen_as"]]
+
+        def fetch(c):
+            return self._fetch_page(c, provider)
+
+        fetch_started = time.monotonic()
+        if keep:
+            full_texts = await afetch_first_k(all_candidates, fetch, keep, lambda text: len(text) > min_len,
+                                              deadline=STEP_DEADLINE, group=lambda c: c["query"])
+        else:
+            full_texts = await afetch_concurrently(all_candidates, fetch)
+        kept = _attach_full_texts(kept, all_candidates, full_texts, provider)
+
+        if crawl_pages:
+            deadline = min(CRAWL_DEADLINE, STEP_DEADLINE - (time.monotonic() - fetch_started))
+            found = await acrawl(_crawl_parents(kept), fetch, crawl_pages, deadline=deadline,
+                                 exclude=[c["link"] for unique in kept for c in unique],
+                                 skip=session.lookup_url if session else None)
+            kept = _attach_subpages(kept, found, min_len)
+
+        # 近似重复检测要对每篇正文计算 simhash，放到线程中执行
+        return await to_thread(_assemble_report, queries, per_query, kept, provider, session)
+
+    async def unified_search(self, query, source, bocha_key, google_key, google_cx, proxy, session=None,
+                             crawl_pages=CRAWL_MAX_PAGES):
+        """drs.agent.unified_search 的异步版本"""
+        queries = as_query_list(query)
+        if not queries:
+            return "⚠️ 搜索关键词为空"
+        provider = get_provider(source, bocha_key, google_key, google_cx, proxy)
+        if provider is None:
+            return "无效的搜索源"
+        return await self._build_report(queries, provider, session, crawl_pages)
+
+    # ---------- LLM ----------
+
+    async def _pump_llm(self, client, request, out):
+        """在 LLM 并发名额内读完整个流式响应，chunk 依次放入 out；正常结束放入 None，出错时放入异常"""
+        try:
+            async with self._llm_limit:
+                stream = await client.chat.completions.create(**request)
+                async for chunk in stream:
+                    out.put_nowait(chunk)
+        except Exception as e:
+            out.put_nowait(e)
+            return
+        out.put_nowait(None)
+
+    async def _stream_llm(self, client, request):
+        """
+        逐个产出流式响应的 chunk。上游由后台任务读取，LLM 并发名额只在读取期间占用，
+        下游消费得慢（如 SSE 客户端不再读取）也不会一直占着名额；提前关闭时取消后台任务。
+        """
+        out = asyncio.Queue()
+        task = asyncio.ensure_future(self._pump_llm(client, request, out))
+        try:
+            while True:
+                item = await out.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            task.cancel()
+
+    # ---------- 主循环 ----------
+
+    async def run(self, question, api_key, base_url, model, source, bocha_k, google_k, google_c, proxy, max_steps,
+                  context_budget=CONTEXT_TOKEN_BUDGET, tool_mode=False, llm_cache=None,
+                  crawl_pages=CRAWL_MAX_PAGES):
+        """
+        与 run_agent_generator 参数和事件协议相同的异步生成器。
+        同时运行的会话超过上限时，在产生第一个事件前排队等待。
+        """
+        async with self._session_limit:
+            async for event in self._run(question, api_key, base_url, model, source, bocha_k, google_k, google_c,
+                                         proxy, max_steps, context_budget, tool_mode, llm_cache, crawl_pages):
+                yield event
+
+    async def _run(self, question, api_key, base_url, model, source, bocha_k, google_k, google_c, proxy, max_steps,
+                   context_budget, tool_mode, llm_cache, crawl_pages):
+        """与 run_agent_generator 相同的主循环（每步的处理见 drs.agent._ResearchSession），只是 I/O 改为协程"""
+        research = _ResearchSession(question, model, source, tool_mode, context_budget)
+        client = wrap_llm_client(self._get_llm_client(api_key, base_url), llm_cache, ignore=(research.time_note,),
+                                 is_async=True)
+
+        while research.step < max_steps:
+            yield research.start_step()
+
+            request = research.llm_request(await to_thread(research.fit))
+            chunks = self._stream_llm(client, request)
+            try:
+                async for chunk in chunks:
+                    for event in research.feed_chunk(chunk):
+                        yield event
+            except Exception as e:
+                for event in research.llm_failed(e):
+                    yield event
+                return
+            finally:
+                await chunks.aclose()
+
+            repair = research.llm_done()
+            if repair is not None:
+                with research.repair_span() as s:
+                    try:
+                        async with self._llm_limit:
+                            resp = await client.chat.completions.create(**repair)
+                        research.repaired(resp.choices[0].message.content or "", s)
+                    except Exception as e:
+                        s.set(error=str(e)[:200])
+
+            events, queries, done = research.decide()
+            for event in events:
+                yield event
+            if done:
+                return
+            if queries:
+                with research.search_span(queries):
+                    tool_output = await self.unified_search(queries, source, bocha_k, google_k, google_c, proxy,
+                                                            session=research.seen_sources, crawl_pages=crawl_pages)
+                for event in research.searched(tool_output):
+                    yield event
+
+        yield _max_steps_event()
@@ -0,0 +1,98 @@
+"""
+命令行入口：在终端里运行 run_agent_generator，边生成边打印思考过程和答案。
+
+三个 "* search.py" 脚本只是填好配置后调用这里的 run_cli；
+也可以直接 python -m drs "问题" --source 1 使用。
+"""
+import argparse
+import os
+import sys
+
+from drs.context_manager import CONTEXT_TOKEN_BUDGET
+
+SOURCE_NAMES = {1: "Bocha", 2: "Google", 3: "DuckDuckGo", 4: "联合搜索"}
+
+# 工具输出在终端里只打印开头
+TOOL_OUTPUT_PREVIEW_CHARS = 600
+
+
+def run_cli(question, source, api_key, base_url, model, bocha_key="", google_key="", google_cx="", proxy=None,
+            max_steps=10, context_budget=CONTEXT_TOKEN_BUDGET, tool_mode=False, llm_cache=None,
+            crawl_pages=0):
+    """运行一次研究并打印过程，返回最终答案（失败时返回 None）"""
+    # 按需导入，python -m drs --help 不必加载整个 Agent
+    from drs.agent import run_agent_generator
+
+    print("=" * 60)
+    print(f"Agent 启动 | 搜索源: {SOURCE_NAMES.get(source, source)} | 目标问题: {question}")
+    print("=" * 60)
+
+    final_answer = None
+    streaming = None  # 正在逐字打印的字段（thought / answer）
+    for event in run_agent_generator(question, api_key, base_url, model, source, bocha_key, google_key, google_cx,
+                                     proxy, max_steps, context_budget=context_budget, tool_mode=tool_mode,
+                                     llm_cache=llm_cache, crawl_pages=crawl_pages):
+        kind, content = event["type"], event["content"]
+        if kind in ("thought_delta", "answer_delta"):
+            field = kind[:-len("_delta")]
+            if streaming != field:
+                print("\n   [思维链]: " if field == "thought" else "\n" + "=" * 30 + " 🏁 最终结论 " + "=" * 30)
+                streaming = field
+            print(content, end="", flush=True)
+            continue
+        if kind == "trace":
+            continue
+
+        if kind == "status_update":
+            print(f"\n{content}")
+        elif kind == "thought":
+            if streaming != "thought":
+                print(f"   [思维链]: {content}")
+            print()
+        elif kind == "action":
+            print(f"   {content}")
+        elif kind == "tool_output":
+            preview = content[:TOOL_OUTPUT_PREVIEW_CHARS].replace("\n", " ")
+            print(f"   📄 {preview}{'...' if len(content) > TOOL_OUTPUT_PREVIEW_CHARS else ''}")
+        elif kind == "error":
+            print(f"   {content}")
+        elif kind == "final_answer":
+            final_answer = content
+            if streaming != "answer":
+                print("\n" + "=" * 30 + " 🏁 最终结论 " + "=" * 30)
+                print(content)
+            else:
+                print()
+        streaming = None
+    return final_answer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m drs", description="DeepRecursive-Search 命令行")
+    parser.add_argument("question", help="要研究的问题")
+    parser.add_argument("--source", type=int, default=1, choices=sorted(SOURCE_NAMES),
+                        help="1=Bocha 2=Google 3=DuckDuckGo 4=联合搜索")
+    parser.add_argument("--max-steps", type=int, default=10)
+    parser.add_argument("--context-budget", type=int, default=CONTEXT_TOKEN_BUDGET)
+    parser.add_argument("--tools", action="store_true", help="用工具调用（search / finish）代替 JSON 输出给出决策")
+    parser.add_argument("--crawl", type=int, default=0, metavar="N",
+                        help="每次搜索再沿结果页面中的链接抓取至多 N 个相关子网页（默认关闭）")
+    parser.add_argument("--llm-cache", default=None, choices=["off", "cache", "record", "replay"],
+                        help="LLM 响应缓存：cache=读写缓存 record=录制 replay=只回放（默认取环境变量 DRS_LLM_CACHE）")
+    parser.add_argument("--model", default="Qwen/Qwen3-235B-A22B-Instruct-2507")
+    parser.add_argument("--base-url", default="https://api.siliconflow.cn/v1")
+    parser.add_argument("--api-key", default=os.environ.get("SILICONFLOW_API_KEY", ""))
+    parser.add_argument("--bocha-key", default=os.environ.get("BOCHA_API_KEY", ""))
+    parser.add_argument("--google-key", default=os.environ.get("GOOGLE_API_KEY", ""))
+    parser.add_argument("--google-cx", default=os.environ.get("GOOGLE_CX", ""))
+    parser.add_argument("--proxy", default=os.environ.get("DRS_PROXY", ""))
+    args = parser.parse_args(argv)
+
+    answer = run_cli(args.question, args.source, args.api_key, args.base_url, args.model, args.bocha_key,
+                     args.google_key, args.google_cx, args.proxy or None, args.max_steps, args.context_budget,
+                     args.tools, args.llm_cache, args.crawl)
+    return 0 if answer else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
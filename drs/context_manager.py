@@ -0,0 +1,107 @@
+"""
+按 Token 预算压缩 Agent 对话历史。
+
+每一步搜索都会把完整的工具输出追加进 messages，且从不删除，
+到第 8~15 步时每次调用 LLM 都要重发几万 token，延迟和费用随深度二次增长。
+这里在每次调用前生成一份受预算约束的消息列表（完整历史保持不变）：
+系统提示、用户问题和最近几步原样保留，更早的工具输出逐级压缩为
+“标题 + 链接 + 开头要点”，再不够就只保留标题和链接，来源 URL 始终可见。
+"""
+import json
+import re
+
+# ================= 配置区 =================
+
+# 每次调用 LLM 时消息列表的 Token 预算（估算值）
+CONTEXT_TOKEN_BUDGET = 24000
+
+# 最近多少步（assistant + 工具输出 为一步）原样保留
+KEEP_RECENT_STEPS = 2
+
+# 一级压缩时每个来源保留的正文字符数
+CONDENSED_SNIPPET_CHARS = 200
+
+# 压缩后的 thought 保留字符数
+CONDENSED_THOUGHT_CHARS = 150
+
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+_SOURCE_RE = re.compile(r"--- 来源 (\d+): (.*?) ---\n链接: (.*?)\n内容: (.*?)(?=\n+(?:--- 来源 |针对查询 )|\s*$)", re.S)
+
+
+def estimate_tokens(text):
+    """粗略估算 token 数：中日韩字符约 1 token/字，其余约 4 字符/token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def _condense_tool_output(content, level):
+    """
+    压缩一条工具输出。
+    level 1：每个来源保留标题、链接和正文开头；level 2：只保留标题和链接。
+    无法识别来源结构时按字符截断。
+    """
+    sources = _SOURCE_RE.findall(content)
+    if not sources:
+        limit = CONDENSED_SNIPPET_CHARS * (3 if level == 1 else 1)
+        return content if len(content) <= limit else content[:limit] + "...（已压缩）"
+
+    # 保留首行（如 "【搜索工具返回数据】:" 与 "针对查询 ... 的结果："）
+    head = content[:content.index("--- 来源 ")].rstrip()
+    lines = [head, "（较早的搜索结果，已压缩）"] if head else ["（较早的搜索结果，已压缩）"]
+    for index, title, link, body in sources:
+        if level == 1:
+            snippet = body.strip()[:CONDENSED_SNIPPET_CHARS]
+            lines.append(f"--- 来源 {index}: {title} ---\n链接: {link}\n要点: {snippet}...")
+        else:
+            lines.append(f"- 来源 {index}: {title} | {link}")
+    return "\n".join(lines)
+
+
+def _condense_assistant(content):
+    """压缩较早的 assistant 决策：保留动作与关键词，思考过程只留开头"""
+    try:
+        decision = json.loads(content.replace("```json", "").replace("```", "").strip())
+    except ValueError:
+        return content[:CONDENSED_THOUGHT_CHARS * 2]
+    thought = decision.get("thought", "")
+    if len(thought) > CONDENSED_THOUGHT_CHARS:
+        decision["thought"] = thought[:CONDENSED_THOUGHT_CHARS] + "..."
+    return json.dumps(decision, ensure_ascii=False)
+
+
+class ContextManager:
+    """
+    在不修改完整历史的前提下，为每次 LLM 调用生成不超过预算的消息列表。
+    约定 messages[0] 为系统提示、messages[1] 为用户问题，其后每两条为一步。
+    """
+
+    def __init__(self, budget=CONTEXT_TOKEN_BUDGET, keep_recent=KEEP_RECENT_STEPS):
+        self.budget = budget
+        self.keep_recent = keep_recent
+
+    def fit(self, messages):
+        fitted = [dict(m) for m in messages]
+        total = sum(estimate_tokens(m["content"]) for m in fitted)
+        if total <= self.budget:
+            return fitted
+
+        # 可压缩区间：问题之后、最近 keep_recent 步之前
+        protected_from = max(2, len(fitted) - 2 * self.keep_recent)
+        older = range(2, protected_from)
+
+        # 由旧到新逐级压缩：先压工具输出和思考，再只留标题与链接
+        for level in (1, 2):
+            for i in older:
+                if total <= self.budget:
+                    return fitted
+                msg = fitted[i]
+                before = estimate_tokens(msg["content"])
+                if msg["role"] == "assistant":
+                    if level == 1:
+                        msg["content"] = _condense_assistant(messages[i]["content"])
+                else:
+                    msg["content"] = _condense_tool_output(messages[i]["content"], level)
+                total += estimate_tokens(msg["content"]) - before
+        return fitted
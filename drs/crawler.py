@@ -0,0 +1,171 @@
+"""
+子网页抓取：沿已抓取结果页面中的链接再深入一层（或几层）。
+
+get_page_content 只读取搜索结果本身的 URL，页面里指向详情页、原始文档的链接都被丢弃。
+下载页面时外链已随正文写入网页缓存（见 drs.fetcher.extract_links），这里按当前查询给
+这些链接打分（锚文本与链接路径中的查询词、是否同站、路径像正文还是导航），
+在深度、页数与时间预算内并发抓取得分最高的几个，作为额外来源交给模型。
+子网页同样走 get_page_content，命中网页缓存时不再下载；不增加任何 LLM 调用。
+"""
+import re
+import time
+from urllib.parse import unquote, urlsplit
+
+from drs.domain_health import domain_of
+from drs.fetcher import afetch_concurrently, fetch_concurrently, to_thread
+from drs.page_cache import get_page_cache, normalize_url
+from drs.passages import tokenize
+from drs.tracing import span
+
+# ================= 配置区 =================
+
+# 每步额外抓取的子网页总数，0 表示关闭
+CRAWL_MAX_PAGES = 0
+
+# 沿链接深入的层数
+CRAWL_DEPTH = 1
+
+# 每个页面最多展开的链接数
+CRAWL_PER_PAGE = 2
+
+# 子网页抓取的时限（秒），同时不超过本步剩余的抓取时间
+CRAWL_DEADLINE = 8
+
+# 打分权重：锚文本 / 链接路径中命中的查询词比例，同站与正文类路径的加分
+ANCHOR_WEIGHT = 3.0
+PATH_WEIGHT = 1.0
+SAME_SITE_BONUS = 0.5
+CONTENT_PATH_BONUS = 0.5
+
+# 路径中出现即跳过的导航、账号、分享类片段
+NAV_HINTS = ("/login", "/signin", "/signup", "/register", "/logout", "/account", "/user", "/about", "/contact",
+             "/privacy", "/terms", "/help", "/share", "/tag/", "/tags/", "/category/", "/search", "?page=")
+
+# 路径中出现即加分的正文类片段
+CONTENT_HINTS = ("/wiki/", "/article", "/news/", "/doc", "/post", "/p/", "/detail", "/blog", "/paper", "/abs/")
+
+# 不抓取的资源后缀
+SKIP_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".ico", ".css", ".js", ".zip", ".rar",
+                   ".7z", ".gz", ".exe", ".dmg", ".apk", ".mp3", ".mp4", ".avi", ".mov", ".flv")
+
+# 路径中的日期或长数字 ID（如 /2024/05/、/12345678.html）多为正文页
+_ID_PATH_RE = re.compile(r"/(19|20)\d{2}[/-]\d{1,2}|\d{5,}")
+
+
+def score_link(link, anchor, parent, query_tokens):
+    """
+    按查询给单个链接打分；与查询无关、导航类或非网页资源返回 None。
+    :param parent: 链接所在页面的 URL
+    :param query_tokens: tokenize(query) 的集合
+    """
+    parts = urlsplit(link)
+    path = unquote(parts.path).lower()
+    if path.endswith(SKIP_EXTENSIONS):
+        return None
+    target = path + "?" + parts.query.lower()
+    if any(hint in target for hint in NAV_HINTS):
+        return None
+    if not query_tokens:
+        return None
+
+    anchor_hits = len(query_tokens & set(tokenize(anchor)))
+    path_hits = len(query_tokens & set(tokenize(re.sub(r"[/_\-.+]", " ", path))))
+    if not anchor_hits and not path_hits:
+        return None
+
+    score = (ANCHOR_WEIGHT * anchor_hits + PATH_WEIGHT * path_hits) / len(query_tokens)
+    if domain_of(link) == domain_of(parent):
+        score += SAME_SITE_BONUS
+    if any(hint in path for hint in CONTENT_HINTS) or _ID_PATH_RE.search(path):
+        score += CONTENT_PATH_BONUS
+    return score
+
+
+def select_links(parents, exclude, limit, per_page=CRAWL_PER_PAGE, skip=None):
+    """
+    从各页面记录的外链中选出得分最高的 limit 个（每页最多 per_page 个），按页面所属查询打分。
+    :param parents: 已抓取的页面 [{"link", "query", ...}]
+    :param exclude: 不再抓取的规范化 URL 集合（选中的链接会加入其中）
+    :param skip: skip(url) 为真的链接不抓取（如本次研究已提供过的来源）
+    :return: [{"link", "title", "snippet", "query", "parent", "score"}]，按得分从高到低
+    """
+    if limit <= 0:
+        return []
+    cache = get_page_cache()
+    tokens = {}
+    scored = []
+    for parent in parents:
+        query = parent["query"]
+        if query not in tokens:
+            tokens[query] = set(tokenize(query))
+        ranked = []
+        for link, anchor in cache.get_links(parent["link"]) or []:
+            if normalize_url(link) in exclude or (skip and skip(link)):
+                continue
+            score = score_link(link, anchor, parent["link"], tokens[query])
+            if score is not None:
+                ranked.append((score, link, anchor))
+        ranked.sort(key=lambda item: -item[0])
+        for score, link, anchor in ranked[:per_page]:
+            child = {"link": link, "title": anchor or link, "snippet": anchor, "query": query,
+                     "parent": parent["link"], "score": round(score, 3)}
+            # 子网页沿用所在页面的抓取方式（代理、请求头）
+            child.update((k, parent[k]) for k in ("proxy", "headers") if k in parent)
+            scored.append(child)
+
+    scored.sort(key=lambda c: -c["score"])
+    picks = []
+    for c in scored:
+        key = normalize_url(c["link"])
+        if key in exclude:
+            continue
+        exclude.add(key)
+        picks.append(c)
+        if len(picks) >= limit:
+            break
+    return picks
+
+
+def crawl(parents, fetch_func, max_pages=CRAWL_MAX_PAGES, depth=CRAWL_DEPTH, deadline=CRAWL_DEADLINE,
+          exclude=(), skip=None):
+    """
+    逐层抓取子网页，总页数、层数与总时限任一耗尽即停止。
+    :param parents: 已抓取的页面 [{"link", "query", ...}]，子网页按所在页面的查询打分
+    :param fetch_func: 单个子网页的抓取函数，签名 fetch_func(candidate) -> str
+    :param exclude: 不再抓取的 URL（如本步的其他候选）
+    :param skip: 见 select_links
+    :return: 抓到正文的子网页 [{"link", "title", "snippet", "query", "parent", "score", "full_text"}]
+    """
+    deadline_at = time.monotonic() + deadline
+    seen = {normalize_url(url) for url in exclude} | {normalize_url(p["link"]) for p in parents}
+    found = []
+    frontier = parents
+    for level in range(1, depth + 1):
+        remaining = deadline_at - time.monotonic()
+        picks = select_links(frontier, seen, max_pages - len(found), skip=skip)
+        if not picks or remaining <= 0:
+            break
+        with span("crawl", "crawl", depth=level, pages=len(picks)):
+            texts = fetch_concurrently(picks, fetch_func, deadline=remaining)
+        frontier = [dict(c, full_text=text) for c, text in zip(picks, texts) if text]
+        found += frontier
+    return found
+
+
+async def acrawl(parents, fetch_func, max_pages=CRAWL_MAX_PAGES, depth=CRAWL_DEPTH, deadline=CRAWL_DEADLINE,
+                 exclude=(), skip=None):
+    """crawl 的异步版本，fetch_func(candidate) 返回协程；挑选链接要读网页缓存，放到线程中执行"""
+    deadline_at = time.monotonic() + deadline
+    seen = {normalize_url(url) for url in exclude} | {normalize_url(p["link"]) for p in parents}
+    found = []
+    frontier = parents
+    for level in range(1, depth + 1):
+        remaining = deadline_at - time.monotonic()
+        picks = await to_thread(select_links, frontier, seen, max_pages - len(found), CRAWL_PER_PAGE, skip)
+        if not picks or remaining <= 0:
+            break
+        with span("crawl", "crawl", depth=level, pages=len(picks)):
+            texts = await afetch_concurrently(picks, fetch_func, deadline=remaining)
+        frontier = [dict(c, full_text=text) for c, text in zip(picks, texts) if text]
+        found += frontier
+    return found
@@ -0,0 +1,77 @@
+"""
+研究会话内的来源去重：同一 URL 或镜像到多个域名的同一篇文章只交给模型一次。
+
+一次 run_agent_generator 里，同一个页面经常被不同查询反复搜到并整段贴进上下文。
+这里按规范化 URL 和正文 SimHash 指纹记录已提供过的来源，再次出现时
+只返回一句“已在第 N 步来源 X 中提供”，既省抓取时间也省 prompt token。
+"""
+import hashlib
+from collections import Counter
+
+from drs.page_cache import normalize_url
+from drs.passages import tokenize
+
+# ================= 配置区 =================
+
+# SimHash 位数与判定为近似重复的最大汉明距离
+SIMHASH_BITS = 64
+MAX_HAMMING_DISTANCE = 3
+
+# 正文太短（多为摘要兜底）时不做内容指纹，避免误判
+MIN_FINGERPRINT_CHARS = 200
+
+
+def simhash(text):
+    """计算正文的 64 位 SimHash 指纹（特征为 tokenize 的词/双字，按词频加权）"""
+    import numpy as np
+
+    counts = Counter(tokenize(text))
+    if not counts:
+        return 0
+    hashes = np.array([int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "little")
+                       for t in counts], dtype=np.uint64)
+    weights = np.array(list(counts.values()), dtype=np.int64)
+    shifts = np.arange(SIMHASH_BITS, dtype=np.uint64)
+    bits = ((hashes[:, None] >> shifts) & np.uint64(1)).astype(bool)
+    votes = np.where(bits, weights[:, None], -weights[:, None]).sum(axis=0)
+    return sum(1 << i for i in range(SIMHASH_BITS) if votes[i] > 0)
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class SessionSeen:
+    """
+    一次研究会话内已提供给模型的来源。
+    由 Agent 循环在每步开始前设置 step，报告拼装层查询/登记来源。
+    """
+
+    def __init__(self, max_distance=MAX_HAMMING_DISTANCE):
+        self.max_distance = max_distance
+        self.step = 0
+        self._urls = {}
+        self._fingerprints = []
+
+    def label(self, index):
+        return f"第 {self.step} 步的来源 {index}"
+
+    def lookup_url(self, url):
+        """URL 已提供过时返回当时的来源标签，否则返回 None"""
+        return self._urls.get(normalize_url(url))
+
+    def lookup_content(self, text):
+        """正文与已提供过的某个来源近似重复时返回其标签，否则返回 None"""
+        if len(text) < MIN_FINGERPRINT_CHARS:
+            return None
+        fp = simhash(text)
+        for other, label in self._fingerprints:
+            if hamming_distance(fp, other) <= self.max_distance:
+                return label
+        return None
+
+    def add(self, url, text, label):
+        """登记一个已提供给模型的来源"""
+        self._urls.setdefault(normalize_url(url), label)
+        if len(text) >= MIN_FINGERPRINT_CHARS:
+            self._fingerprints.append((simhash(text), label))
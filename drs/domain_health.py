@@ -0,0 +1,291 @@
+"""
+按域名统计网页抓取的健康状况：自适应超时、熔断与黑名单的域名后缀匹配。
+
+以前所有网页一律 10 秒超时（DDG 脚本 15 秒），黑名单是手写的子串列表。
+总是超时、返回 403 或 trafilatura 提不出正文（视频站、纯 JS 页面）的域名
+每次都会被重新抓取，白白耗掉整段超时。这里把每次抓取的耗时和结果按域名
+持久化到 SQLite，据此：
+- 为每个域名计算超时：按历史成功耗时的 p95 放宽若干倍，限制在上下限之间
+- 熔断：连续失败达到阈值的域名在冷却期内直接跳过（上层用摘要兜底），
+  冷却结束后只放行一个试探请求（其余请求继续跳过），仍失败则冷却时间加倍；
+  提不出正文（empty）往往只是个别页面过短，单独计数，连续次数达到更高的阈值才熔断
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from drs.page_cache import CACHE_DIR
+
+# ================= 配置区 =================
+
+# 没有足够样本时的默认超时（秒）
+DEFAULT_TIMEOUT = 10
+
+# 自适应超时 = 成功耗时 p95 × 倍数，限制在上下限之间（秒）
+TIMEOUT_FACTOR = 2.5
+MIN_TIMEOUT = 3
+MAX_TIMEOUT = 15
+
+# 至少有多少次成功样本才启用自适应超时
+MIN_TIMEOUT_SAMPLES = 5
+
+# 每个域名保留的最近样本数
+SAMPLE_WINDOW = 50
+
+# 连续失败多少次触发熔断，以及首次熔断的冷却时间与上限（秒）
+BREAKER_FAILURES = 3
+BREAKER_COOLDOWN = 30 * 60
+MAX_BREAKER_COOLDOWN = 24 * 3600
+
+# 连续多少次提不出正文（empty）触发熔断
+EMPTY_BREAKER_FAILURES = 8
+
+# 冷却结束后放行的试探请求多久没有结果（如被上层时限中止、未记录）就再放行一个（秒）
+PROBE_LEASE = 2 * MAX_TIMEOUT
+
+# 正文少于该字符数视为“提取失败”（纯图片/视频/JS 页面）
+MIN_YIELD_CHARS = 200
+
+# 页面本身不存在，不代表域名不健康，不计入熔断
+PAGE_MISSING_STATUS = (404, 410)
+
+OK = "ok"
+
+
+def domain_of(url):
+    """取 URL 的主机名（小写，去掉端口和 www. 前缀）"""
+    host = (urlsplit(url).hostname or "").lower().rstrip(".")
+    return host[4:] if host.startswith("www.") else host
+
+
+def match_domain(url, domains):
+    """
+    按域名后缀匹配：baidu.com 命中 baidu.com 与 tieba.baidu.com，
+    但不会命中 notbaidu.com 或 example.com/?from=baidu.com。
+    :return: 命中的规则，未命中返回 None
+    """
+    host = (urlsplit(url).hostname or "").lower().rstrip(".")
+    if not host:
+        return None
+    for domain in domains:
+        domain = domain.lower().strip(".")
+        if host == domain or host.endswith("." + domain):
+            return domain
+    return None
+
+
+def classify(status_code, text):
+    """根据状态码和提取结果给出抓取结论：ok / http_<状态码> / empty"""
+    if status_code != 200:
+        return f"http_{status_code}"
+    if len(text or "") < MIN_YIELD_CHARS:
+        return "empty"
+    return OK
+
+
+def classify_error(error):
+    """
+    根据异常给出抓取结论。代理本身连不上时返回 None（不是目标域名的问题，不记录），
+    避免代理故障把所有域名都熔断。同时识别 requests（同步抓取）与 httpx（异步抓取）的异常。
+    """
+    if type(error).__module__.startswith("httpx"):
+        import httpx
+
+        if isinstance(error, httpx.ProxyError):
+            return None
+        if isinstance(error, httpx.TimeoutException):
+            return "timeout"
+        return "error"
+
+    import requests
+
+    if isinstance(error, requests.exceptions.ProxyError):
+        return None
+    if isinstance(error, requests.exceptions.Timeout):
+        return "timeout"
+    return "error"
+
+
+def _counts_as_failure(outcome):
+    """是否计入连续失败次数（empty 单独计数，见 EMPTY_BREAKER_FAILURES）"""
+    if outcome in (OK, "empty"):
+        return False
+    if outcome.startswith("http_") and int(outcome[5:]) in PAGE_MISSING_STATUS:
+        return False
+    return True
+
+
+def _trailing(samples, outcome):
+    """最近连续多少个样本的结论为 outcome"""
+    count = 0
+    for _, o, _ in reversed(samples):
+        if o != outcome:
+            break
+        count += 1
+    return count
+
+
+def _trip(breaker, now):
+    """熔断：冷却时间随熔断次数加倍"""
+    breaker[1] += 1
+    breaker[2] = now + min(MAX_BREAKER_COOLDOWN, BREAKER_COOLDOWN * 2 ** (breaker[1] - 1))
+
+
+class DomainHealth:
+    """基于 SQLite 的域名健康记录（线程安全，最近样本在内存中另存一份）"""
+
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "domains.sqlite3")
+        self.path = path
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._breakers = {}
+        self._probes = {}  # 域名 -> 当前试探请求的租约截止时间（只在内存中）
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS samples (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                domain TEXT NOT NULL,
+                at REAL NOT NULL,
+                latency REAL NOT NULL,
+                outcome TEXT NOT NULL,
+                chars INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_samples_domain ON samples(domain, id)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS breakers (
+                domain TEXT PRIMARY KEY,
+                failures INTEGER NOT NULL,
+                trips INTEGER NOT NULL,
+                open_until REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def _load(self, domain):
+        """读取域名的最近样本与熔断状态到内存（调用方需持有锁）"""
+        if domain in self._samples:
+            return
+        samples = deque(maxlen=SAMPLE_WINDOW)
+        breaker = [0, 0, 0.0]
+        try:
+            rows = self._conn.execute(
+                "SELECT latency, outcome, chars FROM samples WHERE domain = ? ORDER BY id DESC LIMIT ?",
+                (domain, SAMPLE_WINDOW)
+            ).fetchall()
+            samples.extend(reversed(rows))
+            row = self._conn.execute("SELECT failures, trips, open_until FROM breakers WHERE domain = ?",
+                                     (domain,)).fetchone()
+            if row:
+                breaker = list(row)
+        except sqlite3.Error:
+            pass
+        self._samples[domain] = samples
+        self._breakers[domain] = breaker
+
+    def allow(self, url):
+        """域名未熔断时返回 True；冷却已结束时只对一个试探请求返回 True，直到它被记录或租约过期"""
+        domain = domain_of(url)
+        if not domain:
+            return True
+        now = time.time()
+        with self._lock:
+            self._load(domain)
+            open_until = self._breakers[domain][2]
+            if not open_until:
+                return True
+            if open_until > now or self._probes.get(domain, 0) > now:
+                return False
+            self._probes[domain] = now + PROBE_LEASE
+            return True
+
+    def timeout_for(self, url, default=DEFAULT_TIMEOUT):
+        """按该域名历史成功耗时给出本次请求的超时（秒）"""
+        domain = domain_of(url)
+        with self._lock:
+            self._load(domain)
+            latencies = sorted(latency for latency, outcome, _ in self._samples[domain] if outcome == OK)
+        if len(latencies) < MIN_TIMEOUT_SAMPLES:
+            return default
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return max(MIN_TIMEOUT, min(MAX_TIMEOUT, p95 * TIMEOUT_FACTOR))
+
+    def record(self, url, latency, outcome, chars=0):
+        """记录一次抓取结果；outcome 为 None 时忽略（如代理故障）"""
+        domain = domain_of(url)
+        if not domain or outcome is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._load(domain)
+            self._probes.pop(domain, None)
+            samples = self._samples[domain]
+            samples.append((latency, outcome, chars))
+            breaker = self._breakers[domain]
+            if outcome == "empty":
+                if _trailing(samples, "empty") >= EMPTY_BREAKER_FAILURES:
+                    _trip(breaker, now)
+            elif _counts_as_failure(outcome):
+                breaker[0] += 1
+                if breaker[0] >= BREAKER_FAILURES:
+                    _trip(breaker, now)
+            elif outcome == OK:
+                breaker[:] = [0, 0, 0.0]
+            try:
+                self._conn.execute("INSERT INTO samples (domain, at, latency, outcome, chars) VALUES (?, ?, ?, ?, ?)",
+                                   (domain, now, latency, outcome, chars))
+                self._conn.execute(
+                    "DELETE FROM samples WHERE domain = ? AND id <= "
+                    "(SELECT id FROM samples WHERE domain = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (domain, domain, SAMPLE_WINDOW)
+                )
+                self._conn.execute("INSERT OR REPLACE INTO breakers (domain, failures, trips, open_until) "
+                                   "VALUES (?, ?, ?, ?)", (domain, *breaker))
+                self._conn.commit()
+            except sqlite3.Error:
+                pass
+
+    def stats(self, url_or_domain):
+        """某个域名的成功率、耗时分位数、正文产出与熔断状态"""
+        domain = domain_of(url_or_domain) if "/" in url_or_domain else url_or_domain.lower()
+        with self._lock:
+            self._load(domain)
+            samples = list(self._samples[domain])
+            failures, trips, open_until = self._breakers[domain]
+        latencies = sorted(latency for latency, outcome, _ in samples if outcome == OK)
+
+        def percentile(q):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * q))] if latencies else None
+
+        fetched = [chars for _, outcome, chars in samples if outcome == OK or outcome == "empty"]
+        return {
+            "domain": domain,
+            "samples": len(samples),
+            "success_rate": len(latencies) / len(samples) if samples else None,
+            "p50": percentile(0.5),
+            "p95": percentile(0.95),
+            "avg_chars": sum(fetched) / len(fetched) if fetched else None,
+            "consecutive_failures": failures,
+            "open_until": open_until if open_until > time.time() else None,
+        }
+
+
+_default_health = None
+_default_lock = threading.Lock()
+
+
+def get_domain_health():
+    """进程内共享的默认实例"""
+    global _default_health
+    if _default_health is None:
+        with _default_lock:
+            if _default_health is None:
+                _default_health = DomainHealth()
+    return _default_health
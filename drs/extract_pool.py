@@ -0,0 +1,164 @@
+"""
+正文提取进程池。
+
+trafilatura.extract 是 CPU 密集的 lxml 处理，以前直接在抓取线程里执行：多个大页面同时下载完成时，
+提取在 GIL 上排队，Streamlit 脚本线程与 Agent 主循环也跟着卡顿。这里把原始字节的解码与提取
+交给一组已预先导入 trafilatura 的工作进程，调用线程只等待结果：
+- 每个页面有独立的时限，超时（病态页面卡死在解析里）时终止整个进程池并重建，
+  同时在旧进程池中排队的其他页面按各自剩余时间重新提交
+- 小页面跨进程传输的开销大于收益，直接在调用线程中提取，不设时限（解析 32 KB 以内的页面只需几毫秒）
+- 工作进程处理一定数量的页面后重启，避免 lxml 的内存持续增长
+
+进程以 spawn 方式启动（不复制调用方的线程与锁），第一次使用时创建；
+单核机器上默认不启用，较大的页面改在单独的线程中提取，调用线程最多等待 EXTRACT_TIMEOUT 秒。
+线程无法被终止，超时的提取留在后台跑完，只是不再占着抓取线程。
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+
+# ================= 配置区 =================
+
+# 提取进程数；0 表示不使用进程池
+EXTRACT_WORKERS = max(0, min(4, (os.cpu_count() or 1) - 1))
+
+# 单个页面的提取时限（秒），包含排队时间
+EXTRACT_TIMEOUT = 15
+
+# 小于该字节数的页面直接在调用线程中提取
+POOL_MIN_BYTES = 32 * 1024
+
+# 每个工作进程处理多少个页面后重启
+MAX_TASKS_PER_WORKER = 200
+
+# 等待结果时检查进程池是否已被重建的间隔（秒）
+POLL_INTERVAL = 0.2
+
+
+class ExtractTimeout(Exception):
+    """页面提取超过时限"""
+
+
+def _warm():
+    """工作进程的初始化：提前导入 trafilatura 与 lxml，第一个页面不必再等导入"""
+    import lxml.html  # noqa: F401
+    import trafilatura  # noqa: F401
+
+    import drs.fetcher  # noqa: F401
+
+
+def _extract(kind, body, truncated, content_type, base_url):
+    from drs.fetcher import extract_document
+
+    start = time.process_time()
+    doc = extract_document(kind, body, truncated, content_type, base_url)
+    doc["cpu_seconds"] = round(time.process_time() - start, 4)
+    return doc
+
+
+_pool = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+def get_extract_pool(workers=None):
+    """惰性创建进程内共享的提取进程池；workers 为 0 时返回 None"""
+    global _pool, _pool_size
+    workers = EXTRACT_WORKERS if workers is None else workers
+    if workers <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                ctx = multiprocessing.get_context("spawn")
+                _pool = ctx.Pool(workers, initializer=_warm, maxtasksperchild=MAX_TASKS_PER_WORKER)
+                _pool_size = workers
+    return _pool
+
+
+def _recycle(pool):
+    """终止超时的进程池（仍是当前进程池时），下次使用时重建"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.terminate()
+
+
+def shutdown_extract_pool():
+    """关闭进程池（进程退出时自动调用）"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.terminate()
+
+
+atexit.register(shutdown_extract_pool)
+
+
+def run_in_pool(pool, func, args, timeout):
+    """
+    在进程池中执行 func(*args) 并等待结果。
+    超时时终止进程池并抛出 ExtractTimeout；等待期间进程池因其他任务超时被重建时，按剩余时间重新提交。
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        result = pool.apply_async(func, args)
+        while not result.ready():
+            left = deadline - time.monotonic()
+            if left <= 0:
+                _recycle(pool)
+                raise ExtractTimeout(f"提取超过 {timeout} 秒")
+            if _pool is not pool:
+                break
+            result.wait(min(left, POLL_INTERVAL))
+        else:
+            return result.get()
+        pool = get_extract_pool(_pool_size)
+
+
+def run_in_thread(func, args, timeout):
+    """
+    没有进程池时在单独的线程中执行 func(*args)，最多等待 timeout 秒。
+    超时时抛出 ExtractTimeout，线程留在后台跑完（无法终止）；func 抛出的异常原样抛出。
+    """
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = func(*args)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, name="drs-extract", daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise ExtractTimeout(f"提取超过 {timeout} 秒")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+def extract_in_pool(kind, body, truncated=False, content_type="", base_url="", timeout=EXTRACT_TIMEOUT):
+    """
+    从原始字节中提取正文与外链（参数见 drs.fetcher.extract_document）。
+    超过时限抛出 ExtractTimeout（小页面在调用线程中提取，不设时限）。
+    :return: {"text", "links", "charset", "cpu_seconds", "via": "pool" / "thread" / "inline"}
+    """
+    args = (kind, body, truncated, content_type, base_url)
+    if len(body) < POOL_MIN_BYTES:
+        doc = _extract(*args)
+        doc["via"] = "inline"
+        return doc
+    pool = get_extract_pool()
+    if pool is None:
+        doc = run_in_thread(_extract, args, timeout)
+        doc["via"] = "thread"
+        return doc
+    doc = run_in_pool(pool, _extract, args, timeout)
+    doc["via"] = "pool"
+    return doc
@@ -0,0 +1,165 @@
+"""
+联合搜索：同时向 Bocha / Google / DuckDuckGo 发起查询，按 URL 去重并用 RRF 融合排序。
+
+单一搜索源被限流或代理挂掉时整步都会卡到超时。联合模式下各搜索源并发竞速，
+至少两个搜索源返回且凑够足够多的去重结果即可提前返回（保证有结果可融合），慢的搜索源在后台跑完后仍会写入查询缓存。
+异步引擎使用 arace_providers，逻辑相同，只是以协程代替线程。
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from drs.page_cache import normalize_url
+
+# ================= 配置区 =================
+
+# RRF 平滑常数，越大越弱化头部排名差异
+RRF_K = 60
+
+# 搜索源竞速专用线程池大小（与网页抓取线程池分开，避免互相等待）
+MAX_PROVIDER_WORKERS = 8
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# 提前返回后仍在后台运行的异步任务（保留引用，防止被回收）
+_background_tasks = set()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_PROVIDER_WORKERS, thread_name_prefix="drs-provider")
+    return _executor
+
+
+def rrf_merge(ranked_lists, k=RRF_K):
+    """
+    倒数排名融合（Reciprocal Rank Fusion）。
+    :param ranked_lists: [(搜索源名, [候选来源, ...]), ...]，候选来源为含 link 的 dict
+    :return: 融合后的候选列表，每项附带 engines（命中的搜索源）
+    """
+    merged = {}
+    order = []
+    for engine, candidates in ranked_lists:
+        for rank, c in enumerate(candidates):
+            key = normalize_url(c.get("link", ""))
+            if not key:
+                continue
+            if key not in merged:
+                merged[key] = dict(c, engines=[], score=0.0)
+                order.append(key)
+            entry = merged[key]
+            entry["score"] += 1.0 / (k + rank + 1)
+            if engine not in entry["engines"]:
+                entry["engines"].append(engine)
+            # 同一页面保留信息量最大的摘要
+            if len(c.get("snippet") or "") > len(entry.get("snippet") or ""):
+                entry["snippet"] = c["snippet"]
+    # 分数相同按首次出现顺序
+    order.sort(key=lambda key: -merged[key]["score"])
+    return [merged[key] for key in order]
+
+
+def race_providers(providers, enough, deadline, min_sources=1):
+    """
+    并发调用多个搜索源，至少 min_sources 个搜索源返回且凑够 enough 条去重结果，或全部返回/超时即结束。
+    :param providers: [(搜索源名, 无参函数 -> 候选列表), ...]；函数抛出的异常视为该源失败
+    :return: (ranked_lists, errors)：已返回的 [(搜索源名, 候选列表)] 与 [(搜索源名, 错误信息)]
+    """
+    min_sources = min(min_sources, len(providers))
+    executor = _get_executor()
+    futures = {executor.submit(contextvars.copy_context().run, func): name for name, func in providers}
+    ranked_lists = []
+    errors = []
+    seen = set()
+    deadline_at = time.monotonic() + deadline
+    pending = set(futures)
+
+    def collect(fut):
+        name = futures[fut]
+        try:
+            candidates = fut.result()
+        except Exception as e:
+            errors.append((name, str(e)))
+            return
+        ranked_lists.append((name, candidates))
+        seen.update(normalize_url(c.get("link", "")) for c in candidates)
+
+    def enough_collected():
+        return len(seen) >= enough and len(ranked_lists) >= min_sources
+
+    while pending and not enough_collected():
+        done, pending = wait(pending, timeout=max(0.0, deadline_at - time.monotonic()),
+                             return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for fut in done:
+            collect(fut)
+
+    # 提前返回时顺带收下已经完成的搜索源，其余的留在后台跑完（结果会进入查询缓存）
+    for fut in pending:
+        if fut.done():
+            collect(fut)
+        else:
+            errors.append((futures[fut], "已提前返回，未等待" if enough_collected() else "未在时限内返回"))
+    # 按调用顺序排列，保证融合结果稳定
+    position = {name: i for i, (name, _) in enumerate(providers)}
+    ranked_lists.sort(key=lambda item: position[item[0]])
+    return ranked_lists, errors
+
+
+def _forget_task(task):
+    _background_tasks.discard(task)
+    if not task.cancelled():
+        task.exception()  # 取走异常，避免 "Task exception was never retrieved" 警告
+
+
+async def arace_providers(providers, enough, deadline, min_sources=1):
+    """
+    race_providers 的异步版本。
+    :param providers: [(搜索源名, 无参函数 -> 协程)]，协程返回候选列表
+    """
+    min_sources = min(min_sources, len(providers))
+    tasks = {asyncio.ensure_future(func()): name for name, func in providers}
+    ranked_lists = []
+    errors = []
+    seen = set()
+    deadline_at = time.monotonic() + deadline
+    pending = set(tasks)
+
+    def collect(task):
+        name = tasks[task]
+        try:
+            candidates = task.result()
+        except Exception as e:
+            errors.append((name, str(e)))
+            return
+        ranked_lists.append((name, candidates))
+        seen.update(normalize_url(c.get("link", "")) for c in candidates)
+
+    def enough_collected():
+        return len(seen) >= enough and len(ranked_lists) >= min_sources
+
+    while pending and not enough_collected():
+        done, pending = await asyncio.wait(pending, timeout=max(0.0, deadline_at - time.monotonic()),
+                                           return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            break
+        for task in done:
+            collect(task)
+
+    for task in pending:
+        if task.done():
+            collect(task)
+        else:
+            errors.append((tasks[task], "已提前返回，未等待" if enough_collected() else "未在时限内返回"))
+            _background_tasks.add(task)
+            task.add_done_callback(_forget_task)
+    position = {name: i for i, (name, _) in enumerate(providers)}
+    ranked_lists.sort(key=lambda item: position[item[0]])
+    return ranked_lists, errors
@@ -0,0 +1,613 @@
+"""
+网页抓取：单个页面的下载与正文提取，以及所有搜索源共用的并发抓取阶段。
+
+以前每个搜索源都在 for 循环里逐条调用 get_page_content，一个慢站点就会拖住整步。
+这里把候选 URL 一次性提交到共享线程池，在每步的总时限内统一收集结果，
+并按搜索引擎原始排名顺序返回，调用方据此拼装报告。
+总时限对已经开始的任务同样有效：过了时限才轮到的任务直接放弃，下载中的页面在时限到达时中止，
+一个会话的慢站点不会在时限之后继续占着共享线程池。
+trafilatura 只在第一次真正提取正文时才导入。
+
+下载是流式的：先看响应头，图片、视频、压缩包等不支持的类型直接放弃，正文超过字节上限的部分不再读取；
+编码按响应头、BOM、<meta> 声明判断，都没有时只对开头一小段做探测。
+PDF 交给 pypdf（可选依赖，未安装时 PDF 链接直接跳过）提取文字。
+较大页面的解码与提取交给进程池（drs.extract_pool），不占用调用线程的 GIL。
+
+文件末尾是供异步引擎（drs.async_agent）使用的协程版本：下载走 httpx.AsyncClient，
+其余阻塞操作（网页缓存与域名健康的 SQLite 读写、正文提取、段落挑选）都放到专用线程池中执行，
+事件循环只等待网络 I/O。
+"""
+import asyncio
+import codecs
+import contextvars
+import functools
+import importlib.util
+import io
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urljoin, urlsplit
+
+from drs.domain_health import classify, classify_error, get_domain_health
+from drs.extract_pool import extract_in_pool
+from drs.http_pool import get_session
+from drs.page_cache import get_page_cache, normalize_url
+from drs.passages import select_passages
+from drs.tracing import span
+
+# ================= 配置区 =================
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+
+# 每个来源交给模型的正文 Token 预算（按查询挑选最相关的段落）
+PAGE_TOKEN_BUDGET = 2500
+
+# 共享线程池大小（同时抓取的网页数上限）
+MAX_FETCH_WORKERS = 8
+
+# 每一步抓取的总时限（秒），超时仍未返回的页面交由上层用摘要兜底
+STEP_DEADLINE = 20
+
+# 异步引擎执行阻塞操作（SQLite、正文提取、段落挑选）的线程池大小
+ASYNC_THREAD_WORKERS = 32
+
+# 每个页面最多记录的外链数（供子网页抓取使用）
+MAX_LINKS_PER_PAGE = 200
+
+# 网页最多读取的字节数，超出部分丢弃（正文提取只用前面的内容）
+MAX_PAGE_BYTES = 3 * 1024 * 1024
+
+# PDF 最多读取的字节数；声明长度超过上限或读到上限仍未结束的 PDF 直接放弃（截断的 PDF 无法解析）
+MAX_PDF_BYTES = 15 * 1024 * 1024
+
+# PDF 最多提取的页数
+MAX_PDF_PAGES = 30
+
+# 流式读取的分块大小
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+# 响应头与 BOM 都未给出编码时，只在开头这么多字节内查找 <meta> 声明并做编码探测
+CHARSET_SNIFF_BYTES = 16 * 1024
+
+# 探测也失败时（如开头截断在多字节字符中间）依次尝试的编码
+FALLBACK_CHARSETS = ("gb18030", "big5", "shift_jis")
+
+# 按网页处理的 Content-Type（缺失时也按网页处理）
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+TEXT_TYPES = ("text/plain",)
+PDF_TYPES = ("application/pdf", "application/x-pdf")
+
+# 是否可以提取 PDF 文字（需要 pip install pypdf）
+PDF_AVAILABLE = importlib.util.find_spec("pypdf") is not None
+
+
+# ================= 单个页面 =================
+
+def get_page_content(url, proxy, query=None, max_tokens=PAGE_TOKEN_BUDGET, headers=None):
+    """通用网页抓取工具（命中本地缓存时直接返回），按查询挑选最相关的段落；headers 为 None 时使用 HEADERS"""
+    with span("page", "page", url=url) as s:
+        text = get_page_cache().get(url)
+        s.set(cache="hit" if text is not None else "miss")
+        fetched = text is None
+        if fetched:
+            text = download_and_extract(url, proxy, headers)
+        s.set(chars=len(text))
+        return _store_and_select(url, text, query, max_tokens, fetched)
+
+
+def _store_and_select(url, text, query, max_tokens, store):
+    """（刚下载的）正文写入网页缓存，再按查询挑选最相关的段落"""
+    if store:
+        get_page_cache().set(url, text)
+    return select_passages(text, query, max_tokens).replace("\n", " ")
+
+
+class DeadlineExceeded(Exception):
+    """所在批次的总时限已到，放弃下载"""
+
+
+def download_and_extract(url, proxy=None, headers=None):
+    """
+    下载并提取完整正文，失败返回空字符串。
+    按域名健康记录决定超时；已熔断的域名直接跳过，由上层用摘要兜底。
+    在 fetch_concurrently / fetch_first_k 中执行时，超时不超过批次剩余时间，时限到达即中止下载。
+    先看响应头再决定是否读取正文（见 _download_plan），正文最多读取到字节上限。
+    页面中的外链同时写入网页缓存，供子网页抓取（drs.crawler）使用。
+    """
+    health = get_domain_health()
+    if not health.allow(url):
+        with span("fetch", "fetch", url=url, skipped="circuit_open"):
+            return ""
+
+    start = time.monotonic()
+    capped = False
+    try:
+        with span("fetch", "fetch", url=url, via="proxy" if proxy else "direct") as s:
+            timeout, capped = _capped_timeout(health.timeout_for(url))
+            s.set(timeout=timeout, capped=capped)
+            # 复用按代理划分的长连接池，省去重复的 DNS/TCP/TLS 握手
+            verify_ssl = not bool(proxy)
+            with get_session(proxy).get(url, headers=headers or HEADERS, timeout=timeout, verify=verify_ssl,
+                                        stream=True) as resp:
+                s.set(status=resp.status_code)
+                if resp.status_code != 200:
+                    health.record(url, time.monotonic() - start, classify(resp.status_code, ""))
+                    return ""
+                kind, limit = _download_plan(url, resp.headers)
+                if kind is None:
+                    # 不是目标域名的问题，不记录健康状况
+                    s.set(skipped=limit)
+                    return ""
+                body, truncated = _read_capped(resp.iter_content(DOWNLOAD_CHUNK_BYTES), limit, _deadline.get())
+                s.set(bytes=len(body), truncated=truncated)
+        return _finish_download(url, time.monotonic() - start, kind, body, truncated,
+                                resp.headers.get("Content-Type", ""), resp.url)
+    except DeadlineExceeded:
+        # 是本批次时间用完，不是目标域名的问题，不记录健康状况
+        return ""
+    except Exception as e:
+        outcome = classify_error(e)
+        if capped and outcome == "timeout":
+            # 超时被缩短到批次剩余时间，按域名自身超时未必会失败，同 DeadlineExceeded 处理
+            return ""
+        health.record(url, time.monotonic() - start, outcome)
+        return ""
+
+
+def _finish_download(url, latency, kind, body, truncated, content_type, final_url):
+    """下载完成后的收尾：提取正文与外链，记录域名健康，外链写入网页缓存；返回正文"""
+    with span("extract", "extract", url=url, kind=kind) as s:
+        try:
+            doc = extract_in_pool(kind, body, truncated, content_type, final_url)
+        except Exception as e:
+            # 提取超时或解析出错是这个页面本身的问题，下载已经成功，不记录域名健康
+            s.set(error=str(e)[:200])
+            return ""
+        text, links = doc["text"], doc["links"]
+        s.set(chars=len(text), links=len(links), charset=doc["charset"], via=doc["via"])
+    get_domain_health().record(url, latency, classify(200, text), len(text))
+    get_page_cache().set_links(url, links)
+    return text
+
+
+def extract_text(html):
+    """用 trafilatura 从 HTML 中提取正文，失败返回空字符串"""
+    import trafilatura
+    return trafilatura.extract(html, include_comments=False, target_language='zh') or ""
+
+
+def extract_links(html, base_url):
+    """
+    提取页面中的外链 [[绝对链接, 锚文本], ...]：只保留 http/https，去掉锚点，
+    按出现顺序去重（不含页面自身），失败返回空列表。
+    """
+    import lxml.html
+
+    try:
+        doc = lxml.html.fromstring(html)
+    except Exception:
+        return []
+    seen = {normalize_url(base_url)}
+    links = []
+    for a in doc.iter("a"):
+        href = (a.get("href") or "").strip()
+        if not href:
+            continue
+        try:
+            link = urljoin(base_url, href).split("#", 1)[0]
+        except ValueError:
+            continue
+        key = normalize_url(link)
+        if not link.startswith(("http://", "https://")) or key in seen:
+            continue
+        seen.add(key)
+        links.append([link, " ".join(a.text_content().split())[:200]])
+        if len(links) >= MAX_LINKS_PER_PAGE:
+            break
+    return links
+
+
+def extract_pdf_text(data, max_pages=MAX_PDF_PAGES):
+    """用 pypdf 提取 PDF 前 max_pages 页的文字，未安装或解析失败返回空字符串"""
+    if not PDF_AVAILABLE:
+        return ""
+    import pypdf
+
+    try:
+        reader = pypdf.PdfReader(io.BytesIO(data))
+        pages = [page.extract_text() or "" for page in reader.pages[:max_pages]]
+    except Exception:
+        return ""
+    return "\n".join(" ".join(page.split()) for page in pages if page.strip())
+
+
+# ================= 下载与解码 =================
+
+_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-zA-Z0-9_.:-]+)""", re.IGNORECASE)
+
+# 常见的错误声明：按超集解码
+_CHARSET_ALIASES = {"gb2312": "gb18030", "gbk": "gb18030", "ascii": "utf-8"}
+
+# 很多服务器默认在响应头里带上 ISO-8859-1，不可信，继续看 <meta> 与内容
+_UNTRUSTED_HEADER_CHARSETS = ("iso8859-1",)
+
+_BOMS = ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+
+
+def _download_plan(url, headers):
+    """
+    根据响应头决定如何读取正文：返回 (类型, 字节上限)，类型为 html / text / pdf；
+    不支持的类型或过大的 PDF 返回 (None, 原因)，此时不读取正文。
+    """
+    content_type = headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if content_type in PDF_TYPES or (content_type in ("", "application/octet-stream")
+                                     and urlsplit(url).path.lower().endswith(".pdf")):
+        if not PDF_AVAILABLE:
+            return None, "pdf_unsupported"
+        try:
+            length = int(headers.get("Content-Length") or 0)
+        except ValueError:
+            length = 0
+        if length > MAX_PDF_BYTES:
+            return None, "too_large"
+        return "pdf", MAX_PDF_BYTES
+    if not content_type or content_type in HTML_TYPES:
+        return "html", MAX_PAGE_BYTES
+    if content_type in TEXT_TYPES:
+        return "text", MAX_PAGE_BYTES
+    return None, f"content_type:{content_type}"
+
+
+def _read_capped(chunks, limit, deadline_at=None):
+    """读取分块直到结束或达到 limit 字节，返回 (内容, 是否被截断)；超过 deadline_at 抛出 DeadlineExceeded"""
+    buf = bytearray()
+    for chunk in chunks:
+        if deadline_at is not None and time.monotonic() >= deadline_at:
+            raise DeadlineExceeded()
+        buf += chunk
+        if len(buf) >= limit:
+            return bytes(buf[:limit]), True
+    return bytes(buf), False
+
+
+def _usable_charset(name):
+    if not name:
+        return None
+    name = name.strip().strip("\"'").lower()
+    name = _CHARSET_ALIASES.get(name, name)
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def _decodes_as(head, encoding):
+    """head 能否按 encoding 解码（末尾不完整的多字节字符不算错误）"""
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def detect_charset(content, content_type=""):
+    """
+    判断正文编码：响应头 charset > BOM > 开头的 <meta> 声明 > 开头能否按 UTF-8 解码 > 对开头做探测。
+    不对整个正文做探测（几 MB 的页面上 apparent_encoding 要上百毫秒）。
+    """
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.partition("=")
+        charset = _usable_charset(value) if key.strip().lower() == "charset" else None
+        if charset and charset not in _UNTRUSTED_HEADER_CHARSETS:
+            return charset
+    for bom, encoding in _BOMS:
+        if content.startswith(bom):
+            return encoding
+
+    head = content[:CHARSET_SNIFF_BYTES]
+    match = _CHARSET_RE.search(head)
+    charset = _usable_charset(match.group(1).decode("ascii", "ignore")) if match else None
+    if charset:
+        return charset
+    if _decodes_as(head, "utf-8"):
+        return "utf-8"
+
+    from requests.compat import chardet
+
+    charset = _usable_charset(chardet.detect(head)["encoding"])
+    if charset:
+        return charset
+    return next((encoding for encoding in FALLBACK_CHARSETS if _decodes_as(head, encoding)), "utf-8")
+
+
+def decode_html(content, content_type=""):
+    """按 detect_charset 的结果解码，无法解码的字节替换为占位符"""
+    return str(content, detect_charset(content, content_type), errors="replace")
+
+
+def extract_document(kind, body, truncated=False, content_type="", base_url=""):
+    """
+    按类型（见 _download_plan）从原始字节中提取正文与外链。
+    :return: {"text": 正文, "links": 外链列表, "charset": 解码所用编码（PDF 为 None）}
+    """
+    if kind == "pdf":
+        return {"text": "" if truncated else extract_pdf_text(body), "links": [], "charset": None}
+    charset = detect_charset(body, content_type)
+    text = str(body, charset, errors="replace")
+    if kind == "text":
+        return {"text": text.strip(), "links": [], "charset": charset}
+    return {"text": extract_text(text), "links": extract_links(text, base_url), "charset": charset}
+
+
+# ================= 并发抓取 =================
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """惰性创建全局共享的抓取线程池"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS, thread_name_prefix="drs-fetch")
+    return _executor
+
+
+# 当前批次（fetch_concurrently / fetch_first_k）的截止时刻（time.monotonic()），批次之外为 None
+_deadline = contextvars.ContextVar("drs_fetch_deadline", default=None)
+
+
+def _capped_timeout(timeout):
+    """请求超时不超过当前批次的剩余时间，返回 (超时, 是否被缩短)"""
+    deadline_at = _deadline.get()
+    if deadline_at is None:
+        return timeout, False
+    left = deadline_at - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded()
+    return min(timeout, left), left < timeout
+
+
+def _run_before(deadline_at, fetch_func, item):
+    """批次时限已过才轮到线程的任务直接放弃（取消可能没赶上，或排在别的会话后面）"""
+    if time.monotonic() >= deadline_at:
+        return ""
+    _deadline.set(deadline_at)
+    return fetch_func(item)
+
+
+def _submit(executor, fetch_func, item, deadline_at):
+    # 每个任务带上当前上下文的副本，抓取中记录的 tracing span 才能挂到调用方的 span 下
+    return executor.submit(contextvars.copy_context().run, _run_before, deadline_at, fetch_func, item)
+
+
+def fetch_concurrently(urls, fetch_func, deadline=STEP_DEADLINE, executor=None):
+    """
+    同时抓取所有候选 URL。
+    :param urls: 按搜索排名排列的链接列表
+    :param fetch_func: 单个 URL 的抓取函数，签名 fetch_func(url) -> str
+    :param deadline: 整步抓取的总时限（秒）
+    :param executor: 执行任务的线程池，默认为共享抓取线程池
+    :return: 与 urls 一一对应的正文列表；失败或超时的位置为空字符串
+    """
+    if not urls:
+        return []
+
+    executor = executor or get_executor()
+    deadline_at = time.monotonic() + deadline
+    futures = [_submit(executor, fetch_func, url, deadline_at) for url in urls]
+    done, not_done = wait(futures, timeout=deadline)
+
+    # 超时未开始的任务直接取消，已经在跑的下载会在时限到达时自行中止
+    for fut in not_done:
+        fut.cancel()
+
+    results = []
+    for fut in futures:
+        if fut in done and not fut.cancelled() and fut.exception() is None:
+            results.append(fut.result() or "")
+        else:
+            results.append("")
+    return results
+
+
+def fetch_first_k(items, fetch_func, k, is_valid, deadline=STEP_DEADLINE, group=None):
+    """
+    对冲抓取：同时抓取比需要更多的候选，每组凑够 k 个有效结果即停止等待，
+    取消其余尚未开始的任务。单步耗时由时限决定，而不是由最慢的链接决定。
+    :param items: 按搜索排名排列的候选
+    :param fetch_func: 单个候选的抓取函数，签名 fetch_func(item) -> str
+    :param k: 每组需要的有效结果数
+    :param is_valid: 判断结果是否有效，签名 is_valid(text) -> bool
+    :param deadline: 总时限（秒）
+    :param group: 候选的分组函数（如按查询分组，每组各需 k 个）；默认全部为一组
+    :return: 与 items 一一对应的列表：已返回的位置为正文（失败为空字符串），
+             未等到（已取消或仍在运行）的位置为 None
+    """
+    if not items:
+        return []
+
+    keys = [group(item) if group else None for item in items]
+    need = {key: k for key in keys}
+    executor = get_executor()
+    deadline_at = time.monotonic() + deadline
+    futures = {_submit(executor, fetch_func, item, deadline_at): i for i, item in enumerate(items)}
+    results = [None] * len(items)
+    pending = set(futures)
+
+    while pending and any(n > 0 for n in need.values()):
+        done, pending = wait(pending, timeout=max(0.0, deadline_at - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for fut in done:
+            if fut.cancelled():
+                continue
+            i = futures[fut]
+            text = (fut.result() or "") if fut.exception() is None else ""
+            results[i] = text
+            if is_valid(text):
+                need[keys[i]] -= 1
+        # 已凑够的组，其排队中的任务让出线程给其他组
+        for fut in pending:
+            if need[keys[futures[fut]]] <= 0:
+                fut.cancel()
+
+    # 超时或已凑够：未开始的任务直接取消；已经在跑的在时限内下载完的结果仍会写入缓存，超过时限的自行中止
+    for fut in pending:
+        fut.cancel()
+    return results
+
+
+# ================= 异步版本 =================
+
+_async_executor = None
+
+
+def _get_async_executor():
+    global _async_executor
+    if _async_executor is None:
+        with _executor_lock:
+            if _async_executor is None:
+                _async_executor = ThreadPoolExecutor(max_workers=ASYNC_THREAD_WORKERS, thread_name_prefix="drs-async")
+    return _async_executor
+
+
+async def to_thread(func, *args):
+    """
+    在线程中执行同步函数并带上当前上下文（即 asyncio.to_thread，兼容 Python 3.8）。
+    使用专用线程池，不与事件循环的默认线程池（通常只有几个线程）争抢。
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_async_executor(),
+                                      functools.partial(contextvars.copy_context().run, func, *args))
+
+
+def _cached_page(url):
+    return get_page_cache().get(url)
+
+
+def _admit(url):
+    """域名是否允许抓取，以及本次请求的超时"""
+    health = get_domain_health()
+    return health.allow(url), health.timeout_for(url)
+
+
+def _record_health(url, latency, outcome):
+    get_domain_health().record(url, latency, outcome)
+
+
+async def aget_page_content(client, url, proxy=None, query=None, max_tokens=PAGE_TOKEN_BUDGET, headers=None):
+    """
+    get_page_content 的异步版本。
+    :param client: 与 proxy 对应的 httpx.AsyncClient（走代理时应关闭证书校验）
+    :param proxy: 仅用于记录 span
+    """
+    with span("page", "page", url=url) as s:
+        text = await to_thread(_cached_page, url)
+        s.set(cache="hit" if text is not None else "miss")
+        fetched = text is None
+        if fetched:
+            text = await adownload_and_extract(client, url, proxy, headers)
+        s.set(chars=len(text))
+        return await to_thread(_store_and_select, url, text, query, max_tokens, fetched)
+
+
+async def adownload_and_extract(client, url, proxy=None, headers=None):
+    """download_and_extract 的异步版本，失败返回空字符串"""
+    allowed, timeout = await to_thread(_admit, url)
+    if not allowed:
+        with span("fetch", "fetch", url=url, skipped="circuit_open"):
+            return ""
+
+    start = time.monotonic()
+    try:
+        with span("fetch", "fetch", url=url, via="proxy" if proxy else "direct") as s:
+            s.set(timeout=timeout)
+            async with client.stream("GET", url, headers=headers or HEADERS, timeout=timeout) as resp:
+                s.set(status=resp.status_code)
+                if resp.status_code != 200:
+                    await to_thread(_record_health, url, time.monotonic() - start, classify(resp.status_code, ""))
+                    return ""
+                kind, limit = _download_plan(url, resp.headers)
+                if kind is None:
+                    s.set(skipped=limit)
+                    return ""
+                body, truncated = await _aread_capped(resp.aiter_bytes(DOWNLOAD_CHUNK_BYTES), limit)
+                s.set(bytes=len(body), truncated=truncated)
+        return await to_thread(_finish_download, url, time.monotonic() - start, kind, body, truncated,
+                               resp.headers.get("Content-Type", ""), str(resp.url))
+    except Exception as e:
+        await to_thread(_record_health, url, time.monotonic() - start, classify_error(e))
+        return ""
+
+
+async def _aread_capped(chunks, limit):
+    """_read_capped 的异步版本"""
+    buf = bytearray()
+    async for chunk in chunks:
+        buf += chunk
+        if len(buf) >= limit:
+            return bytes(buf[:limit]), True
+    return bytes(buf), False
+
+
+async def afetch_concurrently(items, fetch_func, deadline=STEP_DEADLINE):
+    """
+    fetch_concurrently 的异步版本，fetch_func(item) 返回协程。
+    与线程版不同，超时的任务会被真正取消（连接随之关闭），结果不会写入缓存。
+    """
+    if not items:
+        return []
+
+    tasks = [asyncio.ensure_future(fetch_func(item)) for item in items]
+    done, not_done = await asyncio.wait(tasks, timeout=deadline)
+    for task in not_done:
+        task.cancel()
+
+    results = []
+    for task in tasks:
+        if task in done and not task.cancelled() and task.exception() is None:
+            results.append(task.result() or "")
+        else:
+            results.append("")
+    return results
+
+
+async def afetch_first_k(items, fetch_func, k, is_valid, deadline=STEP_DEADLINE, group=None):
+    """fetch_first_k 的异步版本，fetch_func(item) 返回协程；已凑够的组直接取消其余任务"""
+    if not items:
+        return []
+
+    keys = [group(item) if group else None for item in items]
+    need = {key: k for key in keys}
+    tasks = {asyncio.ensure_future(fetch_func(item)): i for i, item in enumerate(items)}
+    results = [None] * len(items)
+    pending = set(tasks)
+    deadline_at = time.monotonic() + deadline
+
+    while pending and any(n > 0 for n in need.values()):
+        done, pending = await asyncio.wait(pending, timeout=max(0.0, deadline_at - time.monotonic()),
+                                           return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            break
+        for task in done:
+            if task.cancelled():
+                continue
+            i = tasks[task]
+            text = (task.result() or "") if task.exception() is None else ""
+            results[i] = text
+            if is_valid(text):
+                need[keys[i]] -= 1
+        for task in list(pending):
+            if need[keys[tasks[task]]] <= 0:
+                task.cancel()
+                pending.discard(task)
+
+    for task in pending:
+        task.cancel()
+    return results
@@ -0,0 +1,137 @@
+"""
+共享传输层：连接池化的 HTTP 会话、可复用的 DDGS 与 LLM 客户端。
+
+以前每次搜索和抓取都是裸的 requests.get / requests.post / trafilatura.fetch_url，
+search_ddg 每个查询都新建 DDGS，run_agent_generator 每个问题都新建 OpenAI 客户端，
+每次都要重新做 DNS、TCP、TLS 握手（走代理时更慢）。这里按代理分别维护长连接池，
+供所有搜索源、网页抓取和 LLM 调用共用。安装了 h2 时 API 与 LLM 端点走 HTTP/2。
+requests / httpx / openai / duckduckgo_search 都在第一次创建对应客户端时才导入。
+"""
+import importlib.util
+import threading
+from collections import OrderedDict
+
+# ================= 配置区 =================
+
+# 每个会话缓存多少个主机的连接池
+POOL_CONNECTIONS = 32
+
+# 每个主机连接池保留的最大连接数（应不小于抓取线程池大小）
+POOL_MAXSIZE = 16
+
+# LLM 客户端的最大连接数与长连接数
+LLM_MAX_CONNECTIONS = 20
+LLM_MAX_KEEPALIVE = 10
+
+# 最多缓存多少个不同 (api_key, base_url) 的 LLM 客户端，超出时淘汰最久未用的
+MAX_LLM_CLIENTS = 16
+
+# 是否可以使用 HTTP/2（需要 pip install h2）
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_lock = threading.RLock()
+_sessions = {}
+_api_client = None
+_llm_clients = OrderedDict()
+_ddgs_clients = {}
+
+
+def get_session(proxy=None):
+    """按代理地址复用的 requests 会话（每个主机一个长连接池）；指定代理时不再读取环境变量中的代理设置"""
+    session = _sessions.get(proxy)
+    if session is None:
+        with _lock:
+            session = _sessions.get(proxy)
+            if session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                # 走代理时会关闭证书校验，忽略对应的 SSL 警告
+                requests.packages.urllib3.disable_warnings()
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                if proxy:
+                    session.proxies = {"http": proxy, "https": proxy}
+                    # requests 会让 HTTP(S)_PROXY 环境变量覆盖 session.proxies，界面上填写的代理就被悄悄忽略了
+                    session.trust_env = False
+                _sessions[proxy] = session
+    return session
+
+
+def get_api_client():
+    """
+    搜索 API（Bocha / Google）共用的客户端。
+    装了 h2 时返回支持 HTTP/2 的 httpx.Client，否则退回连接池化的 requests 会话；
+    两者的 get/post/status_code/json() 用法一致。
+    """
+    global _api_client
+    if _api_client is None:
+        with _lock:
+            if _api_client is None:
+                if HTTP2_AVAILABLE:
+                    import httpx
+                    _api_client = httpx.Client(
+                        http2=True,
+                        limits=httpx.Limits(max_connections=POOL_MAXSIZE, max_keepalive_connections=POOL_MAXSIZE)
+                    )
+                else:
+                    _api_client = get_session(None)
+    return _api_client
+
+
+def get_llm_client(api_key, base_url):
+    """
+    按 (api_key, base_url) 复用的 OpenAI 客户端，底层共享一个长连接池。
+    最多保留 MAX_LLM_CLIENTS 个，淘汰的客户端不主动关闭（可能仍有调用在进行），由垃圾回收释放连接。
+    """
+    key = (api_key, base_url)
+    with _lock:
+        client = _llm_clients.get(key)
+        if client is not None:
+            _llm_clients.move_to_end(key)
+            return client
+        import httpx
+        from openai import OpenAI
+        http_client = httpx.Client(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE)
+        )
+        client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+        _llm_clients[key] = client
+        while len(_llm_clients) > MAX_LLM_CLIENTS:
+            _llm_clients.popitem(last=False)
+    return client
+
+
+class _ThreadLocalDDGS:
+    """
+    跨查询复用的 DDGS：DDGS 本身不保证线程安全，每个线程各用一个实例，
+    不同线程（多查询并行、多个会话）的 DDG 请求不必互相排队
+    """
+
+    def __init__(self, proxy, timeout):
+        self.proxy = proxy
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def text(self, **kwargs):
+        ddgs = getattr(self._local, "ddgs", None)
+        if ddgs is None:
+            from duckduckgo_search import DDGS
+            ddgs = self._local.ddgs = DDGS(proxy=self.proxy, timeout=self.timeout)
+        return list(ddgs.text(**kwargs))
+
+
+def get_ddgs(proxy=None, timeout=30):
+    """按代理地址复用的 DDGS 客户端，text() 直接返回结果列表"""
+    key = (proxy, timeout)
+    ddgs = _ddgs_clients.get(key)
+    if ddgs is None:
+        with _lock:
+            ddgs = _ddgs_clients.get(key)
+            if ddgs is None:
+                ddgs = _ThreadLocalDDGS(proxy, timeout)
+                _ddgs_clients[key] = ddgs
+    return ddgs
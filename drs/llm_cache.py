@@ -0,0 +1,277 @@
+"""
+本地 LLM 响应缓存与录制/回放。
+
+为调试、演示或评测重复运行同一个问题时，每次 chat.completions.create 都要重新付费、
+重新等待。这里按 (模型, 消息, 参数) 的哈希把完整响应（正文、工具调用与 usage）存进 SQLite，
+包装后的客户端与 OpenAI / AsyncOpenAI 客户端用法一致，流式请求命中时按分片回放，
+一次录制好的研究会话回放只需几毫秒。
+
+模式：
+- off：不使用缓存
+- cache：先查缓存，未命中时调用模型并写回
+- record：总是调用模型，并覆盖已有记录
+- replay：只从记录中回放，未命中时抛出 LLMCacheMiss（不会产生任何模型调用）
+
+系统提示中的当前时间等易变内容通过 ignore 参数在计算缓存键时剔除，否则每次运行的键都不同。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+from drs.page_cache import CACHE_DIR
+
+# ================= 配置区 =================
+
+# 默认模式，可通过环境变量 DRS_LLM_CACHE 覆盖（off / cache / record / replay）
+LLM_CACHE_MODE = os.environ.get("DRS_LLM_CACHE", "off")
+
+MODES = ("off", "cache", "record", "replay")
+
+
+class LLMCacheMiss(Exception):
+    """回放模式下请求不在记录中"""
+
+
+def request_key(request, ignore=()):
+    """
+    请求的缓存键：对模型、消息与其余参数（stream 除外）做 SHA-256。
+    ignore 中的字符串会先从各条消息内容里剔除。
+    """
+    messages = []
+    for m in request.get("messages", []):
+        m = dict(m)
+        if isinstance(m.get("content"), str):
+            for text in ignore:
+                m["content"] = m["content"].replace(text, "")
+        messages.append(m)
+    payload = {k: v for k, v in request.items() if k not in ("stream", "messages")}
+    payload["messages"] = messages
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """基于 SQLite 的 LLM 响应记录（线程安全，可多进程共享同一个文件）"""
+
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "llm.sqlite3")
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, key):
+        """命中返回响应 dict，未命中返回 None"""
+        with self._lock:
+            try:
+                row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, model, response):
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, response, created_at) VALUES (?, ?, ?, ?)",
+                    (key, model, json.dumps(response, ensure_ascii=False), time.time())
+                )
+                self._conn.commit()
+            except sqlite3.Error:
+                pass
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """进程内共享的默认实例"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = LLMCache()
+    return _default_cache
+
+
+# ================= 响应的保存与回放 =================
+
+class _Recorder:
+    """从流式分片或普通响应中累积出可保存的响应：{"content", "tool_calls", "usage"}"""
+
+    def __init__(self):
+        self.content = []
+        self.tool_calls = {}
+        self.usage = None
+
+    def add_chunk(self, chunk):
+        if getattr(chunk, "usage", None):
+            self.usage = {"prompt_tokens": chunk.usage.prompt_tokens,
+                          "completion_tokens": chunk.usage.completion_tokens}
+        if not chunk.choices:
+            return
+        delta = chunk.choices[0].delta
+        if delta.content:
+            self.content.append(delta.content)
+        for tc in getattr(delta, "tool_calls", None) or []:
+            entry = self.tool_calls.setdefault(tc.index, {"id": None, "name": "", "arguments": ""})
+            entry["id"] = tc.id or entry["id"]
+            if tc.function:
+                entry["name"] += tc.function.name or ""
+                entry["arguments"] += tc.function.arguments or ""
+
+    def add_completion(self, completion):
+        message = completion.choices[0].message
+        self.content.append(message.content or "")
+        for i, tc in enumerate(getattr(message, "tool_calls", None) or []):
+            self.tool_calls[i] = {"id": tc.id, "name": tc.function.name, "arguments": tc.function.arguments}
+        if getattr(completion, "usage", None):
+            self.usage = {"prompt_tokens": completion.usage.prompt_tokens,
+                          "completion_tokens": completion.usage.completion_tokens}
+
+    def response(self):
+        return {"content": "".join(self.content),
+                "tool_calls": [self.tool_calls[i] for i in sorted(self.tool_calls)],
+                "usage": self.usage}
+
+
+def _replay_chunks(response):
+    """把保存的响应还原为流式分片（正文一片、每个工具调用一片，最后一片带 usage）"""
+    tool_calls = [SimpleNamespace(index=i, id=tc["id"], type="function",
+                                  function=SimpleNamespace(name=tc["name"], arguments=tc["arguments"]))
+                  for i, tc in enumerate(response["tool_calls"])]
+    delta = SimpleNamespace(role="assistant", content=response["content"] or None, tool_calls=tool_calls or None)
+    usage = SimpleNamespace(**response["usage"]) if response.get("usage") else None
+    yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)], usage=None)
+    yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=None, tool_calls=None),
+                                                   finish_reason="tool_calls" if tool_calls else "stop")],
+                          usage=usage)
+
+
+def _replay_completion(response):
+    tool_calls = [SimpleNamespace(id=tc["id"], type="function",
+                                  function=SimpleNamespace(name=tc["name"], arguments=tc["arguments"]))
+                  for tc in response["tool_calls"]]
+    message = SimpleNamespace(role="assistant", content=response["content"], tool_calls=tool_calls or None)
+    usage = SimpleNamespace(**response["usage"]) if response.get("usage") else None
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")], usage=usage)
+
+
+class _CachingClient:
+    def __init__(self, client, mode, cache, ignore):
+        if mode not in MODES:
+            raise ValueError(f"未知的 LLM 缓存模式: {mode}")
+        self.client = client
+        self.mode = mode
+        self.cache = cache or get_llm_cache()
+        self.ignore = tuple(text for text in ignore if text)
+        # 与 OpenAI 客户端相同的调用路径：client.chat.completions.create(...)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _lookup(self, request):
+        """返回 (缓存键, 命中的响应或 None)；回放模式未命中时抛出 LLMCacheMiss"""
+        key = request_key(request, self.ignore)
+        response = None if self.mode == "record" else self.cache.get(key)
+        if response is None and self.mode == "replay":
+            raise LLMCacheMiss(f"回放记录中没有该请求（{key[:12]}）")
+        return key, response
+
+
+class CachingLLMClient(_CachingClient):
+    """包装 OpenAI 客户端；流式响应在被完整读取后才写入缓存"""
+
+    def create(self, **request):
+        key, response = self._lookup(request)
+        if response is not None:
+            return _replay_chunks(response) if request.get("stream") else _replay_completion(response)
+        result = self.client.chat.completions.create(**request)
+        if not request.get("stream"):
+            recorder = _Recorder()
+            recorder.add_completion(result)
+            self.cache.set(key, request.get("model", ""), recorder.response())
+            return result
+        return self._record(key, request.get("model", ""), result)
+
+    def _record(self, key, model, stream):
+        recorder = _Recorder()
+        for chunk in stream:
+            recorder.add_chunk(chunk)
+            yield chunk
+        self.cache.set(key, model, recorder.response())
+
+
+class AsyncCachingLLMClient(_CachingClient):
+    """包装 AsyncOpenAI 客户端，用法同 CachingLLMClient；缓存的 SQLite 读写放到线程中执行"""
+
+    async def create(self, **request):
+        from drs.fetcher import to_thread
+
+        key, response = await to_thread(self._lookup, request)
+        if response is not None:
+            return self._aiter(_replay_chunks(response)) if request.get("stream") else _replay_completion(response)
+        result = await self.client.chat.completions.create(**request)
+        if not request.get("stream"):
+            recorder = _Recorder()
+            recorder.add_completion(result)
+            await to_thread(self.cache.set, key, request.get("model", ""), recorder.response())
+            return result
+        return self._record(key, request.get("model", ""), result)
+
+    @staticmethod
+    async def _aiter(chunks):
+        for chunk in chunks:
+            yield chunk
+
+    async def _record(self, key, model, stream):
+        from drs.fetcher import to_thread
+
+        recorder = _Recorder()
+        async for chunk in stream:
+            recorder.add_chunk(chunk)
+            yield chunk
+        await to_thread(self.cache.set, key, model, recorder.response())
+
+
+def wrap_llm_client(client, mode=None, ignore=(), cache=None, is_async=False):
+    """
+    按模式包装 LLM 客户端；mode 为 None 时使用 LLM_CACHE_MODE，为 off 时原样返回。
+    :param ignore: 计算缓存键时从消息中剔除的易变文字（如当前时间）
+    """
+    mode = mode or LLM_CACHE_MODE
+    if mode == "off":
+        return client
+    cls = AsyncCachingLLMClient if is_async else CachingLLMClient
+    return cls(client, mode, cache, ignore)
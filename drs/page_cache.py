@@ -0,0 +1,208 @@
+"""
+本地网页正文缓存：app.py 与三个独立脚本共用。
+
+同一个 URL（尤其是维基百科这类高频页面）在一次研究中经常被反复搜到，
+以前每次都要重新下载并重跑 trafilatura。这里用 SQLite 保存 zlib 压缩后的
+完整提取正文，按规范化 URL 作为键，带 TTL、容量上限、LRU 淘汰和命中统计。
+缓存的是未截断的正文，截断由各调用方自行决定。
+另有一张 links 表保存下载时顺带提取的页面外链，供子网页抓取（drs.crawler）使用。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# ================= 配置区 =================
+
+# 缓存目录，可通过环境变量 DRS_CACHE_DIR 覆盖
+CACHE_DIR = os.environ.get("DRS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "drs"))
+
+# 正文有效期（秒），默认 3 天
+PAGE_TTL = 3 * 24 * 3600
+
+# 压缩后正文的总容量上限（字节），超出后按最近最少使用淘汰
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+
+# 每写入多少条检查一次容量，避免每次写入都做全表统计
+EVICT_CHECK_INTERVAL = 50
+
+# 规范化 URL 时丢弃的追踪参数
+TRACKING_PARAMS = ("utm_", "spm", "fbclid", "gclid", "share_source")
+
+
+def normalize_url(url):
+    """
+    URL 规范化：小写协议与主机、去掉默认端口、锚点和追踪参数、查询参数排序、去掉末尾斜杠。
+    """
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "http"
+    netloc = parts.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not k.lower().startswith(TRACKING_PARAMS)]
+    query.sort()
+
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+class PageCache:
+    """基于 SQLite 的网页正文缓存（线程安全，可多进程共享同一个文件）"""
+
+    def __init__(self, path=None, ttl=PAGE_TTL, max_bytes=MAX_CACHE_BYTES):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "pages.sqlite3")
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_accessed ON pages(accessed_at)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS links (
+                url TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, url):
+        """命中返回完整正文，未命中或已过期返回 None"""
+        key = normalize_url(url)
+        if not key:
+            return None
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._conn.execute("SELECT body, fetched_at FROM pages WHERE url = ?", (key,)).fetchone()
+                if row is not None and now - row[1] > self.ttl:
+                    self._conn.execute("DELETE FROM pages WHERE url = ?", (key,))
+                    self._conn.commit()
+                    row = None
+                if row is not None:
+                    self._conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (now, key))
+                    self._conn.commit()
+            except sqlite3.Error:
+                # 缓存故障（如多进程锁冲突）不能影响抓取，按未命中处理
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def set(self, url, text):
+        """写入完整正文（空内容不缓存）"""
+        key = normalize_url(url)
+        if not key or not text:
+            return
+        body = zlib.compress(text.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pages (url, body, size, fetched_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, body, len(body), now, now)
+                )
+                self._conn.commit()
+                self._writes += 1
+                if self._writes % EVICT_CHECK_INTERVAL == 0:
+                    self._evict()
+            except sqlite3.Error:
+                pass
+
+    def get_links(self, url):
+        """页面的外链列表 [[链接, 锚文本], ...]，未记录或已过期返回 None"""
+        key = normalize_url(url)
+        if not key:
+            return None
+        with self._lock:
+            try:
+                row = self._conn.execute("SELECT body, fetched_at FROM links WHERE url = ?", (key,)).fetchone()
+            except sqlite3.Error:
+                row = None
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def set_links(self, url, links):
+        """写入页面外链（与正文同样按 TTL 过期）"""
+        key = normalize_url(url)
+        if not key:
+            return
+        body = zlib.compress(json.dumps(links, ensure_ascii=False).encode("utf-8"))
+        with self._lock:
+            try:
+                self._conn.execute("INSERT OR REPLACE INTO links (url, body, fetched_at) VALUES (?, ?, ?)",
+                                   (key, body, time.time()))
+                self._conn.commit()
+            except sqlite3.Error:
+                pass
+
+    def _evict(self):
+        """删除过期条目，再按 LRU 淘汰直到低于容量上限（调用方需持有锁）"""
+        self._conn.execute("DELETE FROM pages WHERE fetched_at < ?", (time.time() - self.ttl,))
+        self._conn.execute("DELETE FROM links WHERE fetched_at < ?", (time.time() - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total > self.max_bytes:
+            rows = self._conn.execute("SELECT url, size FROM pages ORDER BY accessed_at ASC").fetchall()
+            stale = []
+            for url, size in rows:
+                if total <= self.max_bytes:
+                    break
+                stale.append((url,))
+                total -= size
+            self._conn.executemany("DELETE FROM pages WHERE url = ?", stale)
+        self._conn.commit()
+
+    def stats(self):
+        """命中统计与当前占用"""
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+        }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_page_cache():
+    """进程内共享的默认缓存实例"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = PageCache()
+    return _default_cache
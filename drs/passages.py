@@ -0,0 +1,136 @@
+"""
+按查询挑选网页段落，替代盲目的 text[:N] 截断。
+
+trafilatura 提取的正文开头常是导航、简介等与问题无关的内容，真正相关的段落
+往往在后半部分。这里把正文切成若干段，用 BM25（NumPy 向量化）按当前查询打分，
+在每个来源的 Token 预算内挑出得分最高的段落，按原文顺序拼接。
+"""
+import re
+
+from drs.context_manager import estimate_tokens
+
+# ================= 配置区 =================
+
+# 每段的目标字符数（按句子边界切分，可能略有浮动）
+CHUNK_CHARS = 300
+
+# BM25 参数
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# 首段通常是定义/概述，给一点先验加分
+LEAD_BONUS = 0.5
+
+# 剩余预算不少于该值时，放不下的相关段落截断后仍然保留
+MIN_PARTIAL_TOKENS = 60
+
+_WORD_RE = re.compile(r"[a-z0-9]+|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+")
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+_SENTENCE_RE = re.compile(r"[^。！？!?；;\n]+[。！？!?；;\n]*|[。！？!?；;\n]+")
+
+
+def tokenize(text):
+    """英文/数字按词切分，中日韩文本按相邻两字切分（单字词保留本身）"""
+    tokens = []
+    for word in _WORD_RE.findall(text.lower()):
+        if _CJK_RE.match(word):
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def chunk_text(text, size=CHUNK_CHARS):
+    """按句子边界把正文切成约 size 字符的段落"""
+    chunks = []
+    current = ""
+    for sentence in _SENTENCE_RE.findall(text):
+        if current and len(current) + len(sentence) > size:
+            chunks.append(current.strip())
+            current = ""
+        current += sentence
+        # 超长句子（如无标点的表格文本）硬切
+        while len(current) > size * 2:
+            chunks.append(current[:size].strip())
+            current = current[size:]
+    if current.strip():
+        chunks.append(current.strip())
+    return [c for c in chunks if c]
+
+
+def bm25_scores(chunks, query):
+    """对每段计算 BM25 得分，返回 numpy 数组"""
+    import numpy as np
+    terms = sorted(set(tokenize(query)))
+    if not terms or not chunks:
+        return np.zeros(len(chunks))
+
+    index = {t: j for j, t in enumerate(terms)}
+    tf = np.zeros((len(chunks), len(terms)))
+    lengths = np.zeros(len(chunks))
+    for i, chunk in enumerate(chunks):
+        tokens = tokenize(chunk)
+        lengths[i] = len(tokens)
+        for token in tokens:
+            j = index.get(token)
+            if j is not None:
+                tf[i, j] += 1
+
+    df = (tf > 0).sum(axis=0)
+    idf = np.log(1 + (len(chunks) - df + 0.5) / (df + 0.5))
+    avg_len = lengths.mean() or 1.0
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_len)
+    return ((tf * (BM25_K1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+def select_passages(text, query, max_tokens):
+    """
+    在 max_tokens 预算内挑出与 query 最相关的段落，按原文顺序用 " … " 拼接。
+    正文本身不超预算或没有查询时，退化为按预算截取开头。
+    """
+    if not text:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if not query:
+        return _truncate_to_budget(text, max_tokens)
+
+    import numpy as np
+
+    chunks = chunk_text(text)
+    scores = bm25_scores(chunks, query)
+    if len(scores):
+        scores[0] += LEAD_BONUS
+
+    picked = {}
+    used = 0
+    for i in np.argsort(-scores, kind="stable"):
+        i = int(i)
+        cost = estimate_tokens(chunks[i])
+        if used + cost > max_tokens:
+            # 相关段落放不下时截取能放下的部分，避免被更短的无关段落顶替
+            remaining = max_tokens - used
+            if scores[i] > 0 and remaining >= MIN_PARTIAL_TOKENS:
+                picked[i] = _truncate_to_budget(chunks[i], remaining)
+                used = max_tokens
+            continue
+        picked[i] = chunks[i]
+        used += cost
+    if not picked:
+        return _truncate_to_budget(text, max_tokens)
+    return " … ".join(picked[i] for i in sorted(picked))
+
+
+def _truncate_to_budget(text, max_tokens):
+    """按 token 预算截取开头（二分查找字符位置）"""
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo]
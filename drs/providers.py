@@ -0,0 +1,421 @@
+"""
+搜索源：Bocha / Google / DuckDuckGo / 联合搜索，统一为 SearchProvider 接口。
+
+每个搜索源分两段：先取搜索引擎原始条目（走查询缓存），再由报告拼装层并发抓取正文（走网页缓存）。
+候选来源统一为 {"title", "link", "snippet"}，出错时抛出 SearchError，由报告拼装层转成提示文字。
+新增搜索源只需继承 SearchProvider 并实现 candidates()；异步引擎（drs.async_agent）调用
+acandidates()，默认放到线程里执行 candidates()，Bocha / Google / 联合搜索另有原生异步实现。
+
+查询缓存未命中、真正调用搜索 API 时经由调度器（drs.scheduler）：Bocha / Google 可填写多个 Key
+（逗号分隔）轮换使用，限流时退避，额度用完时换 Key；所有 Key 都不可用时抛出 ProviderUnavailable，
+get_provider 返回的搜索源据此改用其他已配置的搜索源。
+"""
+from drs.domain_health import match_domain
+from drs.federated import arace_providers, race_providers, rrf_merge
+from drs.fetcher import HEADERS, to_thread
+from drs.http_pool import get_api_client, get_ddgs
+from drs.query_cache import get_query_cache
+from drs.scheduler import NoKeyAvailable, QuotaExhausted, Throttled, get_scheduler, split_keys
+from drs.tracing import span
+
+# ================= 配置区 =================
+
+# 搜索 API 地址（基准测试时指向本地模拟服务）
+BOCHA_API_URL = "https://api.bochaai.com/v1/web-search"
+GOOGLE_API_URL = "https://www.googleapis.com/customsearch/v1"
+
+# DDG 结果中直接跳过的域名（按域名后缀匹配）
+BLACKLIST = ["baidu.com", "zhihu.com", "tieba.baidu.com", "zhidao.baidu.com", "bilibili.com", "csdn.net"]
+
+# 抓取 DDG 结果页面时的请求头：降低中文权重，海外站点优先返回英文版本
+DDG_PAGE_HEADERS = dict(HEADERS, **{"Accept-Language": "en-US,en;q=0.9,zh-CN;q=0.8"})
+
+# 对冲抓取（DDG / Google）：多取一些候选同时抓取，每个查询保留最先成功的几个
+HEDGE_CANDIDATES = 6
+HEDGE_KEEP = 3
+
+# DDG 每个查询取多少条结果、黑名单过滤后保留多少个候选、凑够多少个有效正文
+# （命令行脚本可在运行前调大，见 duckduckgo search.py）
+DDG_MAX_RESULTS = 10
+DDG_CANDIDATES = HEDGE_CANDIDATES
+DDG_KEEP = HEDGE_KEEP
+
+# 联合搜索：并行调用搜索 API 的总时限（秒，需覆盖 DDG 的 30 秒超时），
+# 至少几个搜索源返回且凑够多少条去重结果即提前返回（单个搜索源就能给出 HEDGE_CANDIDATES 条，
+# 只看条数会在第一个搜索源返回时就结束，RRF 融合不到第二个源），以及最终保留的来源数
+SEARCH_DEADLINE = 35
+FEDERATED_MIN_SOURCES = 2
+FEDERATED_ENOUGH = 6
+FEDERATED_TOP_K = 4
+
+# 主搜索源的 Key 额度用完或持续限流时，是否改用其他已配置的搜索源
+FAILOVER = True
+
+# 错误响应中表示当日额度 / 余额耗尽的字样（其余 429 视为短时限流）
+QUOTA_HINTS = ("dailyLimitExceeded", "per day", "余额不足", "insufficient balance")
+
+
+class SearchError(Exception):
+    """搜索源返回的可读错误，直接展示给模型"""
+
+
+class ProviderUnavailable(SearchError):
+    """搜索源的所有 Key 都已用完额度或处于限流冷却中，可改用其他搜索源"""
+
+
+class SearchProvider:
+    """
+    搜索源接口。
+    candidates(query) 返回按排名排列的候选来源，出错时抛出 SearchError；
+    其余属性告诉报告拼装层如何抓取正文。
+    """
+    # 报告中显示的名称
+    label = ""
+    # 抓取正文时使用的代理（候选来源里带 proxy 字段时以候选为准）
+    page_proxy = None
+    # 抓取正文时的请求头，None 使用 drs.fetcher.HEADERS（候选来源里带 headers 字段时以候选为准）
+    page_headers = None
+    # 正文短于该长度时改用摘要
+    min_len = 200
+    # 对冲抓取时每个查询保留的来源数；None 表示抓取全部候选
+    keep = None
+
+    def candidates(self, query):
+        raise NotImplementedError
+
+    async def acandidates(self, query, client):
+        """candidates() 的异步版本，client 为 httpx.AsyncClient；默认在线程中执行同步实现"""
+        return await to_thread(self.candidates, query)
+
+
+async def _acached_items(source, query, count, freshness, fetch_func):
+    """QueryCache.cached_items 的异步版本：fetch_func() 返回协程；SQLite 读写放到线程中执行"""
+    cache = get_query_cache()
+    items = await to_thread(cache.get, source, query, count, freshness)
+    if items is None:
+        items = await fetch_func()
+        await to_thread(cache.set, source, query, count, freshness, items)
+    return items
+
+
+def _retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _raise_for_limits(resp, name, forbidden_is_quota=False):
+    """把额度耗尽 / 限流的响应转成 QuotaExhausted / Throttled，交给调度器换 Key 或退避"""
+    status = resp.status_code
+    if status not in (402, 403, 429):
+        return
+    text = resp.text or ""
+    if status == 402 or any(hint in text for hint in QUOTA_HINTS) or (status == 403 and forbidden_is_quota):
+        raise QuotaExhausted(f"{name} 额度已用完 ({status})")
+    if status == 429 or "rateLimitExceeded" in text:
+        raise Throttled(f"{name} 限流 ({status})", _retry_after(resp.headers.get("Retry-After")))
+
+
+# --- Bocha ---
+
+def _bocha_request(query, api_key, count, freshness):
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    payload = {"query": query, "count": count, "summary": True, "freshness": freshness}
+    return headers, payload
+
+
+def _bocha_parse(resp, s):
+    s.set(status=resp.status_code)
+    # Bocha 余额不足时返回 403
+    _raise_for_limits(resp, "Bocha", forbidden_is_quota=True)
+    if resp.status_code == 200:
+        data = resp.json()
+        if "data" in data and "webPages" in data["data"]:
+            s.set(results=len(data["data"]["webPages"]["value"]))
+            return data["data"]["webPages"]["value"]
+    return []
+
+
+def _bocha_items(query, api_key, count=3, freshness="noLimit"):
+    headers, payload = _bocha_request(query, api_key, count, freshness)
+    with span("bocha", "provider", query=query) as s:
+        return _bocha_parse(get_api_client().post(BOCHA_API_URL, headers=headers, json=payload, timeout=15), s)
+
+
+async def _abocha_items(client, query, api_key, count=3, freshness="noLimit"):
+    headers, payload = _bocha_request(query, api_key, count, freshness)
+    with span("bocha", "provider", query=query) as s:
+        return _bocha_parse(await client.post(BOCHA_API_URL, headers=headers, json=payload, timeout=15), s)
+
+
+class BochaProvider(SearchProvider):
+    label = "Bocha"
+
+    def __init__(self, api_key):
+        # 可填写多个 Key（逗号分隔），由调度器轮换
+        self.api_keys = split_keys(api_key)
+
+    def candidates(self, query):
+        if not self.api_keys: raise SearchError("❌ 错误：未填写 Bocha API Key")
+        try:
+            items = get_query_cache().cached_items(
+                "bocha", query, 3, "noLimit",
+                lambda: get_scheduler().call("bocha", self.api_keys, lambda key: _bocha_items(query, key))
+            )
+        except NoKeyAvailable as e:
+            raise ProviderUnavailable(f"Bocha 暂不可用: {e}")
+        except Exception as e:
+            raise SearchError(f"Bocha 接口异常: {e}")
+        return self._to_candidates(items)
+
+    async def acandidates(self, query, client):
+        if not self.api_keys: raise SearchError("❌ 错误：未填写 Bocha API Key")
+        try:
+            items = await _acached_items(
+                "bocha", query, 3, "noLimit",
+                lambda: get_scheduler().acall("bocha", self.api_keys, lambda key: _abocha_items(client, query, key))
+            )
+        except NoKeyAvailable as e:
+            raise ProviderUnavailable(f"Bocha 暂不可用: {e}")
+        except Exception as e:
+            raise SearchError(f"Bocha 接口异常: {e}")
+        return self._to_candidates(items)
+
+    @staticmethod
+    def _to_candidates(items):
+        if not items: raise SearchError("Bocha 未返回有效结果。")
+        return [{"title": item.get('name'), "link": item.get('url', ''),
+                 "snippet": item.get('summary', '') or item.get('snippet', '')} for item in items]
+
+
+# --- Google ---
+
+def _google_parse(resp, s):
+    s.set(status=resp.status_code)
+    _raise_for_limits(resp, "Google")
+    if resp.status_code != 200:
+        raise RuntimeError(f"Google 接口报错: {resp.status_code}")
+    items = resp.json().get('items', [])
+    s.set(results=len(items))
+    return items
+
+
+def _google_items(query, api_key, cx_id, num=3):
+    params = {'q': query, 'key': api_key, 'cx': cx_id, 'num': num}
+    with span("google", "provider", query=query) as s:
+        return _google_parse(get_api_client().get(GOOGLE_API_URL, params=params, timeout=15), s)
+
+
+async def _agoogle_items(client, query, api_key, cx_id, num=3):
+    params = {'q': query, 'key': api_key, 'cx': cx_id, 'num': num}
+    with span("google", "provider", query=query) as s:
+        return _google_parse(await client.get(GOOGLE_API_URL, params=params, timeout=15), s)
+
+
+class GoogleProvider(SearchProvider):
+    label = "Google"
+    keep = HEDGE_KEEP
+
+    def __init__(self, api_key, cx_id):
+        # 多个 Key（逗号分隔）共用同一个 CX，每个 Key 各有每日 100 次额度
+        self.api_keys = split_keys(api_key)
+        self.cx_id = cx_id
+
+    def candidates(self, query):
+        if not self.api_keys or not self.cx_id: raise SearchError("❌ 错误：未填写 Google API Key 或 CX ID")
+        try:
+            # 不同 CX 对应不同的自定义搜索引擎，结果不能混用；多取几条供对冲抓取（同样只算一次额度）
+            items = get_query_cache().cached_items(
+                f"google:{self.cx_id}", query, HEDGE_CANDIDATES, "",
+                lambda: get_scheduler().call(
+                    "google", self.api_keys, lambda key: _google_items(query, key, self.cx_id, HEDGE_CANDIDATES)
+                )
+            )
+        except NoKeyAvailable as e:
+            raise ProviderUnavailable(f"Google 暂不可用: {e}")
+        except Exception as e:
+            raise SearchError(f"Google 请求异常: {e}")
+        return self._to_candidates(items)
+
+    async def acandidates(self, query, client):
+        if not self.api_keys or not self.cx_id: raise SearchError("❌ 错误：未填写 Google API Key 或 CX ID")
+        try:
+            items = await _acached_items(
+                f"google:{self.cx_id}", query, HEDGE_CANDIDATES, "",
+                lambda: get_scheduler().acall(
+                    "google", self.api_keys,
+                    lambda key: _agoogle_items(client, query, key, self.cx_id, HEDGE_CANDIDATES)
+                )
+            )
+        except NoKeyAvailable as e:
+            raise ProviderUnavailable(f"Google 暂不可用: {e}")
+        except Exception as e:
+            raise SearchError(f"Google 请求异常: {e}")
+        return self._to_candidates(items)
+
+    @staticmethod
+    def _to_candidates(items):
+        if not items: raise SearchError("Google 未找到结果。")
+        return [{"title": item.get('title'), "link": item.get('link', ''), "snippet": item.get('snippet', '')}
+                for item in items]
+
+
+# --- DuckDuckGo ---
+
+def _ddg_items(query, proxy, max_results=10):
+    with span("ddg", "provider", query=query, via="proxy" if proxy else "direct") as s:
+        results = get_ddgs(proxy).text(keywords=query, region='wt-wt', max_results=max_results, backend="html")
+        s.set(results=len(results))
+        return results
+
+
+def _ddg_scheduled(query, proxy, max_results):
+    """DDG 没有 Key，只按令牌桶限速；被限流（RatelimitException）时交给调度器退避"""
+    def fetch(_key):
+        try:
+            return _ddg_items(query, proxy, max_results)
+        except Exception as e:
+            if "ratelimit" in type(e).__name__.lower():
+                raise Throttled(f"DuckDuckGo 限流: {e}")
+            raise
+    return get_scheduler().call("ddg", [], fetch)
+
+
+class DDGProvider(SearchProvider):
+    label = "DDG"
+    min_len = 500
+    page_headers = DDG_PAGE_HEADERS
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.page_proxy = proxy
+        self.keep = DDG_KEEP
+
+    def candidates(self, query):
+        try:
+            results = get_query_cache().cached_items(
+                "ddg", query, DDG_MAX_RESULTS, "wt-wt", lambda: _ddg_scheduled(query, self.proxy, DDG_MAX_RESULTS)
+            )
+        except NoKeyAvailable as e:
+            raise ProviderUnavailable(f"DuckDuckGo 暂不可用: {e}")
+        except Exception as e:
+            raise SearchError(f"DuckDuckGo 连接失败: {e}")
+        if not results: raise SearchError("DuckDuckGo 未找到结果。")
+
+        # 黑名单过滤后多保留几条候选，由对冲抓取挑出最先成功的
+        candidates = [{"title": item.get('title', ''), "link": item.get('href', ''), "snippet": item.get('body', '')}
+                      for item in results if not match_domain(item.get('href', ''), BLACKLIST)][:DDG_CANDIDATES]
+        if not candidates: raise SearchError("结果均在黑名单中。")
+        return candidates
+
+
+# --- 联合搜索 ---
+
+class FederatedProvider(SearchProvider):
+    """并发调用所有已配置的搜索源，按 URL 去重并用 RRF 融合排序"""
+    label = "联合搜索"
+
+    def __init__(self, bocha_key, google_key, google_cx, proxy):
+        self.providers = []
+        if bocha_key:
+            self.providers.append(BochaProvider(bocha_key))
+        if google_key and google_cx:
+            self.providers.append(GoogleProvider(google_key, google_cx))
+        self.providers.append(DDGProvider(proxy))
+        self.proxy = proxy
+
+    def candidates(self, query):
+        ranked_lists, errors = race_providers(
+            [(p.label, lambda p=p: p.candidates(query)) for p in self.providers], FEDERATED_ENOUGH, SEARCH_DEADLINE,
+            min_sources=FEDERATED_MIN_SOURCES
+        )
+        return self._merge(ranked_lists, errors)
+
+    async def acandidates(self, query, client):
+        ranked_lists, errors = await arace_providers(
+            [(p.label, lambda p=p: p.acandidates(query, client)) for p in self.providers],
+            FEDERATED_ENOUGH, SEARCH_DEADLINE, min_sources=FEDERATED_MIN_SOURCES
+        )
+        return self._merge(ranked_lists, errors)
+
+    def _merge(self, ranked_lists, errors):
+        merged = rrf_merge(ranked_lists)[:FEDERATED_TOP_K]
+        if not merged:
+            raise SearchError("联合搜索均未返回结果：" + "；".join(f"{name}: {err}" for name, err in errors))
+
+        for c in merged:
+            c["title"] = f"{c['title']} [{'/'.join(c['engines'])}]"
+            # 只被 DDG 搜到的多为海外站点，抓取时走代理
+            c["proxy"] = self.proxy if c["engines"] == ["DDG"] else None
+            c["headers"] = DDG_PAGE_HEADERS if c["engines"] == ["DDG"] else None
+        return merged
+
+
+# --- 故障转移 ---
+
+class FailoverProvider(SearchProvider):
+    """主搜索源不可用（额度用完 / 持续限流）时，依次改用其他搜索源；抓取参数沿用主搜索源"""
+
+    def __init__(self, primary, fallbacks):
+        self.primary = primary
+        self.fallbacks = fallbacks
+        self.label = primary.label
+        self.page_proxy = primary.page_proxy
+        self.page_headers = primary.page_headers
+        self.min_len = primary.min_len
+        self.keep = primary.keep
+
+    def candidates(self, query):
+        try:
+            return self.primary.candidates(query)
+        except ProviderUnavailable as e:
+            errors = [str(e)]
+        for p in self.fallbacks:
+            try:
+                return self._tag(p, p.candidates(query))
+            except SearchError as e:
+                errors.append(f"{p.label}: {e}")
+        raise SearchError("；".join(errors))
+
+    async def acandidates(self, query, client):
+        try:
+            return await self.primary.acandidates(query, client)
+        except ProviderUnavailable as e:
+            errors = [str(e)]
+        for p in self.fallbacks:
+            try:
+                return self._tag(p, await p.acandidates(query, client))
+            except SearchError as e:
+                errors.append(f"{p.label}: {e}")
+        raise SearchError("；".join(errors))
+
+    @staticmethod
+    def _tag(provider, candidates):
+        for c in candidates:
+            c["title"] = f"{c['title']} [{provider.label}]"
+            c.setdefault("proxy", provider.page_proxy)
+            c.setdefault("headers", provider.page_headers)
+        return candidates
+
+
+def get_provider(source, bocha_key="", google_key="", google_cx="", proxy=None):
+    """按界面上的搜索源编号（1~4）创建搜索源，无效编号返回 None"""
+    if source == 4:
+        return FederatedProvider(bocha_key, google_key, google_cx, proxy)
+    providers = {1: BochaProvider(bocha_key), 2: GoogleProvider(google_key, google_cx), 3: DDGProvider(proxy)}
+    primary = providers.pop(source, None)
+    if primary is None or not FAILOVER:
+        return primary
+    # 只切换到已配置的搜索源，顺序：Bocha、Google、DDG
+    fallbacks = [p for s, p in sorted(providers.items())
+                 if s == 3 or (s == 1 and bocha_key) or (s == 2 and google_key and google_cx)]
+    return FailoverProvider(primary, fallbacks)
+
+
+def quota_stats(bocha_key="", google_key=""):
+    """各搜索源 Key 的当日用量与冷却状态（Key 以短哈希表示）"""
+    scheduler = get_scheduler()
+    return {"bocha": scheduler.stats("bocha", split_keys(bocha_key)),
+            "google": scheduler.stats("google", split_keys(google_key)),
+            "ddg": scheduler.stats("ddg", [])}
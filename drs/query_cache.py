@@ -0,0 +1,156 @@
+"""
+搜索结果缓存：放在 Bocha / Google / DDG 的 API 调用前面。
+
+模型经常重复发出相同或只差大小写、空格的查询，而 Google 每天只有
+100 次免费额度、Bocha 按次计费。这里按 (搜索源, 规范化查询, 结果数, 时效) 缓存
+搜索引擎返回的原始条目（标题/链接/摘要），网页正文仍由 page_cache 单独缓存。
+带时效性的查询（汇率、新闻、“今天”等）使用更短的 TTL。
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from drs.page_cache import CACHE_DIR
+
+# ================= 配置区 =================
+
+# 普通查询的有效期（秒），默认 1 天
+QUERY_TTL = 24 * 3600
+
+# 时效性查询的有效期（秒），默认 10 分钟
+TIME_SENSITIVE_TTL = 10 * 60
+
+# 命中任一关键词即视为时效性查询
+TIME_SENSITIVE_KEYWORDS = [
+    "今天", "今日", "昨天", "现在", "目前", "当前", "最新", "实时", "近期", "本周", "本月",
+    "汇率", "股价", "天气", "新闻", "比分",
+    "today", "yesterday", "now", "current", "latest", "live", "breaking", "news",
+    "price", "weather", "score", "exchange rate",
+]
+
+# 非“不限时间”的 freshness（如 Bocha 的 oneDay/oneWeek）同样按时效性处理
+UNLIMITED_FRESHNESS = ("", "noLimit")
+
+# 英文关键词按整词匹配，避免 "now" 命中 "known"
+_TIME_SENSITIVE_RE = re.compile("|".join(
+    r"\b%s\b" % re.escape(k) if k.isascii() else re.escape(k) for k in TIME_SENSITIVE_KEYWORDS
+))
+
+
+def normalize_query(query):
+    """
+    查询规范化：只统一大小写、合并空白。
+    标点（C++ / C#）与词序（A 收购 B / B 收购 A）都可能改变查询含义，保持原样。
+    """
+    return " ".join((query or "").casefold().split())
+
+
+def is_time_sensitive(query, freshness=""):
+    """判断查询结果是否会很快过时"""
+    if freshness not in UNLIMITED_FRESHNESS:
+        return True
+    return _TIME_SENSITIVE_RE.search((query or "").casefold()) is not None
+
+
+class QueryCache:
+    """基于 SQLite 的搜索结果缓存，保存搜索 API 返回的原始条目列表"""
+
+    def __init__(self, path=None, ttl=QUERY_TTL, time_sensitive_ttl=TIME_SENSITIVE_TTL):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "queries.sqlite3")
+        self.path = path
+        self.ttl = ttl
+        self.time_sensitive_ttl = time_sensitive_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS queries (
+                source TEXT NOT NULL,
+                query TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                freshness TEXT NOT NULL,
+                items TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (source, query, count, freshness)
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, source, query, count, freshness=""):
+        """命中返回原始条目列表，未命中或已过期返回 None"""
+        key = (source, normalize_query(query), count, freshness or "")
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT items, expires_at FROM queries WHERE source = ? AND query = ? AND count = ? AND freshness = ?",
+                    key
+                ).fetchone()
+                if row is not None and row[1] < time.time():
+                    self._conn.execute(
+                        "DELETE FROM queries WHERE source = ? AND query = ? AND count = ? AND freshness = ?", key
+                    )
+                    self._conn.commit()
+                    row = None
+            except sqlite3.Error:
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, source, query, count, freshness, items):
+        """写入原始条目列表（空结果不缓存，避免把临时故障固化下来）"""
+        if not items:
+            return
+        ttl = self.time_sensitive_ttl if is_time_sensitive(query, freshness) else self.ttl
+        key = (source, normalize_query(query), count, freshness or "")
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO queries (source, query, count, freshness, items, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    key + (json.dumps(items, ensure_ascii=False), time.time() + ttl)
+                )
+                self._conn.execute("DELETE FROM queries WHERE expires_at < ?", (time.time(),))
+                self._conn.commit()
+            except sqlite3.Error:
+                pass
+
+    def cached_items(self, source, query, count, freshness, fetch_func):
+        """先查缓存，未命中时调用 fetch_func() 取原始条目并写回"""
+        items = self.get(source, query, count, freshness)
+        if items is None:
+            items = fetch_func()
+            self.set(source, query, count, freshness, items)
+        return items
+
+    def stats(self):
+        """命中统计"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_query_cache():
+    """进程内共享的默认缓存实例"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = QueryCache()
+    return _default_cache
@@ -0,0 +1,425 @@
+"""
+搜索 API 调度：多 Key 轮换、令牌桶限速、每日额度、限流退避。
+
+Google Custom Search 每个 Key 每天 100 次，Bocha 按次计费，DuckDuckGo 限流很凶。以前 Key 用完或
+被限流时搜索源只返回一句错误，这一步就白费了。这里在真正调用搜索 API 之前（查询缓存未命中时）
+为每次调用挑选一个可用的 Key：
+- 每个 Key 一个令牌桶，令牌不足时短暂等待，等待过久视为暂不可用
+- 按每日额度计数（按搜索源所在时区的零点重置），用完的 Key 当天不再使用；
+  Bocha 这类按余额计费的搜索源余额不足时，Key 一直停用，充值后用 python -m drs.scheduler --reset bocha 恢复
+- 遇到 429 等限流响应时该 Key 进入冷却，连续限流时冷却时间加倍；冷却较短时等待后重试，否则换下一个 Key
+- 所有 Key 都不可用时抛出 NoKeyAvailable，由搜索源转成 ProviderUnavailable，上层据此切换到其他搜索源
+
+每日用量与冷却状态持久化到 SQLite（只保存 Key 的哈希），重启后继续沿用；令牌桶只在内存中。
+多个进程共用同一个文件时，各自以首次读到的用量为起点计数；处于冷却或停用的 Key 在被拒绝前
+会重新读取 SQLite，另一个进程（如 python -m drs.scheduler --reset）解除的冷却在运行中的进程里立即生效。
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from drs.fetcher import to_thread
+from drs.page_cache import CACHE_DIR
+
+# ================= 配置区 =================
+
+# 各搜索源的限额：rate 每秒补充的令牌数（None 表示不在本地限速，只靠限流响应退避），
+# burst 令牌桶容量，daily 每个 Key 每日调用上限（None 表示不限），
+# reset_utc_offset 每日额度按哪个时区的零点重置（小时；Google 为太平洋时间，不区分夏令时），
+# quota_resets 额度耗尽后是否在重置时刻自动恢复（False 表示余额制，需手动 reset）
+PROVIDER_LIMITS = {
+    "google": {"rate": None, "burst": 10, "daily": 100, "reset_utc_offset": -8, "quota_resets": True},
+    "bocha": {"rate": None, "burst": 10, "daily": None, "reset_utc_offset": 8, "quota_resets": False},
+    "ddg": {"rate": 1.0, "burst": 4, "daily": None, "reset_utc_offset": 0, "quota_resets": True},
+}
+
+# 令牌不足或冷却剩余时间不超过该值（秒）时等待，否则视为暂不可用
+MAX_WAIT = 10
+
+# 被限流后的冷却：首次 BACKOFF_BASE 秒，连续被限流时加倍，不超过 BACKOFF_MAX
+BACKOFF_BASE = 2
+BACKOFF_MAX = 15 * 60
+
+# 一次搜索最多尝试几次（换 Key 或等待冷却后重试）
+MAX_ATTEMPTS = 3
+
+OK, THROTTLED, EXHAUSTED, FAILED = "ok", "throttled", "exhausted", "failed"
+
+# 余额耗尽、等待手动恢复的 Key 的冷却截止时间
+PARKED = float("inf")
+
+
+class Throttled(Exception):
+    """搜索 API 返回限流（如 429），retry_after 为服务端建议的等待秒数"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QuotaExhausted(Exception):
+    """搜索 API 返回额度耗尽 / 余额不足"""
+
+
+class NoKeyAvailable(Exception):
+    """所有 Key 都已用完额度、处于冷却或令牌不足"""
+
+
+def split_keys(value):
+    """把逗号、空白或换行分隔的多个 Key（或 Key 列表）整理成去重后的列表"""
+    raw = value if isinstance(value, (list, tuple)) else str(value or "").replace(",", " ").split()
+    keys = []
+    for key in raw:
+        key = str(key).strip()
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def key_id(key):
+    """持久化与统计中代替 Key 本身的短哈希"""
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:12] if key else "default"
+
+
+class Scheduler:
+    """按搜索源与 Key 记录用量、冷却与令牌（线程安全）"""
+
+    def __init__(self, path=None, limits=None):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "quota.sqlite3")
+        self.path = path
+        self.limits = limits or PROVIDER_LIMITS
+        self._lock = threading.Lock()
+        self._states = {}
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS key_state (
+                provider TEXT NOT NULL,
+                key_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                used INTEGER NOT NULL,
+                strikes INTEGER NOT NULL,
+                cooldown_until REAL NOT NULL,
+                PRIMARY KEY (provider, key_id)
+            )
+        """)
+        self._conn.commit()
+
+    # ---------- 状态 ----------
+
+    def _offset(self, provider):
+        return self.limits[provider].get("reset_utc_offset", 0) * 3600
+
+    def _day(self, provider, now):
+        return time.strftime("%Y-%m-%d", time.gmtime(now + self._offset(provider)))
+
+    def _next_reset(self, provider, now):
+        offset = self._offset(provider)
+        return ((now + offset) // 86400 + 1) * 86400 - offset
+
+    def _state(self, provider, key, now):
+        """读取（必要时从 SQLite 加载）并按日期刷新某个 Key 的状态（调用方需持有锁）"""
+        kid = key_id(key)
+        state = self._states.get((provider, kid))
+        if state is None:
+            limit = self.limits[provider]
+            state = {"day": self._day(provider, now), "used": 0, "strikes": 0, "cooldown_until": 0.0,
+                     "tokens": float(limit.get("burst") or 1), "refilled_at": now}
+            try:
+                row = self._conn.execute(
+                    "SELECT day, used, strikes, cooldown_until FROM key_state WHERE provider = ? AND key_id = ?",
+                    (provider, kid)
+                ).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row:
+                state.update(day=row[0], used=row[1], strikes=row[2], cooldown_until=row[3])
+            self._states[(provider, kid)] = state
+
+        today = self._day(provider, now)
+        if state["day"] != today:
+            state.update(day=today, used=0)
+        limit = self.limits[provider]
+        if limit.get("rate"):
+            state["tokens"] = min(float(limit["burst"]),
+                                  state["tokens"] + (now - state["refilled_at"]) * limit["rate"])
+        state["refilled_at"] = now
+        return state
+
+    def _refresh_cooldown(self, provider, key, state):
+        """SQLite 中的冷却比内存中的早结束（被其他进程 reset）时采用 SQLite 的值（调用方需持有锁）"""
+        try:
+            row = self._conn.execute(
+                "SELECT strikes, cooldown_until FROM key_state WHERE provider = ? AND key_id = ?",
+                (provider, key_id(key))
+            ).fetchone()
+        except sqlite3.Error:
+            return
+        if row and row[1] < state["cooldown_until"]:
+            state.update(strikes=row[0], cooldown_until=row[1])
+
+    def _save(self, provider, key, state):
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO key_state (provider, key_id, day, used, strikes, cooldown_until) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (provider, key_id(key), state["day"], state["used"], state["strikes"], state["cooldown_until"])
+            )
+            self._conn.commit()
+        except sqlite3.Error:
+            pass
+
+    # ---------- 调度 ----------
+
+    def reserve(self, provider, keys):
+        """
+        挑选一个 Key 并预占一次额度与一个令牌：优先无需等待的，其次当天用量最少的。
+        :return: (Key, 调用前需要等待的秒数)
+        :raises NoKeyAvailable: 没有在 MAX_WAIT 秒内可用的 Key
+        """
+        limit = self.limits[provider]
+        now = time.time()
+        with self._lock:
+            best = None
+            reasons = set()
+            for key in keys or [""]:
+                state = self._state(provider, key, now)
+                if limit.get("daily") and state["used"] >= limit["daily"]:
+                    reasons.add("今日额度已用完")
+                    continue
+                if state["cooldown_until"] - now > MAX_WAIT:
+                    self._refresh_cooldown(provider, key, state)
+                wait = max(0.0, state["cooldown_until"] - now)
+                if limit.get("rate") and state["tokens"] < 1:
+                    wait = max(wait, (1 - state["tokens"]) / limit["rate"])
+                if wait > MAX_WAIT:
+                    if state["cooldown_until"] == PARKED:
+                        reasons.add("余额不足，需充值后手动恢复")
+                    elif state["cooldown_until"] >= self._next_reset(provider, now):
+                        reasons.add("今日额度已用完")
+                    else:
+                        reasons.add("被限流，冷却中" if state["cooldown_until"] > now else "请求过于频繁")
+                    continue
+                if best is None or (wait, state["used"]) < (best[1], best[2]["used"]):
+                    best = (key, wait, state)
+            if best is None:
+                raise NoKeyAvailable("、".join(sorted(reasons)) or "没有可用的 Key")
+
+            key, wait, state = best
+            state["used"] += 1
+            if limit.get("rate"):
+                state["tokens"] -= 1
+            self._save(provider, key, state)
+        return key, wait
+
+    def report(self, provider, key, outcome, retry_after=None):
+        """
+        记录一次调用的结果：ok 清零连续限流次数；throttled 退还额度并进入冷却；
+        exhausted 停用该 Key 到下次重置（余额制的搜索源一直停用，直到手动 reset）；
+        failed（网络异常等未得到答复的调用）退还预占的额度。
+        """
+        now = time.time()
+        with self._lock:
+            state = self._state(provider, key, now)
+            if outcome == OK:
+                if not state["strikes"]:
+                    return
+                state["strikes"] = 0
+            elif outcome == THROTTLED:
+                state["used"] = max(0, state["used"] - 1)
+                state["strikes"] += 1
+                backoff = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (state["strikes"] - 1))
+                state["cooldown_until"] = now + max(backoff, retry_after or 0)
+            elif outcome == EXHAUSTED:
+                if self.limits[provider].get("quota_resets", True):
+                    state["cooldown_until"] = self._next_reset(provider, now)
+                else:
+                    state["cooldown_until"] = PARKED
+            elif outcome == FAILED:
+                state["used"] = max(0, state["used"] - 1)
+            self._save(provider, key, state)
+
+    def reset(self, provider, keys=None):
+        """
+        清除 Key 的冷却与连续限流次数（如 Bocha 充值后），当日用量保留。
+        :param keys: 要恢复的 Key 或其短哈希；None 表示该搜索源的全部 Key
+        :return: 恢复的 Key 数
+        """
+        with self._lock:
+            known = self._key_ids(provider)
+            ids = None if keys is None else {k if k in known else key_id(k) for k in keys}
+            for (p, kid), state in self._states.items():
+                if p == provider and (ids is None or kid in ids):
+                    state.update(strikes=0, cooldown_until=0.0)
+            try:
+                if ids is None:
+                    cur = self._conn.execute(
+                        "UPDATE key_state SET strikes = 0, cooldown_until = 0 WHERE provider = ?", (provider,))
+                else:
+                    cur = self._conn.executemany(
+                        "UPDATE key_state SET strikes = 0, cooldown_until = 0 WHERE provider = ? AND key_id = ?",
+                        [(provider, kid) for kid in ids])
+                self._conn.commit()
+                return cur.rowcount
+            except sqlite3.Error:
+                return 0
+
+    def _key_ids(self, provider):
+        """SQLite 中已记录的该搜索源 Key 短哈希（调用方需持有锁）"""
+        try:
+            rows = self._conn.execute("SELECT key_id FROM key_state WHERE provider = ?", (provider,)).fetchall()
+        except sqlite3.Error:
+            return set()
+        return {row[0] for row in rows}
+
+    def rows(self):
+        """SQLite 中记录的所有 Key 状态（不需要知道 Key 本身）"""
+        with self._lock:
+            try:
+                return self._conn.execute(
+                    "SELECT provider, key_id, day, used, strikes, cooldown_until FROM key_state "
+                    "ORDER BY provider, key_id"
+                ).fetchall()
+            except sqlite3.Error:
+                return []
+
+    def call(self, provider, keys, func):
+        """
+        用调度出的 Key 调用 func(key)，限流或额度耗尽时换 Key / 等待后重试。
+        :raises NoKeyAvailable: 所有尝试都因额度或限流失败
+        """
+        errors = []
+        for _ in range(MAX_ATTEMPTS):
+            try:
+                key, wait = self.reserve(provider, keys)
+            except NoKeyAvailable as e:
+                errors.append(str(e))
+                break
+            if wait:
+                time.sleep(wait)
+            try:
+                result = func(key)
+            except Throttled as e:
+                self.report(provider, key, THROTTLED, e.retry_after)
+                errors.append(str(e))
+                continue
+            except QuotaExhausted as e:
+                self.report(provider, key, EXHAUSTED)
+                errors.append(str(e))
+                continue
+            except BaseException:
+                self.report(provider, key, FAILED)
+                raise
+            self.report(provider, key, OK)
+            return result
+        raise NoKeyAvailable("；".join(dict.fromkeys(errors)))
+
+    async def _areserve(self, provider, keys):
+        """在线程中执行 reserve；等待期间任务被取消时，线程中预占的额度在完成后退还"""
+        future = asyncio.ensure_future(to_thread(self.reserve, provider, keys))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            def release(f):
+                if not f.cancelled() and f.exception() is None:
+                    self.report(provider, f.result()[0], FAILED)
+            future.add_done_callback(release)
+            raise
+
+    async def acall(self, provider, keys, func):
+        """call 的异步版本，func(key) 返回协程；reserve / report 的 SQLite 写入放到线程中执行"""
+        errors = []
+        for _ in range(MAX_ATTEMPTS):
+            try:
+                key, wait = await self._areserve(provider, keys)
+            except NoKeyAvailable as e:
+                errors.append(str(e))
+                break
+            if wait:
+                await asyncio.sleep(wait)
+            try:
+                result = await func(key)
+            except Throttled as e:
+                await to_thread(self.report, provider, key, THROTTLED, e.retry_after)
+                errors.append(str(e))
+                continue
+            except QuotaExhausted as e:
+                await to_thread(self.report, provider, key, EXHAUSTED)
+                errors.append(str(e))
+                continue
+            except BaseException:
+                # 可能是任务被取消，不能再等待线程，直接在当前线程退还额度
+                self.report(provider, key, FAILED)
+                raise
+            await to_thread(self.report, provider, key, OK)
+            return result
+        raise NoKeyAvailable("；".join(dict.fromkeys(errors)))
+
+    def stats(self, provider, keys):
+        """各 Key 的当日用量、剩余额度、冷却剩余秒数与当前令牌数（Key 以短哈希表示）"""
+        limit = self.limits[provider]
+        now = time.time()
+        rows = []
+        with self._lock:
+            for key in keys or [""]:
+                state = self._state(provider, key, now)
+                if state["cooldown_until"] > now:
+                    self._refresh_cooldown(provider, key, state)
+                parked = state["cooldown_until"] == PARKED
+                rows.append({
+                    "key": key_id(key),
+                    "used": state["used"],
+                    "remaining": limit["daily"] - state["used"] if limit.get("daily") else None,
+                    "parked": parked,
+                    "cooldown": None if parked else max(0.0, round(state["cooldown_until"] - now, 1)),
+                    "tokens": round(state["tokens"], 2) if limit.get("rate") else None,
+                })
+        return rows
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def get_scheduler():
+    """进程内共享的默认实例"""
+    global _default_scheduler
+    if _default_scheduler is None:
+        with _default_lock:
+            if _default_scheduler is None:
+                _default_scheduler = Scheduler()
+    return _default_scheduler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查看或恢复搜索 API Key 的额度状态")
+    parser.add_argument("--reset", metavar="PROVIDER", choices=sorted(PROVIDER_LIMITS),
+                        help="清除该搜索源 Key 的冷却 / 停用状态（如 Bocha 充值后）")
+    parser.add_argument("--key", action="append",
+                        help="只恢复指定的 Key（可填 Key 本身或状态列表中的短哈希，可重复）")
+    args = parser.parse_args(argv)
+
+    scheduler = get_scheduler()
+    if args.reset:
+        print(f"已恢复 {scheduler.reset(args.reset, args.key)} 个 Key")
+    now = time.time()
+    for provider, kid, day, used, strikes, cooldown_until in scheduler.rows():
+        if cooldown_until == PARKED:
+            status = "余额不足，已停用"
+        elif cooldown_until > now:
+            status = f"冷却中，剩余 {cooldown_until - now:.0f} 秒"
+        else:
+            status = "可用"
+        print(f"{provider:<8} {kid}  {day} 已用 {used:<5} 连续限流 {strikes}  {status}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,452 @@
+"""
+HTTP / SSE 服务：其他服务不经过 Streamlit，直接以 HTTP 调用 Agent。
+
+Streamlit 脚本每次交互都从头执行，每次研究又绑定在一个浏览器会话上，无法作为后端服务使用。
+这里用标准库起一个 HTTP 服务：提交的研究任务进入有界队列，由固定大小的工作线程池执行
+run_agent_generator，事件以 Server-Sent Events 推送给客户端。
+- 背压：队列已满时直接返回 503 + Retry-After，不无限堆积
+- 每个客户端（X-Client-Id 请求头，缺省为对端 IP）同时排队或运行的任务数有上限，超出返回 429
+- 事件保存在任务里，断线重连时按 Last-Event-ID 续传；任务结束后保留一段时间供查询
+
+接口：
+    POST   /v1/research              {"question": "...", "source": 1, "max_steps": 8}
+           → 202 {"id", "status", "events"}；请求头 Accept: text/event-stream 时直接返回事件流
+    GET    /v1/research/<id>         任务状态与最终答案
+    GET    /v1/research/<id>/events  事件流：每个 Agent 事件为一条 SSE，event 为事件类型，
+                                     data 为 JSON 编码的 content；任务结束时发送 event: done
+    DELETE /v1/research/<id>         取消任务
+    GET    /healthz                  队列长度、工作线程状态与各搜索 API Key 的当日用量 / 冷却状态
+
+API Key 等配置在服务端通过命令行参数或环境变量给出，请求里只能指定问题、搜索源和步数。
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from drs.context_manager import CONTEXT_TOKEN_BUDGET
+
+# ================= 配置区 =================
+
+# 工作线程数（同时运行的研究任务数）
+WORKERS = 4
+
+# 排队任务数上限，超出时返回 503
+QUEUE_SIZE = 32
+
+# 每个客户端同时排队或运行的任务数上限，超出时返回 429
+PER_CLIENT_LIMIT = 2
+
+# 被拒绝时建议客户端等待的秒数（Retry-After）
+RETRY_AFTER = 5
+
+# 单个任务的时限（秒）
+JOB_TIMEOUT = 600
+
+# 已结束的任务保留多久（秒）供查询与续传
+JOB_RETENTION = 600
+
+# 请求可指定的最大步数，以及默认步数
+MAX_STEPS_LIMIT = 15
+DEFAULT_MAX_STEPS = 8
+
+# 问题最大长度与请求体最大字节数
+MAX_QUESTION_CHARS = 2000
+MAX_BODY_BYTES = 64 * 1024
+
+# 事件流空闲时发送心跳的间隔（秒），防止被代理断开
+KEEPALIVE_INTERVAL = 15
+
+QUEUED, RUNNING = "queued", "running"
+DONE, MAX_STEPS, ERROR, TIMEOUT, CANCELLED = "done", "max_steps", "error", "timeout", "cancelled"
+FINISHED = (DONE, MAX_STEPS, ERROR, TIMEOUT, CANCELLED)
+
+MAX_STEPS_MARK = "🛑 已达到最大步数"
+
+
+class Rejected(Exception):
+    """提交被拒绝（队列已满或超出客户端并发上限），status 为对应的 HTTP 状态码"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Job:
+    """一次研究任务：参数、状态与已产生的事件（线程安全）"""
+
+    def __init__(self, job_id, client, params):
+        self.id = job_id
+        self.client = client
+        self.params = params
+        self.status = QUEUED
+        self.answer = None
+        self.events = []
+        self.cancelled = False
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cond = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    def append(self, event):
+        with self._cond:
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def finish(self, status):
+        with self._cond:
+            self.status = status
+            self.finished_at = time.time()
+            self._cond.notify_all()
+
+    def wait_events(self, start, timeout):
+        """
+        等待第 start 个之后的新事件，最多等待 timeout 秒。
+        :return: (新事件列表, 任务是否已结束)；已结束时列表包含全部剩余事件
+        """
+        with self._cond:
+            if len(self.events) <= start and not self.done:
+                self._cond.wait(timeout)
+            return self.events[start:], self.done
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "question": self.params["question"],
+            "source": self.params["source"],
+            "answer": self.answer,
+            "events": len(self.events),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ResearchService:
+    """有界任务队列 + 工作线程池；config 为传给 run_agent_generator 的服务端配置"""
+
+    def __init__(self, config, workers=WORKERS, queue_size=QUEUE_SIZE, per_client_limit=PER_CLIENT_LIMIT,
+                 job_timeout=JOB_TIMEOUT):
+        self.config = config
+        self.workers = workers
+        self.per_client_limit = per_client_limit
+        self.job_timeout = job_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._active = {}  # 客户端 -> 排队或运行中的任务数
+        self._running = 0
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"drs-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    # ---------- 任务管理 ----------
+
+    def submit(self, client, params):
+        """提交任务，被拒绝时抛出 Rejected"""
+        with self._lock:
+            self._purge()
+            if self._active.get(client, 0) >= self.per_client_limit:
+                raise Rejected(429, f"每个客户端最多同时进行 {self.per_client_limit} 个任务")
+            job = Job(uuid.uuid4().hex, client, params)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise Rejected(503, "任务队列已满，请稍后重试")
+            self._jobs[job.id] = job
+            self._active[client] = self._active.get(client, 0) + 1
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """取消任务：排队中的立即结束，运行中的最迟 drs.watchdog.POLL_INTERVAL 秒后停止并释放工作线程"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.cancelled = True
+            queued = job.status == QUEUED
+        if queued:
+            self._finish(job, CANCELLED)
+        return job
+
+    def stats(self):
+        # 按需导入，理由同 _run
+        from drs.providers import quota_stats
+
+        quota = quota_stats(self.config.get("bocha_key", ""), self.config.get("google_key", ""))
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "running": self._running,
+                "workers": self.workers,
+                "queue_size": self._queue.maxsize,
+                "jobs": len(self._jobs),
+                "quota": quota,
+            }
+
+    def _purge(self):
+        """清理超过保留时间的已结束任务（调用方需持有锁）"""
+        cutoff = time.time() - JOB_RETENTION
+        for job_id in [j.id for j in self._jobs.values() if j.done and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def _finish(self, job, status):
+        with self._lock:
+            if job.done:
+                return
+            if job.status == RUNNING:
+                self._running -= 1
+            self._active[job.client] -= 1
+            if not self._active[job.client]:
+                del self._active[job.client]
+            job.finish(status)
+
+    # ---------- 工作线程 ----------
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                if job.done:  # 排队时已被取消
+                    continue
+                job.status = RUNNING
+                job.started_at = time.time()
+                self._running += 1
+            self._finish(job, self._run(job))
+            print(f"[{job.id[:8]}] {job.status} {len(job.events)} 个事件 "
+                  f"{job.finished_at - job.started_at:.1f}s", file=sys.stderr)
+
+    def _run(self, job):
+        """
+        执行一个任务，返回结束状态。
+        生成器由看门狗线程驱动（见 drs.watchdog），卡住的 LLM / 搜索调用不会让任务逃过时限与取消。
+        """
+        # 按需导入，python -m drs.service --help 不必加载整个 Agent
+        from drs.agent import run_agent_generator
+        from drs.watchdog import watch
+
+        c = self.config
+        p = job.params
+        status = ERROR
+        deadline_at = time.monotonic() + self.job_timeout
+        gen = run_agent_generator(p["question"], c["api_key"], c["base_url"], c["model"], p["source"],
+                                  c["bocha_key"], c["google_key"], c["google_cx"], c["proxy"], p["max_steps"],
+                                  context_budget=c["context_budget"], tool_mode=c.get("tool_mode", False),
+                                  crawl_pages=c.get("crawl_pages", 0))
+        try:
+            for event in watch(gen, deadline_at, lambda: job.cancelled):
+                job.append(event)
+                if event["type"] == "final_answer":
+                    job.answer = event["content"] or ""
+                    status = MAX_STEPS if job.answer.startswith(MAX_STEPS_MARK) else DONE
+        except TimeoutError:
+            return TIMEOUT
+        except Exception as e:
+            job.append({"type": "error", "content": f"程序运行异常: {e}"})
+            return ERROR
+        return CANCELLED if job.cancelled else status
+
+
+# ================= HTTP 接口 =================
+
+def parse_params(body, default_source):
+    """校验请求体，返回任务参数；不合法时抛出 ValueError"""
+    question = body.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise ValueError("缺少 question")
+    if len(question) > MAX_QUESTION_CHARS:
+        raise ValueError(f"question 不能超过 {MAX_QUESTION_CHARS} 个字符")
+    source = body.get("source", default_source)
+    if source not in (1, 2, 3, 4):
+        raise ValueError("source 只能是 1~4")
+    max_steps = body.get("max_steps", DEFAULT_MAX_STEPS)
+    if not isinstance(max_steps, int) or not 1 <= max_steps <= MAX_STEPS_LIMIT:
+        raise ValueError(f"max_steps 只能是 1~{MAX_STEPS_LIMIT}")
+    return {"question": question.strip(), "source": source, "max_steps": max_steps}
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        server_version = "DRS"
+
+        def log_message(self, *args):
+            pass
+
+        def _client(self):
+            return self.headers.get("X-Client-Id") or self.client_address[0]
+
+        def _send_json(self, obj, status=200, headers=None):
+            body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _route(self):
+            """拆出 /v1/research/<id>[/events]，返回 (任务, 是否为事件流)；路径不匹配返回 (None, None)"""
+            parts = urlsplit(self.path).path.strip("/").split("/")
+            if len(parts) in (3, 4) and parts[:2] == ["v1", "research"] and (len(parts) == 3 or parts[3] == "events"):
+                return service.get(parts[2]), len(parts) == 4
+            return None, None
+
+        def do_GET(self):
+            if urlsplit(self.path).path == "/healthz":
+                self._send_json(service.stats())
+                return
+            job, events = self._route()
+            if events is None:
+                self._send_json({"error": "not found"}, 404)
+            elif job is None:
+                self._send_json({"error": "任务不存在或已过期"}, 404)
+            elif events:
+                self._stream(job)
+            else:
+                self._send_json(job.to_dict())
+
+        def do_DELETE(self):
+            job, events = self._route()
+            if job is None or events:
+                self._send_json({"error": "任务不存在或已过期"}, 404)
+                return
+            self._send_json(service.cancel(job.id).to_dict())
+
+        def do_POST(self):
+            if urlsplit(self.path).path.rstrip("/") != "/v1/research":
+                self._send_json({"error": "not found"}, 404)
+                return
+            try:
+                length = (self.headers.get("Content-Length") or "0").strip()
+                if not length.isdigit():
+                    # 无法确定请求体长度，连接上剩余的数据也无法继续解析
+                    self.close_connection = True
+                    raise ValueError("Content-Length 无效")
+                length = int(length)
+                if length > MAX_BODY_BYTES:
+                    self.close_connection = True
+                    self._send_json({"error": "请求体过大"}, 413)
+                    return
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(body, dict):
+                    raise ValueError("请求体必须是 JSON 对象")
+                params = parse_params(body, service.config["source"])
+            except ValueError as e:
+                self._send_json({"error": str(e)}, 400)
+                return
+            try:
+                job = service.submit(self._client(), params)
+            except Rejected as e:
+                self._send_json({"error": str(e)}, e.status, {"Retry-After": str(RETRY_AFTER)})
+                return
+
+            if "text/event-stream" in (self.headers.get("Accept") or ""):
+                # 直接返回事件流的任务，客户端断开即取消
+                if not self._stream(job):
+                    service.cancel(job.id)
+                return
+            self._send_json({"id": job.id, "status": job.status, "events": f"/v1/research/{job.id}/events"}, 202,
+                            {"Location": f"/v1/research/{job.id}"})
+
+        def _stream(self, job):
+            """推送任务事件直到任务结束，客户端断开时返回 False"""
+            try:
+                start = int(self.headers.get("Last-Event-ID", -1)) + 1
+            except ValueError:
+                start = 0
+            self.close_connection = True
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.send_header("X-Accel-Buffering", "no")  # 关闭 nginx 的响应缓冲
+                self.send_header("X-Job-Id", job.id)
+                self.end_headers()
+                while True:
+                    events, done = job.wait_events(start, KEEPALIVE_INTERVAL)
+                    chunks = [f"id: {start + j}\nevent: {e['type']}\n"
+                              f"data: {json.dumps(e['content'], ensure_ascii=False)}\n\n"
+                              for j, e in enumerate(events)]
+                    start += len(events)
+                    if done:
+                        chunks.append(f"event: done\ndata: {json.dumps(job.to_dict(), ensure_ascii=False)}\n\n")
+                    elif not chunks:
+                        chunks.append(": ping\n\n")
+                    self.wfile.write("".join(chunks).encode("utf-8"))
+                    self.wfile.flush()
+                    if done:
+                        return True
+            except (BrokenPipeError, ConnectionResetError):
+                return False
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m drs.service", description="DeepRecursive-Search HTTP/SSE 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="同时运行的任务数")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="排队任务数上限")
+    parser.add_argument("--per-client", type=int, default=PER_CLIENT_LIMIT, help="每个客户端的并发任务上限")
+    parser.add_argument("--job-timeout", type=float, default=JOB_TIMEOUT, help="单个任务的时限（秒）")
+    parser.add_argument("--source", type=int, default=1, choices=[1, 2, 3, 4],
+                        help="请求未指定时的搜索源：1=Bocha 2=Google 3=DuckDuckGo 4=联合搜索")
+    parser.add_argument("--context-budget", type=int, default=CONTEXT_TOKEN_BUDGET)
+    parser.add_argument("--tools", action="store_true", help="用工具调用（search / finish）代替 JSON 输出给出决策")
+    parser.add_argument("--crawl", type=int, default=0, metavar="N",
+                        help="每次搜索再沿结果页面中的链接抓取至多 N 个相关子网页（默认关闭）")
+    parser.add_argument("--model", default="Qwen/Qwen3-235B-A22B-Instruct-2507")
+    parser.add_argument("--base-url", default="https://api.siliconflow.cn/v1")
+    parser.add_argument("--api-key", default=os.environ.get("SILICONFLOW_API_KEY", ""))
+    parser.add_argument("--bocha-key", default=os.environ.get("BOCHA_API_KEY", ""))
+    parser.add_argument("--google-key", default=os.environ.get("GOOGLE_API_KEY", ""))
+    parser.add_argument("--google-cx", default=os.environ.get("GOOGLE_CX", ""))
+    parser.add_argument("--proxy", default=os.environ.get("DRS_PROXY", ""))
+    args = parser.parse_args(argv)
+
+    config = {
+        "api_key": args.api_key, "base_url": args.base_url, "model": args.model, "source": args.source,
+        "bocha_key": args.bocha_key, "google_key": args.google_key, "google_cx": args.google_cx,
+        "proxy": args.proxy or None, "context_budget": args.context_budget, "tool_mode": args.tools,
+        "crawl_pages": args.crawl,
+    }
+    service = ResearchService(config, args.workers, args.queue_size, args.per_client, args.job_timeout).start()
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    httpd.daemon_threads = True
+    print(f"服务已启动：http://{args.host}:{args.port}  工作线程 {args.workers}，队列上限 {args.queue_size}",
+          file=sys.stderr)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""
+流式 JSON 增量解析：边接收 LLM token 边取出 thought / answer 等字段。
+
+模型按 {"thought": ..., "action": ..., "query": ..., "answer": ...} 输出，
+以前要等全部 token 生成完才 json.loads。这里逐字符跟踪顶层对象的键值，
+字符串字段在未闭合时也能拿到已生成的部分；字段一闭合即可视为完整。
+对 ```json 围栏、对象前后的多余文字等常见噪声是容错的；
+严格解析失败时 result() 先用 repair_json 修复常见的格式错误，再退回增量解析得到的字段。
+"""
+import json
+import re
+
+# 字符串末尾可能被截断的转义序列（如 "\\" 或 "\\u4e"）需要先剥掉再解码
+_MAX_ESCAPE_LEN = 6
+
+_PY_LITERAL_RE = re.compile(r'([:\[,]\s*)(True|False|None)\b')
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _decode_partial_string(raw):
+    """解码未闭合的 JSON 字符串内容，尽量容错"""
+    for cut in range(0, _MAX_ESCAPE_LEN + 1):
+        candidate = raw[:len(raw) - cut] if cut else raw
+        try:
+            return json.loads('"' + candidate + '"', strict=False)
+        except ValueError:
+            continue
+    return raw
+
+
+def _strip_trailing_comma(out):
+    while out and out[-1] in " \t\r\n":
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def repair_json(text):
+    """
+    尽力修复模型输出中常见的畸形 JSON：代码围栏与对象前后的多余文字、尾逗号、
+    字符串里未转义的换行（按非严格模式解析）、Python 字面量 True/False/None，
+    以及输出被截断时未闭合的字符串和括号。
+    :return: 解析后的对象；无法修复时抛出 ValueError
+    """
+    text = text.replace("```json", "").replace("```", "")
+    start = text.find("{")
+    if start < 0:
+        raise ValueError("输出中没有 JSON 对象")
+
+    out = []
+    stack = []
+    in_string = escape = False
+    for ch in text[start:]:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            out.append(ch)
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            _strip_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                break
+            continue
+        out.append(ch)
+
+    # 输出被截断：补齐未闭合的字符串、悬空的键和括号
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+    if stack:
+        _strip_trailing_comma(out)
+        while out and out[-1] in " \t\r\n":
+            out.pop()
+        if out and out[-1] == ":":
+            out.append("null")
+        out.extend(reversed(stack))
+
+    repaired = "".join(out)
+    try:
+        return json.loads(repaired, strict=False)
+    except ValueError:
+        return json.loads(_PY_LITERAL_RE.sub(lambda m: m.group(1) + _PY_LITERALS[m.group(2)], repaired), strict=False)
+
+
+class StreamingJSONParser:
+    """
+    增量解析单个顶层 JSON 对象。
+    feed() 追加新片段；partial(key) 返回字符串字段当前已生成的内容；
+    is_complete(key) 判断字段是否已完整；result() 在流结束后返回整个对象。
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields = {}        # 已完整的字段 -> 解析后的值
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._key_start = None
+        self._key = None
+        self._value_start = None
+        self._value_is_string = False
+        self._done = False
+
+    def feed(self, chunk):
+        """追加一段模型输出，返回本次新完成的字段名列表"""
+        if not chunk:
+            return []
+        self.buffer += chunk
+        completed = []
+        buf = self.buffer
+        i = self._pos
+        while i < len(buf) and not self._done:
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key_start is not None:
+                        self._key = json.loads(buf[self._key_start:i + 1])
+                        self._key_start = None
+                    elif self._depth == 1 and self._value_is_string:
+                        completed.append(self._finish_value(buf[self._value_start:i + 1]))
+            elif ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect_key:
+                    self._key_start = i
+                    self._expect_key = False
+                elif self._depth == 1 and self._key is not None and self._value_start is None:
+                    self._value_start = i
+                    self._value_is_string = True
+            elif ch in "{[":
+                if self._depth == 0 and ch == "{":
+                    self._expect_key = True
+                elif self._depth == 1 and self._key is not None and self._value_start is None:
+                    self._value_start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 1:
+                    # 顶层对象结束，收尾最后一个非字符串字段
+                    if self._key is not None and self._value_start is not None:
+                        completed.append(self._finish_value(buf[self._value_start:i]))
+                    self._done = True
+                self._depth -= 1
+                if self._depth == 1 and self._key is not None and self._value_start is not None \
+                        and not self._value_is_string:
+                    completed.append(self._finish_value(buf[self._value_start:i + 1]))
+            elif self._depth == 1:
+                if ch == ",":
+                    if self._key is not None and self._value_start is not None:
+                        completed.append(self._finish_value(buf[self._value_start:i]))
+                    self._expect_key = True
+                elif ch not in " \t\r\n:" and self._key is not None and self._value_start is None:
+                    # 数字 / true / false / null
+                    self._value_start = i
+            i += 1
+        self._pos = i
+        return [key for key in completed if key is not None]
+
+    def _finish_value(self, raw):
+        key = self._key
+        try:
+            self.fields[key] = json.loads(raw.strip(), strict=False)
+        except ValueError:
+            self.fields[key] = raw.strip()
+        self._key = None
+        self._value_start = None
+        self._value_is_string = False
+        return key
+
+    def is_complete(self, key):
+        return key in self.fields
+
+    def partial(self, key):
+        """字符串字段当前已生成的内容；尚未开始返回 None"""
+        if key in self.fields:
+            value = self.fields[key]
+            return value if isinstance(value, str) else None
+        if key == self._key and self._value_is_string and self._value_start is not None:
+            return _decode_partial_string(self.buffer[self._value_start + 1:self._pos])
+        return None
+
+    def result(self):
+        """
+        流结束后返回完整对象：优先严格解析，其次 repair_json 修复，最后退回增量解析得到的字段。
+        一个字段都没解析出来时抛出 ValueError。
+        """
+        text = self.buffer.replace("```json", "").replace("```", "").strip()
+        try:
+            return json.loads(text, strict=False)
+        except ValueError:
+            pass
+        try:
+            repaired = repair_json(text)
+            if isinstance(repaired, dict) and repaired:
+                return repaired
+        except ValueError:
+            pass
+        fields = dict(self.fields)
+        if self._key is not None and self._key not in fields:
+            value = self.partial(self._key)
+            if value is not None:
+                fields[self._key] = value
+        if not fields:
+            raise ValueError(f"无法从模型输出中解析 JSON: {self.buffer[:200]}")
+        return fields
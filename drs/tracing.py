@@ -0,0 +1,208 @@
+"""
+Agent 运行过程的分段计时（tracing spans）。
+
+以前 run_agent_generator 只推送文字事件，答案慢时分不清是 LLM、搜索 API、
+某个卡住的网页还是 trafilatura 提取拖慢了整步。这里为每步、每次 LLM 调用、
+每次搜索源请求、每个网页抓取和提取记录带父子关系的 span，
+由 Agent 循环以 "trace" 事件推送，可汇总为分步耗时，也可导出为 JSONL 或
+Chrome Trace（chrome://tracing / Perfetto 可直接打开）。
+
+当前 span 通过 contextvars 传递；提交到线程池的任务需用 contextvars.copy_context().run
+包装，子线程里的 span 才能挂到正确的父节点上。没有激活 tracer 时 span() 不做任何事。
+"""
+import contextvars
+import itertools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# 当前 (Tracer, 父 span)；未激活时为 None
+_current = contextvars.ContextVar("drs_trace_span", default=None)
+
+
+class Span:
+    """一个计时区间；attrs 可在区间内通过 set() 补充（如字节数、状态码）"""
+
+    def __init__(self, tracer, span_id, parent_id, name, category, attrs):
+        self.tracer = tracer
+        self.id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+        self.thread = threading.current_thread().name
+        self.start = time.perf_counter()
+        self.end = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+            self.tracer._finished(self)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "parent": self.parent_id,
+            "name": self.name,
+            "cat": self.category,
+            "start": round(self.start - self.tracer.origin, 6),
+            "dur": round((self.end or time.perf_counter()) - self.start, 6),
+            "thread": self.thread,
+            "attrs": self.attrs,
+        }
+
+
+class _NullSpan:
+    """未激活 tracer 时返回的空 span"""
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """一次研究会话的 span 收集器（线程安全）"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.wall_origin = time.time()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pending = []
+
+    def start(self, name, category="", parent=None, **attrs):
+        """手动开始一个 span，需自行调用 finish()；用于跨 yield 的区间"""
+        return Span(self, next(self._ids), parent.id if parent else None, name, category, attrs)
+
+    @contextmanager
+    def activate(self, parent):
+        """在 with 块内把 parent 设为当前 span，块内（及 copy_context 的子线程里）的 span() 挂在其下"""
+        token = _current.set((self, parent))
+        try:
+            yield parent
+        finally:
+            _current.reset(token)
+
+    def _finished(self, span):
+        with self._lock:
+            self._pending.append(span.to_dict())
+
+    def drain(self):
+        """取出自上次调用以来结束的 span（按开始时间排序）"""
+        with self._lock:
+            spans, self._pending = self._pending, []
+        return sorted(spans, key=lambda s: s["start"])
+
+
+@contextmanager
+def span(name, category="", **attrs):
+    """在当前 span 下开一个子 span；没有激活的 tracer 时返回空 span"""
+    current = _current.get()
+    if current is None:
+        yield _NULL_SPAN
+        return
+    tracer, parent = current
+    s = tracer.start(name, category, parent, **attrs)
+    token = _current.set((tracer, s))
+    try:
+        yield s
+    except Exception as e:
+        s.set(error=str(e)[:200])
+        raise
+    finally:
+        _current.reset(token)
+        s.finish()
+
+
+# ================= 汇总与导出 =================
+
+def _union_duration(spans):
+    """多个可能重叠（并发）的区间实际占用的墙钟时间"""
+    total = 0.0
+    cur_start = cur_end = None
+    for s in sorted(spans, key=lambda s: s["start"]):
+        start, end = s["start"], s["start"] + s["dur"]
+        if cur_end is None or start > cur_end:
+            if cur_end is not None:
+                total += cur_end - cur_start
+            cur_start, cur_end = start, end
+        else:
+            cur_end = max(cur_end, end)
+    if cur_end is not None:
+        total += cur_end - cur_start
+    return total
+
+
+def step_breakdown(spans):
+    """
+    按步汇总耗时（秒）。并发的同类区间按墙钟时间合并计算，不重复累加。
+    :return: [{"step", "total", "llm", "ttft", "search", "provider", "fetch", "extract",
+               "pages", "slowest"}, ...]
+    """
+    children = {}
+    for s in spans:
+        children.setdefault(s["parent"], []).append(s)
+
+    def descendants(root):
+        out = []
+        stack = [root]
+        while stack:
+            for child in children.get(stack.pop()["id"], []):
+                out.append(child)
+                stack.append(child)
+        return out
+
+    rows = []
+    for step in sorted((s for s in spans if s["cat"] == "step"), key=lambda s: s["start"]):
+        inner = descendants(step)
+        by_cat = {}
+        for s in inner:
+            by_cat.setdefault(s["cat"], []).append(s)
+        llm = by_cat.get("llm", [])
+        fetches = by_cat.get("fetch", [])
+        slowest = max(fetches, key=lambda s: s["dur"], default=None)
+        rows.append({
+            "step": step["attrs"].get("step"),
+            "total": step["dur"],
+            "llm": _union_duration(llm),
+            "ttft": sum(s["attrs"].get("ttft", 0) for s in llm),
+            "search": _union_duration(by_cat.get("search", [])),
+            "provider": _union_duration(by_cat.get("provider", [])),
+            "fetch": _union_duration(fetches),
+            "extract": _union_duration(by_cat.get("extract", [])),
+            "pages": len(by_cat.get("page", [])),
+            "slowest": f"{slowest['attrs'].get('url', '')} ({slowest['dur']:.1f}s)" if slowest else "",
+        })
+    return rows
+
+
+def to_jsonl(spans):
+    """每行一个 span 的 JSON 文本"""
+    return "".join(json.dumps(s, ensure_ascii=False) + "\n" for s in spans)
+
+
+def to_chrome_trace(spans):
+    """转换为 Chrome Trace Event 格式（完整事件 ph=X，时间单位微秒）"""
+    tids = {}
+    events = []
+    for s in spans:
+        tid = tids.setdefault(s["thread"], len(tids) + 1)
+        events.append({
+            "name": s["name"],
+            "cat": s["cat"],
+            "ph": "X",
+            "ts": round(s["start"] * 1e6),
+            "dur": round(s["dur"] * 1e6),
+            "pid": 1,
+            "tid": tid,
+            "args": dict(s["attrs"], id=s["id"], parent=s["parent"]),
+        })
+    for thread, tid in tids.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": thread}})
+    return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, ensure_ascii=False)
@@ -0,0 +1,76 @@
+"""
+同步事件生成器的看门狗：由后台线程迭代 run_agent_generator，调用方按时限与取消标志等待事件。
+
+以前服务的工作线程、批量评测的线程池直接迭代生成器，只在事件到达时检查时限和取消标志。
+LLM 流式响应或搜索调用卡住时生成器迟迟不产生下一个事件，任务既不会超时也无法取消，
+一直占着工作线程，几个这样的任务就能堵住整个队列。这里把生成器交给后台线程驱动，
+事件经队列转给调用方；调用方等待时带上剩余时间，到时限或被取消立即返回，工作线程随之释放。
+后台线程跑完手头这次调用（受其自身超时限制）后发现已停止，关闭生成器退出。
+"""
+import contextvars
+import queue
+import threading
+import time
+
+# ================= 配置区 =================
+
+# 等待事件期间检查取消标志的间隔（秒）
+POLL_INTERVAL = 0.5
+
+_END = object()
+
+
+class _Failed:
+    """生成器抛出的异常，经队列转给调用方"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _pump(gen, events, stop):
+    try:
+        for event in gen:
+            if stop.is_set():
+                return
+            events.put(event)
+        events.put(_END)
+    except Exception as e:
+        events.put(_Failed(e))
+    finally:
+        gen.close()
+
+
+def watch(gen, deadline_at=None, cancelled=None, poll=POLL_INTERVAL):
+    """
+    在后台线程中迭代同步生成器 gen，逐个产出其事件。
+    :param deadline_at: 截止时刻（time.monotonic()），超过时抛出 TimeoutError
+    :param cancelled: 无参函数，返回真时停止迭代（最迟 poll 秒后生效）
+    gen 抛出的异常原样抛给调用方。gen 归后台线程所有，调用方不要再迭代或关闭它。
+    """
+    events = queue.Queue()
+    stop = threading.Event()
+    # 带上调用方上下文的副本，生成器中记录的 tracing span 与直接迭代时一致
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(_pump, gen, events, stop),
+                              name="drs-watch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            if cancelled is not None and cancelled():
+                return
+            wait = poll
+            if deadline_at is not None:
+                left = deadline_at - time.monotonic()
+                if left <= 0:
+                    raise TimeoutError("超过时限")
+                wait = min(wait, left)
+            try:
+                item = events.get(timeout=wait)
+            except queue.Empty:
+                continue
+            if item is _END:
+                return
+            if isinstance(item, _Failed):
+                raise item.error
+            yield item
+    finally:
+        stop.set()